@@ -0,0 +1,144 @@
+from collections import OrderedDict
+import hashlib, os, sqlite3, threading
+
+
+class ResultCache():
+
+    '''
+        Prediction results by a key of the image bytes, config name and config and model
+        version. An in process LRU tier is backed by an optional SQLite file, which
+        several worker processes can share. The SQLite file keeps the most recently
+        written rows, so results of older versions are eventually deleted.
+    '''
+
+    STAT_MEMORY_HITS = "memory_hits"
+    STAT_DISK_HITS = "disk_hits"
+    STAT_MISSES = "misses"
+    STAT_HIT_RATE = "hit_rate"
+    STAT_SIZE = "size"
+
+    DISK_CAPACITY = 100000
+
+    __TABLE = "results"
+
+    '''
+        Seconds a process waits for another to release the SQLite file.
+    '''
+    __DISK_TIMEOUT = 10
+
+    def __init__(self):
+        self.__capacity = 0
+        self.__disk_capacity = ResultCache.DISK_CAPACITY
+        self.__path = None
+        self.__results = OrderedDict()
+        self.__connection = None
+        self.__pid = None
+        self.__memory_hits = 0
+        self.__disk_hits = 0
+        self.__misses = 0
+        self.__lock = threading.RLock()
+
+    def initialise(self, capacity, path = None, disk_capacity = DISK_CAPACITY):
+        '''
+        @params:
+            capacity        - Required  : results kept in memory (Int)
+            path            - Optional  : SQLite file shared between processes, None keeps
+                                          results in memory only (Str)
+            disk_capacity   - Optional  : results kept in the SQLite file (Int)
+        '''
+        if capacity <= 0:
+            raise Exception("Invalid result cache capacity supplied: {}".format(capacity))
+
+        if disk_capacity <= 0:
+            raise Exception("Invalid result cache disk capacity supplied: {}".format(disk_capacity))
+
+        self.__capacity = capacity
+        self.__disk_capacity = disk_capacity
+        self.__path = None if path is None else str(path)
+
+        if self.__path is not None:
+            self.__disk()
+
+        return self
+
+    @staticmethod
+    def key(image_bytes, config_name, version):
+        '''
+        Cache key of an image for a config.
+        @params:
+            image_bytes   - Required  : encoded image (Bytes)
+            config_name   - Required  : CAPTCHA config filename (Str)
+            version       - Required  : config and model version (Str)
+        '''
+        return "{}:{}:{}".format(config_name, version, hashlib.sha256(image_bytes).hexdigest())
+
+    def get(self, key):
+        '''
+            The cached result, None on a miss.
+        '''
+        with self.__lock:
+            if key in self.__results:
+                self.__memory_hits += 1
+                self.__results.move_to_end(key)
+                return self.__results[key]
+
+            result = None
+            if self.__path is not None:
+                row = self.__disk().execute("SELECT result FROM {} WHERE key = ?".format(
+                    ResultCache.__TABLE), (key,)).fetchone()
+                result = None if row is None else row[0]
+
+            if result is None:
+                self.__misses += 1
+                return None
+
+            self.__disk_hits += 1
+            self.__remember(key, result)
+
+            return result
+
+    def put(self, key, result):
+        with self.__lock:
+            self.__remember(key, result)
+
+            if self.__path is not None:
+                #A replaced row gets a new rowid, so rows are deleted oldest written first.
+                with self.__disk() as connection:
+                    connection.execute("INSERT OR REPLACE INTO {} (key, result) VALUES (?, ?)" \
+                        .format(ResultCache.__TABLE), (key, result))
+                    connection.execute("DELETE FROM {0} WHERE rowid <= (SELECT MAX(rowid) FROM {0}) - ?" \
+                        .format(ResultCache.__TABLE), (self.__disk_capacity,))
+
+        return self
+
+    def getStats(self):
+        with self.__lock:
+            lookups = self.__memory_hits + self.__disk_hits + self.__misses
+
+            return {ResultCache.STAT_MEMORY_HITS : self.__memory_hits,
+                ResultCache.STAT_DISK_HITS : self.__disk_hits,
+                ResultCache.STAT_MISSES : self.__misses,
+                ResultCache.STAT_HIT_RATE : (self.__memory_hits + self.__disk_hits) / lookups \
+                    if lookups else 0.0,
+                ResultCache.STAT_SIZE : len(self.__results)}
+
+    def __remember(self, key, result):
+        self.__results[key] = result
+        self.__results.move_to_end(key)
+
+        while len(self.__results) > self.__capacity:
+            self.__results.popitem(last=False)
+
+    def __disk(self):
+        '''
+            The SQLite connection of this process, a forked worker opens its own.
+        '''
+        if self.__connection is None or self.__pid != os.getpid():
+            self.__connection = sqlite3.connect(self.__path, timeout=ResultCache.__DISK_TIMEOUT,
+                check_same_thread=False)
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS {} (key TEXT PRIMARY KEY, result TEXT)" \
+                .format(ResultCache.__TABLE))
+            self.__pid = os.getpid()
+
+        return self.__connection
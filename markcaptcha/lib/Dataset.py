@@ -0,0 +1,217 @@
+from pathlib import Path
+import hashlib, json, os
+
+import numpy as np
+
+
+class CharacterDataset():
+
+    '''
+        The characters extracted by processImages packed into one uint8 .npy file at a model
+        image size, memory mapped when training instead of decoding every PNG again.
+        A .json file next to it holds the labels and a fingerprint of the characters folder
+        and image size, any change to either repacks the cache.
+    '''
+
+    '''
+        Bumped when the packed layout changes, so older caches are repacked.
+    '''
+    VERSION = 1
+
+    __IMAGES_SUFFIX = ".npy"
+    __META_SUFFIX = ".json"
+    __META_FINGERPRINT = "fingerprint"
+    __META_LABELS = "labels"
+
+    def __init__(self):
+        self.__images = None
+        self.__labels = None
+        self.__packed = False
+
+    def load(self, image_object, characters_path, image_size, cache_path):
+        '''
+        Memory map the packed characters, packing them first when the cache is missing or stale.
+        @params:
+            image_object     - Required  : ImageProcessing Object (ImageProcessingString)
+            characters_path  - Required  : characters folder of <label>/*.png (Path)
+            image_size       - Required  : model input width and height (List[Int])
+            cache_path       - Required  : cache path without a suffix (Path)
+        '''
+        characters_path = Path(characters_path)
+        if not characters_path.exists():
+            raise Exception("Path does not exist: {}".format(str(characters_path)))
+
+        characters = self.__characters(characters_path)
+        fingerprint = self.__fingerprint(characters, image_size)
+
+        (images_path, meta_path) = self.__paths(cache_path)
+        meta = self.__readMeta(meta_path)
+
+        self.__packed = meta is None or meta[CharacterDataset.__META_FINGERPRINT] != fingerprint \
+            or not images_path.is_file()
+
+        if self.__packed:
+            meta = self.__pack(image_object, characters, image_size, cache_path, fingerprint)
+
+        self.__images = np.load(str(images_path), mmap_mode="r")
+        self.__labels = np.array(meta[CharacterDataset.__META_LABELS])
+
+        if len(self.__images) != len(self.__labels):
+            raise Exception("Corrupt character cache: {}".format(str(images_path)))
+
+        return self
+
+    def __pack(self, image_object, characters, image_size, cache_path, fingerprint):
+        '''
+            Decode, resize and grey every character into the cache, the metadata is written
+            last so an interrupted pack is never loaded.
+        '''
+        (images_path, meta_path) = self.__paths(cache_path)
+        images_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = images_path.with_name(images_path.stem + ".tmp" + CharacterDataset.__IMAGES_SUFFIX)
+
+        images = np.lib.format.open_memmap(str(temporary_path), mode="w+", dtype=np.uint8,
+            shape=(len(characters), image_size[1], image_size[0], 1))
+
+        labels = []
+        for character in characters:
+            try:
+                character_path = Path(character.path)
+                images[len(labels), :, :, 0] = image_object.importImage(character_path) \
+                    .resize(image_size[0], image_size[1]).grey().getImage()
+                labels.append(character_path.parent.name)
+            except Exception as ex:
+                print(ex)
+                continue
+
+        if len(labels) < len(characters):
+            #Unreadable characters were skipped, only the packed rows are kept.
+            trimmed = np.array(images[:len(labels)])
+            del images
+            np.save(str(temporary_path), trimmed)
+        else:
+            images.flush()
+            del images
+
+        os.replace(str(temporary_path), str(images_path))
+
+        meta = {CharacterDataset.__META_FINGERPRINT : fingerprint,
+            CharacterDataset.__META_LABELS : labels}
+        with open(str(meta_path), "w") as f:
+            json.dump(meta, f)
+
+        return meta
+
+    def getImages(self):
+        '''
+            Read only uint8 memory map, shape (N, height, width, 1).
+        '''
+        if self.__images is None:
+            raise Exception("Character dataset needs to be loaded.")
+
+        return self.__images
+
+    def getLabels(self):
+        if self.__labels is None:
+            raise Exception("Character dataset needs to be loaded.")
+
+        return self.__labels
+
+    def packed(self):
+        '''
+            Whether the last load had to repack the cache.
+        '''
+        return self.__packed
+
+    def __paths(self, cache_path):
+        cache_path = Path(cache_path)
+        return (cache_path.with_name(cache_path.name + CharacterDataset.__IMAGES_SUFFIX),
+            cache_path.with_name(cache_path.name + CharacterDataset.__META_SUFFIX))
+
+    def __characters(self, characters_path):
+        '''
+            Every <label>/*.png entry in a stable order, scandir avoids a Path per file.
+        '''
+        characters = []
+        for character_folder in sorted((entry for entry in os.scandir(str(characters_path))
+            if entry.is_dir()), key=lambda entry: entry.name):
+            characters.extend(sorted((entry for entry in os.scandir(character_folder.path)
+                if entry.name.endswith(".png")), key=lambda entry: entry.name))
+
+        return characters
+
+    def __fingerprint(self, characters, image_size):
+        '''
+            Hash of the image size and every character's label, name, size and modification time.
+        '''
+        fingerprint = hashlib.sha1(json.dumps([CharacterDataset.VERSION, list(image_size)]).encode())
+
+        for character in characters:
+            stat = character.stat()
+            fingerprint.update("{}/{}\0{}\0{}\n".format(Path(character.path).parent.name,
+                character.name, stat.st_size, stat.st_mtime_ns).encode())
+
+        return fingerprint.hexdigest()
+
+    def __readMeta(self, meta_path):
+        if not meta_path.is_file():
+            return None
+
+        try:
+            with open(str(meta_path)) as f:
+                return json.load(f)
+        except ValueError:
+            return None
+
+
+class CharacterBatches():
+
+    '''
+        Normalised float32 batches read from packed characters one at a time, with the
+        keras.utils.Sequence interface so Keras loader threads can prefetch them while the
+        model trains. Rows are reshuffled every epoch within windows of shuffle_buffer rows,
+        the whole split when no shuffle_buffer is given.
+    '''
+
+    def __init__(self, images, targets, indices, batch_size, shuffle_buffer = None, seed = None):
+        '''
+        @params:
+            images          - Required  : packed uint8 characters (numpy.ndarray (N, h, w, 1))
+            targets         - Required  : one hot label of every row (numpy.ndarray (N, classes))
+            indices         - Required  : rows in this split, in their streaming order (numpy.ndarray)
+            batch_size      - Required  : rows per batch (Int)
+            shuffle_buffer  - Optional  : rows shuffled together each epoch, every row when None,
+                                          0 keeps the order (Int)
+            seed            - Optional  : random seed for the shuffle (Int)
+        '''
+        if batch_size <= 0:
+            raise Exception("Invalid batch size supplied: {}".format(batch_size))
+
+        self.__images = images
+        self.__targets = targets
+        self.__indices = np.asarray(indices)
+        self.__batch_size = batch_size
+        self.__shuffle_buffer = len(self.__indices) if shuffle_buffer is None else shuffle_buffer
+        self.__random_state = np.random.RandomState(seed)
+        self.__order = self.__indices
+
+        self.on_epoch_end()
+
+    def __len__(self):
+        return -(-len(self.__indices) // self.__batch_size)
+
+    def __getitem__(self, index):
+        #Sorted rows are read from the memory map in file order, order within a batch doesn't matter.
+        rows = np.sort(self.__order[index * self.__batch_size:(index + 1) * self.__batch_size])
+
+        return (np.divide(self.__images[rows], 255.0, dtype=np.float32), self.__targets[rows])
+
+    def on_epoch_end(self):
+        if self.__shuffle_buffer <= 1 or len(self.__indices) == 0:
+            return
+
+        windows = [self.__random_state.permutation(self.__indices[start:start + self.__shuffle_buffer])
+            for start in range(0, len(self.__indices), self.__shuffle_buffer)]
+        self.__random_state.shuffle(windows)
+
+        self.__order = np.concatenate(windows)
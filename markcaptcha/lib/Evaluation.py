@@ -0,0 +1,199 @@
+from pathlib import Path
+import multiprocessing, timeit
+
+import numpy as np
+
+from lib.Factory import Factory
+from lib.MarkCAPTCHA import MarkCAPTCHA, SerialPool
+
+
+class Evaluation():
+
+    '''
+        Accuracy and throughput of a config on labelled CAPTCHA images, named after their
+        text e.g. 4KX2.png. Images are predicted one at a time or in predictBatch batches,
+        in this process or across a pool of worker processes with a MarkCAPTCHA each.
+    '''
+
+    REPORT_CONFIG = "config"
+    REPORT_IMAGES = "images"
+    REPORT_WORKERS = "workers"
+    REPORT_BATCH_SIZE = "batch_size"
+    REPORT_ACCURACY = "accuracy"
+    REPORT_SEGMENTED_ACCURACY = "segmented_accuracy"
+    REPORT_CHARACTER_ACCURACY = "character_accuracy"
+    REPORT_SEGMENTATION_FAILURES = "segmentation_failures"
+    REPORT_SEGMENTATION_FAILURE_RATE = "segmentation_failure_rate"
+    REPORT_SECONDS = "seconds"
+    REPORT_IMAGES_PER_SECOND = "images_per_second"
+    REPORT_LATENCY = "latency_ms"
+    REPORT_CONFUSION = "confusion"
+    REPORT_INCORRECT = "incorrect"
+
+    __PERCENTILES = (50, 95, 99)
+
+    '''
+        MarkCAPTCHA of a worker process, created by its first task.
+    '''
+    __worker_mark = None
+
+    def __init__(self):
+        self.__config_filename = None
+        self.__workers = 1
+        self.__batch_size = 1
+
+    def initialise(self, config_filename, workers = 1, batch_size = 1):
+        '''
+        @params:
+            config_filename  - Required  : CAPTCHA config filename (Str)
+            workers          - Optional  : processes predicting images (Int)
+            batch_size       - Optional  : images per predictBatch call, 1 predicts each
+                                           image on its own (Int)
+        '''
+        if workers <= 0:
+            raise Exception("Invalid amount of workers supplied: {}".format(workers))
+
+        if batch_size <= 0:
+            raise Exception("Invalid batch size supplied: {}".format(batch_size))
+
+        self.__config_filename = config_filename
+        self.__workers = workers
+        self.__batch_size = batch_size
+
+        return self
+
+    @staticmethod
+    def label(image):
+        '''
+            The text of a CAPTCHA image, its filename without the extension.
+        '''
+        return Path(image).stem
+
+    def evaluate(self, images):
+        '''
+        Predict every image and report the results.
+        @params:
+            images   - Required  : CAPTCHA image files (List[Path])
+        '''
+        if self.__config_filename is None:
+            raise Exception("Evaluation needs to be initialised.")
+
+        images = [Path(image) for image in images]
+        if not images:
+            raise Exception("No CAPTCHA images supplied to evaluate.")
+
+        #Batches are split into tasks, single images are chunked so workers stay busy.
+        chunks = [images[start:start + self.__batch_size]
+            for start in range(0, len(images), self.__batch_size)]
+        chunk_size = 1 if self.__batch_size > 1 else max(1, len(chunks) // (self.__workers * 4))
+
+        with self.__workerPool() as pool:
+            start = timeit.default_timer()
+            results = [result for chunk_results in pool.imap(Evaluation._predictWorker,
+                ((self.__config_filename, chunk, self.__batch_size > 1) for chunk in chunks),
+                chunk_size) for result in chunk_results]
+            seconds = timeit.default_timer() - start
+
+        return self.report(results, seconds)
+
+    def report(self, results, seconds):
+        '''
+        Accuracy, segmentation failures, character confusion, throughput and latency.
+        @params:
+            results   - Required  : image name, prediction and seconds until it was
+                                    returned of every image (List[Tuple])
+            seconds   - Required  : wall clock seconds taken by every prediction (Float)
+        '''
+        failed = Factory.getClass(Factory.CLASS_PREDICT).FAILED
+
+        correct = failures = characters = correct_characters = 0
+        confusion = {}
+        incorrect = []
+        for image_name, prediction, latency in results:
+            expected = Evaluation.label(image_name).upper()
+            prediction = prediction.upper() if prediction != failed else failed
+
+            if prediction == failed:
+                failures += 1
+            elif prediction == expected:
+                correct += 1
+
+            if prediction != expected:
+                incorrect.append({"image": image_name, "expected": expected, "prediction": prediction})
+
+            #Characters are only compared when every one of them was segmented.
+            if prediction == failed or len(prediction) != len(expected):
+                continue
+
+            for expected_character, predicted_character in zip(expected, prediction):
+                row = confusion.setdefault(expected_character, {})
+                row[predicted_character] = row.get(predicted_character, 0) + 1
+
+                characters += 1
+                correct_characters += expected_character == predicted_character
+
+        total = len(results)
+        latencies = np.array([latency for image_name, prediction, latency in results]) * 1000
+
+        latency = {"p{}".format(percentile): round(float(value), 4) for percentile, value
+            in zip(Evaluation.__PERCENTILES, np.percentile(latencies, Evaluation.__PERCENTILES))}
+        latency["mean"] = round(float(latencies.mean()), 4)
+
+        return {Evaluation.REPORT_CONFIG : self.__config_filename,
+            Evaluation.REPORT_IMAGES : total,
+            Evaluation.REPORT_WORKERS : self.__workers,
+            Evaluation.REPORT_BATCH_SIZE : self.__batch_size,
+            Evaluation.REPORT_ACCURACY : correct / total,
+            Evaluation.REPORT_SEGMENTED_ACCURACY : correct / (total - failures) if total > failures else 0.0,
+            Evaluation.REPORT_CHARACTER_ACCURACY : correct_characters / characters if characters else 0.0,
+            Evaluation.REPORT_SEGMENTATION_FAILURES : failures,
+            Evaluation.REPORT_SEGMENTATION_FAILURE_RATE : failures / total,
+            Evaluation.REPORT_SECONDS : round(seconds, 4),
+            Evaluation.REPORT_IMAGES_PER_SECOND : round(total / seconds, 2) if seconds > 0 else 0.0,
+            Evaluation.REPORT_LATENCY : latency,
+            Evaluation.REPORT_CONFUSION : {expected_character : dict(sorted(row.items()))
+                for expected_character, row in sorted(confusion.items())},
+            Evaluation.REPORT_INCORRECT : incorrect}
+
+    @staticmethod
+    def _predictWorker(task):
+        '''
+        Predict a chunk of images, each timed on its own or as one predictBatch call.
+        @params:
+            task   - Required  : config filename, CAPTCHA images and whether they are
+                                 predicted as one batch (Tuple)
+        '''
+        (config_filename, images, batched) = task
+        mark = Evaluation.__workerMark(config_filename)
+
+        if not batched:
+            results = []
+            for image in images:
+                start = timeit.default_timer()
+                prediction = mark.predict(config_filename, image)
+                results.append((image.name, prediction, timeit.default_timer() - start))
+
+            return results
+
+        #Every image of a batch waits for the whole batch.
+        start = timeit.default_timer()
+        predictions = mark.predictBatch(config_filename, images)
+        latency = timeit.default_timer() - start
+
+        return [(image.name, prediction, latency) for image, prediction in zip(images, predictions)]
+
+    @staticmethod
+    def __workerMark(config_filename):
+        '''
+            The process's MarkCAPTCHA, its model loaded before any image is timed.
+        '''
+        if Evaluation.__worker_mark is None:
+            Evaluation.__worker_mark = MarkCAPTCHA(metrics=False).importConfigs()
+
+        return Evaluation.__worker_mark.preloadModels([config_filename])
+
+    def __workerPool(self):
+        if self.__workers == 1:
+            return SerialPool()
+
+        return multiprocessing.Pool(self.__workers)
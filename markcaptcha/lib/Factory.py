@@ -1,8 +1,4 @@
-from lib.ImageProcessing import ImageProcessingSection, ImageProcessingString, ImageProcessingBase64
-from lib.Segmentation import Segment, Outliers
-from lib.Model import Model
-from lib.Predict import Predict
-from lib.Parser import JSONParser, PickleParser
+import importlib
 
 
 class Factory():
@@ -10,30 +6,73 @@ class Factory():
     CLASS_IMAGEPROCESSING_SECTION = "imageprocessingsection"
     CLASS_IMAGEPROCESSING_STRING = "imageprocessingstring"
     CLASS_IMAGEPROCESSING_BASE64 = "imageprocessingbase64"
+    CLASS_IMAGEPROCESSING_BYTES = "imageprocessingbytes"
     CLASS_SEGMENT = "segment"
     CLASS_OUTLIERS = "outliers"
     CLASS_MODEL = "model"
     CLASS_PREDICT = "predict"
     CLASS_JSONPARSER = "jsonparser"
     CLASS_PICKLEPARSER = "pickleparser"
+    CLASS_SERVER = "server"
+    CLASS_PIPELINE = "pipeline"
+    CLASS_SCRATCHBUFFERS = "scratchbuffers"
+    CLASS_ENGINE_KERAS = "kerasengine"
+    CLASS_ENGINE_NUMPY = "numpyengine"
+    CLASS_ENGINE_QUANTIZED = "quantizedengine"
+    CLASS_DATASET = "dataset"
+    CLASS_REGISTRY = "registry"
+    CLASS_RESULTCACHE = "resultcache"
+    CLASS_METRICS = "metrics"
+    CLASS_EVALUATION = "evaluation"
+    CLASS_SHARDWRITER = "shardwriter"
+    CLASS_SHARDS = "shards"
 
+    '''
+        Classes are imported on first use, so Keras and scikit-learn are only
+        loaded by the code paths that build or predict.
+    '''
     __CLASSES = {
-        CLASS_IMAGEPROCESSING_SECTION : ImageProcessingSection,
-        CLASS_IMAGEPROCESSING_STRING : ImageProcessingString,
-        CLASS_IMAGEPROCESSING_BASE64 : ImageProcessingBase64,
-        CLASS_SEGMENT : Segment,
-        CLASS_OUTLIERS: Outliers,
-        CLASS_MODEL : Model,
-        CLASS_PREDICT : Predict,
-        CLASS_JSONPARSER : JSONParser,
-        CLASS_PICKLEPARSER : PickleParser,
+        CLASS_IMAGEPROCESSING_SECTION : "lib.ImageProcessing:ImageProcessingSection",
+        CLASS_IMAGEPROCESSING_STRING : "lib.ImageProcessing:ImageProcessingString",
+        CLASS_IMAGEPROCESSING_BASE64 : "lib.ImageProcessing:ImageProcessingBase64",
+        CLASS_IMAGEPROCESSING_BYTES : "lib.ImageProcessing:ImageProcessingBytes",
+        CLASS_SEGMENT : "lib.Segmentation:Segment",
+        CLASS_OUTLIERS: "lib.Segmentation:Outliers",
+        CLASS_MODEL : "lib.Model:Model",
+        CLASS_PREDICT : "lib.Predict:Predict",
+        CLASS_JSONPARSER : "lib.Parser:JSONParser",
+        CLASS_PICKLEPARSER : "lib.Parser:PickleParser",
+        CLASS_SERVER : "lib.Server:Server",
+        CLASS_PIPELINE : "lib.Pipeline:Pipeline",
+        CLASS_SCRATCHBUFFERS : "lib.ImageProcessing:ScratchBuffers",
+        CLASS_ENGINE_KERAS : "lib.Inference:KerasEngine",
+        CLASS_ENGINE_NUMPY : "lib.Inference:NumpyEngine",
+        CLASS_ENGINE_QUANTIZED : "lib.Inference:QuantizedEngine",
+        CLASS_DATASET : "lib.Dataset:CharacterDataset",
+        CLASS_REGISTRY : "lib.Registry:Registry",
+        CLASS_RESULTCACHE : "lib.Cache:ResultCache",
+        CLASS_METRICS : "lib.Metrics:Metrics",
+        CLASS_EVALUATION : "lib.Evaluation:Evaluation",
+        CLASS_SHARDWRITER : "lib.Shards:ShardWriter",
+        CLASS_SHARDS : "lib.Shards:CharacterShards",
     }
 
+    __loaded_classes = {}
+
     def __init__(self):
         return
 
-    def create(self, classname):
+    @staticmethod
+    def getClass(classname):
         if classname not in Factory.__CLASSES:
             raise Exception("Invalid Factory Class supplied: {}.".format(classname))
 
-        return Factory.__CLASSES[classname]()
+        if classname not in Factory.__loaded_classes:
+            (module_name, class_name) = Factory.__CLASSES[classname].split(":")
+            Factory.__loaded_classes[classname] = getattr(importlib.import_module(module_name),
+                class_name)
+
+        return Factory.__loaded_classes[classname]
+
+    def create(self, classname):
+        return Factory.getClass(classname)()
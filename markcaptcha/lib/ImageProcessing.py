@@ -1,11 +1,46 @@
 import cv2
 import numpy as np
 from pathlib import Path
-from PIL import Image
-import os, platform, imutils, io, base64
+import os, platform, imutils, base64, functools
 from abc import ABC, abstractmethod
 
 
+class ScratchBuffers():
+
+    '''
+        Reusable output images for the ImageProcessing chains of one worker.
+        Each name, shape and type has two buffers, an operation writes to the one
+        its input is not in.
+    '''
+
+    def __init__(self):
+        self.__buffers = {}
+
+    def get(self, name, shape, dtype, source = None):
+        '''
+        Return a scratch buffer, allocated on the first request for its shape.
+        @params:
+            name    - Required  : purpose of the buffer, e.g. image or mask (Str)
+            shape   - Required  : buffer shape (Tuple)
+            dtype   - Required  : buffer type (numpy.dtype)
+            source  - Optional  : image being read, never returned (numpy.ndarray)
+        '''
+        key = (name, tuple(shape), np.dtype(dtype))
+        buffers = self.__buffers.get(key)
+
+        if buffers is None:
+            buffers = (np.empty(shape, dtype), np.empty(shape, dtype))
+            self.__buffers[key] = buffers
+
+        return buffers[1] if buffers[0] is source else buffers[0]
+
+    def owns(self, image):
+        return any(image is buffer for buffers in self.__buffers.values() for buffer in buffers)
+
+    def getSize(self):
+        return sum(buffer.nbytes for buffers in self.__buffers.values() for buffer in buffers)
+
+
 #https://docs.opencv.org/4.0.0/index.html
 class ImageProcessing(ABC):
 
@@ -14,6 +49,7 @@ class ImageProcessing(ABC):
             raise Exception('ImageProcessing is an abstract class and cannot be instantiated.')
         self._image = None
         self._before_image = None
+        self._scratch = None
 
     @abstractmethod
     def importImage(self, image):
@@ -33,13 +69,74 @@ class ImageProcessing(ABC):
             raise Exception("No image imported to return a before image.")
         return self._before_image
 
+    '''
+    Use Scratch
+        Write the results of later operations into reusable scratch buffers,
+        None allocates a new image for each result.
+        A result is only valid until the next image is processed with the same buffers.
+    '''
+    def useScratch(self, scratch):
+        self._scratch = scratch
+
+        return self
+
+    def _output(self, shape = None, name = "image"):
+        '''
+            Destination for an OpenCV result, None lets OpenCV allocate it.
+        '''
+        if self._scratch is None:
+            return None
+
+        return self._scratch.get(name, self._image.shape if shape is None else shape,
+            self._image.dtype, self._image)
+
+    '''
+    Kernel
+        A shared, read only square kernel of ones, or an already built kernel.
+    '''
+    @staticmethod
+    def kernel(size):
+        if isinstance(size, np.ndarray):
+            return size
+
+        return ImageProcessing.__squareKernel(int(size))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def __squareKernel(size):
+        kernel = np.ones((size, size), np.uint8)
+        kernel.setflags(write=False)
+
+        return kernel
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def __dotKernel(thickness):
+        '''
+            The dot drawContours draws for a single point, as a kernel dilating points into dots.
+        '''
+        centre = 2 * thickness
+        canvas = np.zeros((2 * centre + 1, 2 * centre + 1), np.uint8)
+        cv2.drawContours(canvas, np.array([[[[centre, centre]]]], np.int32), -1, 255, thickness)
+
+        (rows, columns) = np.nonzero(canvas)
+        radius = int(max(np.abs(rows - centre).max(), np.abs(columns - centre).max()))
+
+        #Dilation reads the kernel mirrored.
+        kernel = np.ascontiguousarray((canvas[centre - radius:centre + radius + 1,
+            centre - radius:centre + radius + 1] > 0)[::-1, ::-1], dtype=np.uint8)
+        kernel.setflags(write=False)
+
+        return kernel
+
     '''
     Grey
         Greyscale an image.
     '''
     def grey(self):
         if len(self._image.shape) == 3:
-            self._image = cv2.cvtColor(self._image, cv2.COLOR_BGR2GRAY)
+            self._image = cv2.cvtColor(self._image, cv2.COLOR_BGR2GRAY,
+                dst=self._output(self._image.shape[:2]))
 
         return self
 
@@ -50,8 +147,7 @@ class ImageProcessing(ABC):
     '''
     def erode(self, erode_amount, iterations = 1):
         self._image = cv2.erode(self._image,
-            np.ones((int(erode_amount), int(erode_amount)), np.uint8),
-            iterations = iterations)
+            ImageProcessing.kernel(erode_amount), dst=self._output(), iterations = iterations)
 
         return self
 
@@ -61,8 +157,7 @@ class ImageProcessing(ABC):
     '''
     def dilate(self, dilate_amount, iterations = 1):
         self._image = cv2.dilate(self._image,
-            np.ones((int(dilate_amount), int(dilate_amount)), np.uint8),
-            iterations = iterations)
+            ImageProcessing.kernel(dilate_amount), dst=self._output(), iterations = iterations)
 
         return self
 
@@ -72,7 +167,7 @@ class ImageProcessing(ABC):
     '''
     def opening(self, opening_amount):
         self._image = cv2.morphologyEx(self._image, cv2.MORPH_OPEN,
-            np.ones((int(opening_amount), int(opening_amount)), np.uint8))
+            ImageProcessing.kernel(opening_amount), dst=self._output())
 
         return self
 
@@ -82,7 +177,7 @@ class ImageProcessing(ABC):
     '''
     def closing(self, closing_amount):
         self._image = cv2.morphologyEx(self._image, cv2.MORPH_CLOSE,
-            np.ones((int(closing_amount), int(closing_amount)), np.uint8))
+            ImageProcessing.kernel(closing_amount), dst=self._output())
 
         return self
 
@@ -92,7 +187,7 @@ class ImageProcessing(ABC):
     '''
     def gradient(self, gradient_amount):
         self._image = cv2.morphologyEx(self._image, cv2.MORPH_GRADIENT,
-            np.ones((int(gradient_amount), int(gradient_amount)), np.uint8))
+            ImageProcessing.kernel(gradient_amount), dst=self._output())
 
         return self
     '''
@@ -102,7 +197,7 @@ class ImageProcessing(ABC):
     '''
     def threshold(self, thresh_value, inverted = False):
         self._image = cv2.threshold(self._image, int(thresh_value), 255,
-            cv2.THRESH_BINARY_INV if inverted else cv2.THRESH_BINARY)[1]
+            cv2.THRESH_BINARY_INV if inverted else cv2.THRESH_BINARY, dst=self._output())[1]
 
         return self
 
@@ -112,7 +207,7 @@ class ImageProcessing(ABC):
     '''
     def thresholdOtsu(self):
         self._image = cv2.threshold(self._image, 0, 255,
-            cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+            cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=self._output())[1]
 
         return self
 
@@ -123,19 +218,31 @@ class ImageProcessing(ABC):
     '''
     def adaptiveThreshold(self, blocksize, c):
         self._image = cv2.adaptiveThreshold(self._image, 255,
-            cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, blocksize, c)
+            cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, blocksize, c, dst=self._output())
 
         return self
 
     '''
     Fill Holes
         Fill blank space in an image.
+        Every pixel the background can't reach from outside the image through zero pixels
+        is set, as filling each contour does.
     '''
     def fillHoles(self):
-        contours = self.findContours(cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+        (height, width) = self._image.shape[:2]
 
-        for contour in contours:
-            cv2.drawContours(self._image, [contour], 0, (255, 255, 255), -1)
+        mask = self._output((height + 4, width + 4), "fill")
+        if mask is None:
+            mask = np.zeros((height + 4, width + 4), np.uint8)
+        else:
+            mask.fill(0)
+
+        #A zero border around the image joins the background along its edges.
+        padded = cv2.copyMakeBorder(self._image, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0,
+            dst=self._output((height + 2, width + 2) + self._image.shape[2:], "padded"))
+        cv2.floodFill(padded, mask, (0, 0), 255, flags=4 | cv2.FLOODFILL_MASK_ONLY)
+
+        self._image[mask[2:-2, 2:-2] == 0] = 255
 
         return self
 
@@ -144,13 +251,18 @@ class ImageProcessing(ABC):
         Removes lines within an image.
     '''
     def lineRemoval(self, line_width):
-        mask = np.zeros_like(self._image)
+        mask = self._output(name="mask")
+        if mask is None:
+            mask = np.zeros_like(self._image)
+        else:
+            mask.fill(0)
 
-        lines = cv2.HoughLines(cv2.Canny(self._image, 50, 150, apertureSize = 3),
-            	1, (np.pi/180), 0)[0]
+        lines = cv2.HoughLines(cv2.Canny(self._image, 50, 150,
+            edges=self._output(self._image.shape[:2], "edges"), apertureSize = 3),
+            	1, (np.pi/180), 0)
 
         if lines is not None:
-            for rho, theta in lines:
+            for rho, theta in lines[0]:
                 a = np.cos(theta)
                 b = np.sin(theta)
                 x0 = a * rho
@@ -161,7 +273,72 @@ class ImageProcessing(ABC):
 
                 cv2.line(mask, pt1, pt2, (255, 255, 255), line_width, cv2.LINE_AA)
 
-        self._image = cv2.inpaint(self._image, mask, 1, cv2.INPAINT_TELEA)
+        self._image = cv2.inpaint(self._image, mask, 1, cv2.INPAINT_TELEA, dst=self._output())
+        return self
+
+    '''
+    Fast Line Removal
+        Removes the same line as lineRemoval. The Hough transform only ranks lines with
+        at least threshold votes, the strongest line is drawn once and only the rows
+        around it are inpainted. Images without such a line fall back to ranking every line.
+        @params:
+            line_width   - Required  : width the line is removed with (Int)
+            threshold    - Optional  : votes a line needs to be ranked (Int)
+            max_angle    - Optional  : degrees from horizontal a line may be at, 90 allows any (Int)
+    '''
+    def lineRemovalFast(self, line_width, threshold = 20, max_angle = 90):
+        edges = cv2.Canny(self._image, 50, 150,
+            edges=self._output(self._image.shape[:2], "edges"), apertureSize = 3)
+
+        #Theta is the angle of a line's normal, pi/2 for a horizontal line.
+        angles = {}
+        if max_angle < 90:
+            angles = {"min_theta" : np.radians(90 - max_angle), "max_theta" : np.radians(90 + max_angle)}
+
+        lines = cv2.HoughLines(edges, 1, (np.pi/180), int(threshold), **angles)
+        if lines is None and threshold > 0:
+            lines = cv2.HoughLines(edges, 1, (np.pi/180), 0, **angles)
+
+        output = self._output()
+        if output is None:
+            output = self._image.copy()
+        else:
+            np.copyto(output, self._image)
+
+        if lines is None:
+            self._image = output
+            return self
+
+        mask = self._output(self._image.shape[:2], "mask")
+        if mask is None:
+            mask = np.zeros(self._image.shape[:2], np.uint8)
+        else:
+            mask.fill(0)
+
+        (rho, theta) = lines[0][0]
+        a = np.cos(theta)
+        b = np.sin(theta)
+        x0 = a * rho
+        y0 = b * rho
+
+        pt1 = (int(x0 + 1000*(-b)), int(y0 + 1000*(a)))
+        pt2 = (int(x0 - 1000*(-b)), int(y0 - 1000*(a)))
+
+        cv2.line(mask, pt1, pt2, (255, 255, 255), line_width, cv2.LINE_AA)
+
+        #Inpainting only reads and writes within its radius of the line.
+        x, y, width, height = cv2.boundingRect(mask)
+        if width == 0:
+            self._image = output
+            return self
+
+        top, left = max(y - 2, 0), max(x - 2, 0)
+        bottom, right = y + height + 2, x + width + 2
+
+        output[top:bottom, left:right] = cv2.inpaint(self._image[top:bottom, left:right],
+            mask[top:bottom, left:right], 1, cv2.INPAINT_TELEA)
+
+        self._image = output
         return self
 
     '''
@@ -170,7 +347,7 @@ class ImageProcessing(ABC):
     '''
     def blur(self, blur_value):
         self._image = cv2.GaussianBlur(self._image, (int(blur_value),
-            int(blur_value)), 0)
+            int(blur_value)), 0, dst=self._output())
 
         return self
 
@@ -190,23 +367,22 @@ class ImageProcessing(ABC):
     def removeContours(self, margin_error):
         contours = self.findContours(cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
 
-        areas = [cv2.contourArea(c) for c in contours]
-        sorted_areas = sorted(zip(areas, contours), key=lambda x: x[0])
+        small_contours = [contour for contour in contours if cv2.contourArea(contour) <= margin_error]
+        if not small_contours:
+            return self
 
-        '''
-        contour_margin_error = 0
-        for i, (area, contour) in enumerate(sorted_areas):
-            if i == round(len(sorted_areas) / 2):
-                break
-            contour_margin_error += area
-
-        contour_margin_error += np.median([area for area, contours in sorted_areas])
-        contour_margin_error = round(contour_margin_error)
-        '''
+        #Every point of a small contour is erased with a dot, stamped at once by dilating the points.
+        dots = self._output(self._image.shape[:2], "dots")
+        if dots is None:
+            dots = np.zeros(self._image.shape[:2], np.uint8)
+        else:
+            dots.fill(0)
+
+        points = np.concatenate(small_contours).reshape(-1, 2)
+        dots[points[:, 1], points[:, 0]] = 255
 
-        for area, contour in sorted_areas:
-            if area <= margin_error:
-                cv2.drawContours(self._image, contour, -1, (0,0,0), 5)
+        self._image[cv2.dilate(dots, ImageProcessing.__dotKernel(5),
+            dst=self._output(self._image.shape[:2], "dilated")) > 0] = 0
 
         return self
 
@@ -216,7 +392,7 @@ class ImageProcessing(ABC):
         out the intensity range.
     '''
     def histogramEqualisation(self):
-        self._image = cv2.equalizeHist(self._image)
+        self._image = cv2.equalizeHist(self._image, dst=self._output())
 
         return self
 
@@ -225,8 +401,11 @@ class ImageProcessing(ABC):
             Adds a border to the image.
     '''
     def border(self, height, width, replicate = False, colour = [0,0,0]):
+        (h, w) = self._image.shape[:2]
+
         self._image = cv2.copyMakeBorder(self._image, height, height, width, width,
             cv2.BORDER_REPLICATE if replicate else cv2.BORDER_CONSTANT,
+            dst=self._output((h + 2 * height, w + 2 * width) + self._image.shape[2:]),
             value=colour)
 
         return self
@@ -246,7 +425,8 @@ class ImageProcessing(ABC):
         self.border(int((height - h) if height > h else (h - height) / 2.0),
             int((width - w) if width > w else (w - width) / 2.0), False)
 
-        self._image = cv2.resize(self._image, (width, height))
+        self._image = cv2.resize(self._image, (width, height),
+            dst=self._output((height, width) + self._image.shape[2:]))
 
         return self
 
@@ -320,16 +500,42 @@ class ImageProcessingString(ImageProcessing):
         return self._filename
 
 
-class ImageProcessingBase64(ImageProcessing):
+class ImageProcessingBytes(ImageProcessing):
 
     def __init__(self):
         super().__init__()
         return
 
     def importImage(self, image):
-        image = Image.open(io.BytesIO(base64.b64decode(image)))
+        '''
+        Decode an encoded PNG or JPEG image straight from its buffer, as cv2.imread would.
+        @params:
+            image   - Required  : encoded image (Bytes/Bytearray/Memoryview/File-like)
+        '''
+        if hasattr(image, "getbuffer"):
+            image = image.getbuffer()
+        elif hasattr(image, "read"):
+            image = image.read()
+
+        self._image = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if self._image is None:
+            raise Exception("Unable to decode image.")
 
-        self._image = cv2.cvtColor(np.array(image), cv2.COLOR_BGR2RGB)
         self._before_image = self._image
 
         return self
+
+
+class ImageProcessingBase64(ImageProcessingBytes):
+
+    def __init__(self):
+        super().__init__()
+        return
+
+    def importImage(self, image):
+        '''
+        Decode a Base64 PNG or JPEG image, raw bytes are imported by ImageProcessingBytes.
+        @params:
+            image   - Required  : Base64 image (Str/Bytes)
+        '''
+        return super().importImage(base64.b64decode(image))
@@ -0,0 +1,394 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+import json
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+class Engine(ABC):
+
+    '''
+        Runs a trained model's forward pass for Predict, with the Keras model predict interface.
+    '''
+
+    def __init__(self):
+        if type(self) is Engine:
+            raise Exception('Engine is an abstract class and cannot be instantiated.')
+
+    @abstractmethod
+    def load(self, model_path):
+        pass
+
+    @abstractmethod
+    def predict(self, sections, batch_size = None):
+        pass
+
+    @abstractmethod
+    def getSize(self):
+        '''
+            Approximate bytes held by the loaded weights.
+        '''
+        pass
+
+
+class KerasEngine(Engine):
+
+    def __init__(self):
+        super().__init__()
+        self.__model = None
+
+    def load(self, model_path):
+        #Keras is imported when a model is first loaded, not with the module.
+        from keras.models import load_model
+
+        self.__model = load_model(str(model_path))
+
+        return self
+
+    def predict(self, sections, batch_size = None):
+        return self.__model.predict(sections, batch_size=batch_size)
+
+    def getSize(self):
+        return sum(weight.nbytes for weight in self.__model.get_weights())
+
+
+class NumpyEngine(Engine):
+
+    '''
+        Keras free forward pass of the Sequential models built by Model.build, read from
+        their .hdf5 file or an exported .npz file.
+    '''
+
+    '''
+        Extension of an exported weight file.
+    '''
+    EXPORT_SUFFIX = ".npz"
+
+    __LAYERS_KEY = "layers"
+
+    '''
+        Supported Keras layers, each run by the method named after it, e.g. _conv2d.
+    '''
+    _LAYERS = ("conv2d", "maxpooling2d", "flatten", "dense", "dropout", "activation")
+
+    def __init__(self):
+        super().__init__()
+        self._layers = []
+
+    def load(self, model_path):
+        '''
+        Read the layers and weights of a model.
+        @params:
+            model_path   - Required  : .hdf5 model or exported .npz weights (Path)
+        '''
+        model_path = Path(model_path)
+        if not model_path.is_file():
+            raise Exception("No Model exists for: {}".format(str(model_path)))
+
+        if model_path.suffix == NumpyEngine.EXPORT_SUFFIX:
+            self._layers = self.__loadExport(model_path)
+        else:
+            self._layers = self.__loadHDF5(model_path)
+
+        for class_name, config, weights in self._layers:
+            if class_name.lower() not in NumpyEngine._LAYERS:
+                raise Exception("Unsupported layer {} in: {}".format(class_name, model_path))
+
+        return self
+
+    def export(self, export_path):
+        '''
+        Save the layers and weights to a compact .npz file that loads without h5py.
+        @params:
+            export_path   - Required  : .npz file path (Path)
+        '''
+        layers = self._exportLayers()
+        arrays = {NumpyEngine.__LAYERS_KEY: np.array(json.dumps([[class_name, config, len(weights)]
+            for class_name, config, weights in layers]))}
+
+        for index, (class_name, config, weights) in enumerate(layers):
+            for counter, weight in enumerate(weights):
+                arrays["{}_{}".format(index, counter)] = weight
+
+        np.savez(str(export_path), **arrays)
+
+        return self
+
+    def predict(self, sections, batch_size = None):
+        '''
+        Class probabilities for a batch of sections, batch_size is accepted for Keras parity.
+        @params:
+            sections     - Required  : character sections (numpy.ndarray (N, h, w, 1))
+            batch_size   - Optional  : ignored, the batch runs in one pass (Int)
+        '''
+        outputs = np.asarray(sections, dtype=np.float32)
+
+        for class_name, config, weights in self._layers:
+            outputs = getattr(self, "_" + class_name.lower())(outputs, config, weights)
+
+        return outputs
+
+    def getSize(self):
+        return sum(weight.nbytes for class_name, config, weights in self._layers for weight in weights)
+
+    def _exportLayers(self):
+        '''
+            The layers and weights as they are saved.
+        '''
+        return self._layers
+
+    def __loadHDF5(self, model_path):
+        import h5py
+
+        with h5py.File(str(model_path), "r") as model_file:
+            model_config = model_file.attrs["model_config"]
+            model_config = json.loads(model_config.decode("utf-8")
+                if isinstance(model_config, bytes) else model_config)
+
+            #Keras 2.2 nests the layers under "layers", earlier versions list them directly.
+            layers = model_config["config"]
+            if isinstance(layers, dict):
+                layers = layers["layers"]
+
+            weights_group = model_file["model_weights"] if "model_weights" in model_file else model_file
+
+            loaded_layers = []
+            for layer in layers:
+                config = layer["config"]
+                layer_group = weights_group[config["name"]]
+
+                weight_names = [name.decode("utf-8") if isinstance(name, bytes) else name
+                    for name in layer_group.attrs.get("weight_names", [])]
+
+                loaded_layers.append((layer["class_name"], config,
+                    [np.array(layer_group[name], dtype=np.float32) for name in weight_names]))
+
+        return loaded_layers
+
+    def __loadExport(self, model_path):
+        with np.load(str(model_path), allow_pickle=False) as export:
+            return [(class_name, config, [export["{}_{}".format(index, counter)]
+                for counter in range(weight_count)])
+                for index, (class_name, config, weight_count)
+                in enumerate(json.loads(str(export[NumpyEngine.__LAYERS_KEY])))]
+
+    def __activate(self, outputs, activation):
+        if activation == "relu":
+            return np.maximum(outputs, 0, out=outputs)
+
+        if activation == "softmax":
+            outputs = np.exp(outputs - outputs.max(axis=-1, keepdims=True))
+            return outputs / outputs.sum(axis=-1, keepdims=True)
+
+        if activation == "linear":
+            return outputs
+
+        raise Exception("Unsupported activation: {}".format(activation))
+
+    def __windows(self, inputs, window_size, strides):
+        '''
+            View of every window of an NHWC tensor, shape (N, out_h, out_w, window_h, window_w, C).
+        '''
+        (batch, height, width, channels) = inputs.shape
+        out_height = (height - window_size[0]) // strides[0] + 1
+        out_width = (width - window_size[1]) // strides[1] + 1
+
+        (batch_stride, height_stride, width_stride, channel_stride) = inputs.strides
+
+        return as_strided(inputs, shape=(batch, out_height, out_width, window_size[0],
+            window_size[1], channels), strides=(batch_stride, height_stride * strides[0],
+            width_stride * strides[1], height_stride, width_stride, channel_stride), writeable=False)
+
+    def __pad(self, inputs, window_size, strides, value = 0):
+        '''
+            Keras "same" padding, any odd pixel is added to the bottom and right.
+        '''
+        padding = []
+        for size, window, stride in zip(inputs.shape[1:3], window_size, strides):
+            total = max((-(-size // stride) - 1) * stride + window - size, 0)
+            padding.append((total // 2, total - total // 2))
+
+        return np.pad(inputs, [(0, 0)] + padding + [(0, 0)], mode="constant",
+            constant_values=value)
+
+    def _inputs(self, inputs, config, weights):
+        '''
+            Inputs of a Conv2D or Dense layer, before its windows are taken.
+        '''
+        return inputs
+
+    def _product(self, inputs, config, weights):
+        '''
+            Inputs multiplied by a Conv2D or Dense kernel, plus its bias.
+        '''
+        kernel = weights[0]
+        outputs = np.dot(inputs, kernel.reshape(-1, kernel.shape[-1]))
+
+        if config.get("use_bias", True):
+            outputs += weights[1]
+
+        return outputs
+
+    def _conv2d(self, inputs, config, weights):
+        if config.get("data_format", "channels_last") != "channels_last" \
+            or tuple(config.get("dilation_rate", (1, 1))) != (1, 1):
+            raise Exception("Unsupported Conv2D configuration: {}".format(config["name"]))
+
+        inputs = self._inputs(inputs, config, weights)
+
+        kernel = weights[0]
+        window_size = kernel.shape[:2]
+        strides = config.get("strides", (1, 1))
+
+        if config.get("padding", "valid") == "same":
+            inputs = self.__pad(inputs, window_size, strides)
+
+        windows = self.__windows(inputs, window_size, strides)
+        (batch, out_height, out_width) = windows.shape[:3]
+
+        #im2col, each window becomes a row multiplied by the flattened kernel.
+        outputs = self._product(windows.reshape(batch * out_height * out_width, -1), config, weights)
+
+        return self.__activate(outputs.reshape(batch, out_height, out_width, kernel.shape[3]),
+            config.get("activation", "linear"))
+
+    def _maxpooling2d(self, inputs, config, weights):
+        pool_size = config.get("pool_size", (2, 2))
+        strides = config.get("strides") or pool_size
+
+        if config.get("padding", "valid") == "same":
+            #Padding never wins the maximum.
+            inputs = self.__pad(inputs, pool_size, strides, -np.inf)
+
+        return self.__windows(inputs, pool_size, strides).max(axis=(3, 4))
+
+    def _flatten(self, inputs, config, weights):
+        return inputs.reshape(len(inputs), -1)
+
+    def _dense(self, inputs, config, weights):
+        inputs = self._inputs(inputs, config, weights)
+
+        return self.__activate(self._product(inputs, config, weights),
+            config.get("activation", "linear"))
+
+    def _dropout(self, inputs, config, weights):
+        return inputs
+
+    def _activation(self, inputs, config, weights):
+        return self.__activate(inputs, config["activation"])
+
+
+class QuantizedEngine(NumpyEngine):
+
+    '''
+        Post-training int8 quantization of the NumpyEngine models. Conv2D and Dense kernels are
+        stored as int8 with a scale per output channel and their inputs are quantized to uint8
+        with a scale calibrated on character sections. NumPy has no fast integer matrix product,
+        so kernels are dequantized to float32 once when they are loaded or quantized and only
+        saved as int8.
+    '''
+
+    EXPORT_SUFFIX = ".int8.npz"
+
+    __QUANTIZED_LAYERS = ("conv2d", "dense")
+    __KERNEL_LEVELS = 127
+    __INPUT_LEVELS = 255
+
+    def load(self, model_path):
+        '''
+        Read the layers and weights of a quantized model.
+        @params:
+            model_path   - Required  : exported .int8.npz weights (Path)
+        '''
+        super().load(model_path)
+
+        for class_name, config, weights in self._layers:
+            if class_name.lower() in QuantizedEngine.__QUANTIZED_LAYERS \
+                and weights[0].dtype != np.int8:
+                raise Exception("Model is not quantized: {}".format(str(model_path)))
+
+        self._layers = self.__dequantizeLayers(self._layers)
+
+        return self
+
+    def quantize(self, engine, calibration_sections):
+        '''
+        Quantize a float model, each layer's input range is calibrated on character sections.
+        @params:
+            engine                - Required  : loaded float model (NumpyEngine)
+            calibration_sections  - Required  : character sections (numpy.ndarray (N, h, w, 1))
+        '''
+        outputs = np.asarray(calibration_sections, dtype=np.float32)
+        if len(outputs) == 0:
+            raise Exception("No calibration sections supplied for quantization.")
+
+        layers = []
+        for class_name, config, weights in engine._layers:
+            if class_name.lower() in QuantizedEngine.__QUANTIZED_LAYERS:
+                layers.append((class_name, config, self.__quantizeLayer(class_name, config,
+                    weights, outputs)))
+            else:
+                layers.append((class_name, config, weights))
+
+            outputs = getattr(engine, "_" + class_name.lower())(outputs, config, weights)
+
+        self._layers = self.__dequantizeLayers(layers)
+
+        return self
+
+    def _exportLayers(self):
+        '''
+            Kernels rounded back to their int8 levels.
+        '''
+        return [(class_name, config, [np.rint(weights[0] / weights[2]).astype(np.int8)] + weights[1:])
+            if class_name.lower() in QuantizedEngine.__QUANTIZED_LAYERS else (class_name, config, weights)
+            for class_name, config, weights in self._layers]
+
+    def __dequantizeLayers(self, layers):
+        '''
+            [float32 kernel of the int8 levels times their scale, bias, kernel scale, input scale]
+        '''
+        return [(class_name, config, [(weights[0] * weights[2]).astype(np.float32)] + weights[1:])
+            if class_name.lower() in QuantizedEngine.__QUANTIZED_LAYERS else (class_name, config, weights)
+            for class_name, config, weights in layers]
+
+    def __quantizeLayer(self, class_name, config, weights, inputs):
+        '''
+            [int8 kernel, bias, kernel scale per output channel, input scale]
+        '''
+        #Inputs are pixels or ReLU outputs, so uint8 covers them without a zero point.
+        if inputs.min() < 0:
+            raise Exception("Cannot quantize {}, its inputs are negative.".format(config["name"]))
+
+        input_scale = max(float(inputs.max()), np.finfo(np.float32).tiny) \
+            / QuantizedEngine.__INPUT_LEVELS
+
+        kernel = weights[0]
+        kernel_scale = np.abs(kernel.reshape(-1, kernel.shape[-1])).max(axis=0) \
+            / QuantizedEngine.__KERNEL_LEVELS
+        kernel_scale[kernel_scale == 0] = 1
+
+        bias = weights[1] if config.get("use_bias", True) else np.zeros(kernel.shape[-1])
+
+        return [np.round(kernel / kernel_scale).astype(np.int8), bias.astype(np.float32),
+            kernel_scale.astype(np.float32), np.array(input_scale, dtype=np.float32)]
+
+    def _inputs(self, inputs, config, weights):
+        '''
+            Inputs rounded to their uint8 levels, before Conv2D multiplies each one per window.
+        '''
+        quantized = np.divide(inputs, weights[3], dtype=np.float32)
+        np.rint(quantized, out=quantized)
+
+        return np.clip(quantized, 0, QuantizedEngine.__INPUT_LEVELS, out=quantized)
+
+    def _product(self, inputs, config, weights):
+        (kernel, bias, kernel_scale, input_scale) = weights
+
+        outputs = np.dot(inputs, kernel.reshape(-1, kernel.shape[-1]))
+
+        outputs *= input_scale
+        outputs += bias
+
+        return outputs
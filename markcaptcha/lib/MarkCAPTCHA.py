@@ -1,7 +1,24 @@
 from lib.Factory import Factory
 from pathlib import Path
+import numpy as np
+
+import sys, io, base64, multiprocessing, random, hashlib, json, shutil, threading
+
+class SerialPool():
+
+    '''
+        Runs pool work in the calling process, used when processImages has one worker.
+    '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+    def imap(self, function, iterable, chunksize = 1):
+        return map(function, iterable)
 
-import sys, io, base64
 
 class MarkCAPTCHA():
 
@@ -9,6 +26,11 @@ class MarkCAPTCHA():
         Facade Design Pattern
     '''
 
+    '''
+        Default amount of characters classified per model call in predictBatch.
+    '''
+    BATCH_SIZE = 256
+
     '''
         Constant Variables for a CAPTCHA json file.
     '''
@@ -19,6 +41,10 @@ class MarkCAPTCHA():
     __CONFIG_THRESHOLD = "threshold"
     __CONFIG_MODEL_FILENAME = "model_filename"
     __CONFIG_LABEL_FILENAME = "label_filename"
+    __CONFIG_SEGMENTATION = "segmentation"
+    __CONFIG_REQUIRED = (__CONFIG_FOLDER, __CONFIG_FUNCTIONS, __CONFIG_PREVIEW,
+        __CONFIG_CAPTCHA_LENGTH, __CONFIG_THRESHOLD, __CONFIG_MODEL_FILENAME,
+        __CONFIG_LABEL_FILENAME)
 
     '''
         ... for paths.
@@ -26,6 +52,8 @@ class MarkCAPTCHA():
     __PATH_CAPTCHAS = "data/captchas/"
     __PATH_MODELS = "data/models/"
     __PATH_CHARACTERS = "characters/"
+    __PATH_CHARACTERS_CACHE = "characters"
+    __PATH_SHARDS = "shards/"
     __PATH_CONFIG_CAPTCHA = "data/configs/captchas/"
     __PATH_CONFIG_MODEL = "data/configs/models/"
     __PATH_CLEANED_FOLDER = "cleaned/"
@@ -45,17 +73,124 @@ class MarkCAPTCHA():
     __MODEL_POOL_SIZE = "pool_size"
     __MODEL_STRIDE = "stride"
     __MODEL_PREVIEW = "preview"
+    __MODEL_BACKEND = "backend"
+    __MODEL_QUANTIZATION_MARGIN = "quantization_margin"
+
+    '''
+        Optional training keys, passed to Model.initialise by the same name.
+    '''
+    __MODEL_BATCH_SIZE = "batch_size"
+    __MODEL_SHUFFLE_BUFFER = "shuffle_buffer"
+    __MODEL_WORKERS = "workers"
+    __MODEL_PREFETCH = "prefetch"
+    __MODEL_PATIENCE = "patience"
+    __MODEL_TRAINING_INPUT = (__MODEL_BATCH_SIZE, __MODEL_SHUFFLE_BUFFER, __MODEL_WORKERS,
+        __MODEL_PREFETCH, __MODEL_PATIENCE)
 
-    def __init__(self):
+    '''
+        Largest accuracy drop accepted from an int8 model, and the most character
+        sections its input ranges are calibrated on.
+    '''
+    __DEFAULT_QUANTIZATION_MARGIN = 0.01
+    __QUANTIZATION_CALIBRATION_SIZE = 1000
+
+    '''
+        Inference engines for the model backend, keras when it isn't set.
+    '''
+    __BACKEND_KERAS = "keras"
+    __BACKEND_NUMPY = "numpy"
+    __BACKEND_INT8 = "int8"
+    __BACKEND_ENGINES = {
+        __BACKEND_KERAS : Factory.CLASS_ENGINE_KERAS,
+        __BACKEND_NUMPY : Factory.CLASS_ENGINE_NUMPY,
+        __BACKEND_INT8 : Factory.CLASS_ENGINE_QUANTIZED,
+    }
+
+    '''
+        Encoded image buffers predict accepts, a str is Base64 and a Path is an image file.
+    '''
+    __BUFFER_TYPES = (bytes, bytearray, memoryview)
+
+    '''
+        Shard writers of this process by shards folder and image size.
+    '''
+    __shard_writers = {}
+
+    '''
+        Prediction metrics, every series is labelled by config.
+    '''
+    METRIC_STAGE_SECONDS = "markcaptcha_stage_seconds"
+    METRIC_PREDICTIONS = "markcaptcha_predictions_total"
+    METRIC_SEGMENTATION_FAILURES = "markcaptcha_segmentation_failures_total"
+    METRIC_CACHE_HITS = "markcaptcha_cache_hits_total"
+    METRIC_CACHE_MISSES = "markcaptcha_cache_misses_total"
+    METRIC_MODEL_LOADS = "markcaptcha_model_loads_total"
+    METRIC_MODEL_LOAD_SECONDS = "markcaptcha_model_load_seconds"
+    METRIC_RELOADS = "markcaptcha_reloads_total"
+    METRIC_RELOAD_FAILURES = "markcaptcha_reload_failures_total"
+
+    '''
+        ... for the stage label, from decoding an image to predicting its text.
+    '''
+    STAGE_DECODE = "decode"
+    STAGE_CLEAN = "clean"
+    STAGE_PRESEGMENT = "presegment"
+    STAGE_SEGMENT = "segment"
+    STAGE_SECTIONS = "sections"
+    STAGE_INFERENCE = "inference"
+    STAGE_PREDICT = "predict"
+    STAGE_PREDICT_BATCH = "predict_batch"
+
+    def __init__(self, inplace = False, model_budget = None, metrics = True):
+        '''
+        @params:
+            inplace       - Optional  : reuse scratch buffers for the images cleaned by predict
+                                        and predictBatch, an instance must then not predict
+                                        from several threads at once (Bool)
+            model_budget  - Optional  : bytes of model weights kept loaded, least recently
+                                        used models are evicted past it, None is unlimited (Int)
+            metrics       - Optional  : record stage times and counters of predictions (Bool)
+        '''
         self.__image_configs = {}
         self.__model_config = None
         self.__image_filename = None
-        self.__predictors = {}
+        self.__predictors = Factory().create(Factory.CLASS_REGISTRY).initialise(model_budget)
+        self.__pipelines = {}
+        self.__scratch = Factory().create(Factory.CLASS_SCRATCHBUFFERS) if inplace else None
+        self.__cache = None
+        self.__metrics = self.__createMetrics(metrics)
+        self.__fingerprints = {}
+        self.__failed_fingerprints = {}
+        self.__result_versions = {}
+        self.__reload_lock = threading.Lock()
+        self.__watcher = None
+        self.__watching = threading.Event()
         return
 
-    def __preSegmentImage(self, image_object):
+    def useCache(self, capacity, path = None, disk_capacity = None):
+        '''
+        Cache predictions by image content, a config, model.json, model or labels file
+        changed by a reload, processImages, a build or export, or loaded again after an
+        eviction starts a new version so older results are never returned.
+        @params:
+            capacity        - Required  : results kept in memory (Int)
+            path            - Optional  : SQLite file shared by worker processes (Str)
+            disk_capacity   - Optional  : results kept in the SQLite file (Int)
+        '''
+        cache_class = Factory.getClass(Factory.CLASS_RESULTCACHE)
+        self.__cache = cache_class().initialise(capacity, path,
+            cache_class.DISK_CAPACITY if disk_capacity is None else disk_capacity)
+        return self
+
+    @staticmethod
+    def preSegmentImage(image_object):
+        '''
+        Binarise and pad a cleaned CAPTCHA the way segmentation expects it.
+        @params:
+            image_object  - Required  : cleaned CAPTCHA (ImageProcessing)
+        '''
         if image_object is None:
-            raise Exception("Null image object supplied to function _preSegmentImage.")
+            raise Exception("Null image object supplied to function preSegmentImage.")
 
         return image_object.grey().threshold(0).border(4, 4).fillHoles()
 
@@ -65,69 +200,289 @@ class MarkCAPTCHA():
         for config in path.glob('*.json'):
             self.__image_configs[config.name] = Factory().create(Factory.CLASS_JSONPARSER) \
                                                 .parse(str(config))
+            self.__pipelines[config.name] = self.__compileConfig(config.name,
+                self.__image_configs[config.name].getParsedContent())
 
         if len(self.__image_configs) == 0:
             raise Exception("No configurations found: {}".format(path))
 
-        self.__model_config = Factory().create(Factory.CLASS_JSONPARSER) \
-                .parse(MarkCAPTCHA.__PATH_CONFIG_MODEL +
-                    MarkCAPTCHA.__FILENAME_MODEL_JSON)
+        self.__model_config = self.__parseModelConfig()
+
+        self.__fingerprints = {config_filename : self.__fingerprint(config_filename)
+            for config_filename in list(self.__image_configs) + [MarkCAPTCHA.__FILENAME_MODEL_JSON]}
+
+        return self
+
+    def reload(self):
+        '''
+        Reload the configs whose CAPTCHA config, model or labels file changed, and every config
+        when model.json changed. New models are loaded and warmed up before they replace the
+        old ones, predictions already running finish with the old model. A config that fails
+        to load keeps its loaded version until its files change again.
+        Returns the reloaded config filenames.
+        '''
+        with self.__reload_lock:
+            return self.__reload(self.__changedFiles())
+
+    def watch(self, interval = 5):
+        '''
+        Reload changed files from a background thread. A change is only reloaded once its files
+        are unchanged for an interval, so a model and labels file being saved are loaded together.
+        @params:
+            interval   - Optional  : seconds between checks (Float)
+        '''
+        if interval <= 0:
+            raise Exception("Invalid reload interval supplied: {}".format(interval))
+
+        self.stopWatching()
+        self.__watching.clear()
+        self.__watcher = threading.Thread(target=self.__watch, args=(interval,), daemon=True)
+        self.__watcher.start()
+
+        return self
+
+    def stopWatching(self):
+        if self.__watcher is not None:
+            self.__watching.set()
+            self.__watcher.join()
+            self.__watcher = None
 
         return self
 
-    def processImages(self, config_filename):
+    def processImages(self, config_filename, workers = 1, stream = False, save_cleaned = True,
+        sample = None, seed = None, shards = False):
+        '''
+        Clean and segment the config CAPTCHAs, calibrate its threshold and save their characters.
+        @params:
+            config_filename  - Required  : CAPTCHA config filename (Str)
+            workers          - Optional  : processes used to clean and segment (Int)
+            stream           - Optional  : two passes holding no images between them (Bool)
+            save_cleaned     - Optional  : write cleaned CAPTCHAs to the cleaned folder (Bool)
+            sample           - Optional  : calibrate the threshold from a random subset of
+                                           this many CAPTCHAs, implies stream (Int)
+            seed             - Optional  : random seed for the sample (Int)
+            shards           - Optional  : append the characters to shards at the model image
+                                           size, replacing the config's earlier shards, instead
+                                           of saving each one as a PNG (Bool)
+        '''
         print("{}:".format(config_filename))
+        self.__checkForConfig(config_filename)
         config = self.__image_configs[config_filename]
         captcha_config = config.getParsedContent()
 
-        captcha_images = list(Path(MarkCAPTCHA.__PATH_CAPTCHAS +
+        if workers <= 0:
+            raise Exception("Invalid amount of workers supplied: {}".format(workers))
+
+        captcha_images = sorted(Path(MarkCAPTCHA.__PATH_CAPTCHAS +
             captcha_config[MarkCAPTCHA.__CONFIG_FOLDER]).glob("*.png"))
         total_captcha_images = len(captcha_images)
 
         if total_captcha_images <= 0:
             raise Exception("No CAPTCHA images exist in {}".format(captcha_config[MarkCAPTCHA.__CONFIG_FOLDER]))
 
-        counter = 1
-        outliers = Factory().create(Factory.CLASS_OUTLIERS)
-        for captcha in captcha_images:
+        if sample is not None and sample <= 0:
+            raise Exception("Invalid sample size supplied: {}".format(sample))
 
-            self.printProgress(counter, total_captcha_images,
-                "Image Processing:", bar_length=25)
+        #Only the calibration pass is sampled, every CAPTCHA is still segmented.
+        sampled = sample is not None
+        calibration_images = captcha_images
+        if sampled:
+            stream = True
+            calibration_images = sorted(random.Random(seed).sample(captcha_images,
+                min(sample, total_captcha_images)))
+        total_calibration_images = len(calibration_images)
 
-            cleaned_image = Factory().create(Factory.CLASS_IMAGEPROCESSING_STRING) \
-                .importImage(Path(captcha))
+        pipeline = self.__pipelines[config_filename]
+        preview = captcha_config[MarkCAPTCHA.__CONFIG_PREVIEW]
+        captcha_length = captcha_config[MarkCAPTCHA.__CONFIG_CAPTCHA_LENGTH]
+        backend = self.__segmentationBackend(captcha_config)
 
-            cleaned_image = self.__classFunctionsFromJSON(config.getParsedContent()[MarkCAPTCHA.__CONFIG_FUNCTIONS], cleaned_image)
+        cleaned_folder = Path(MarkCAPTCHA.__PATH_CAPTCHAS + captcha_config[MarkCAPTCHA.__CONFIG_FOLDER] +
+            MarkCAPTCHA.__PATH_CLEANED_FOLDER) if save_cleaned else None
+        characters_folder = Path(MarkCAPTCHA.__PATH_CAPTCHAS +
+            captcha_config[MarkCAPTCHA.__CONFIG_FOLDER] + MarkCAPTCHA.__PATH_CHARACTERS)
 
-            captcha_saved_path = cleaned_image.save(Path(MarkCAPTCHA.__PATH_CAPTCHAS +
-                captcha_config[MarkCAPTCHA.__CONFIG_FOLDER] + MarkCAPTCHA.__PATH_CLEANED_FOLDER),
-                captcha_config[MarkCAPTCHA.__CONFIG_PREVIEW])
-            counter += 1
+        #Characters are saved as PNGs without a shard image size.
+        shard_size = None
+        if shards:
+            characters_folder = Factory.getClass(Factory.CLASS_SHARDS) \
+                .createRun(self.__shardsPath(captcha_config))
+            shard_size = self.__model_config.getParsedContent()[MarkCAPTCHA.__MODEL_IMAGE_SIZE]
 
-            outliers.addImageObject(self.__preSegmentImage(Factory().create(
-                Factory.CLASS_IMAGEPROCESSING_STRING) \
-                    .importImage(Path(captcha_saved_path))))
+        try:
+            with self.__workerPool(workers) as pool:
+                outliers = Factory().create(Factory.CLASS_OUTLIERS).setBackend(backend)
 
-        print("Finding Outliers . . .")
-        outliers.doOutliers(captcha_config[MarkCAPTCHA.__CONFIG_CAPTCHA_LENGTH][1])
+                if stream:
+                    #Only the aspect ratios of each CAPTCHA are kept for calibration.
+                    results = pool.imap(MarkCAPTCHA._calibrateWorker, ((pipeline, captcha,
+                        None if sampled else cleaned_folder, preview, captcha_length[1], backend)
+                        for captcha in calibration_images),
+                        self.__chunkSize(total_calibration_images, workers))
+                else:
+                    results = pool.imap(MarkCAPTCHA._cleanWorker, ((pipeline, captcha,
+                        cleaned_folder, preview) for captcha in captcha_images),
+                        self.__chunkSize(total_captcha_images, workers))
 
-        config.addValue(str(Path(MarkCAPTCHA.__PATH_CONFIG_CAPTCHA + config_filename)),
-            MarkCAPTCHA.__CONFIG_THRESHOLD, outliers.getMinOutlier())
+                for counter, result in enumerate(results):
+                    self.printProgress(counter + 1, total_calibration_images,
+                        "Image Processing:", bar_length=25)
 
-        number_of_images = outliers.getSumImageObjects()
-        for counter in range(number_of_images):
-            self.printProgress(counter + 1, number_of_images,
-                "Segmenting:", bar_length=25)
+                    if stream:
+                        outliers.addAspectRatios(result)
+                    else:
+                        outliers.addImageObject(result)
+
+                print("Finding Outliers . . .")
+                outliers.doOutliers(captcha_length[1])
+
+                config.addValue(str(Path(MarkCAPTCHA.__PATH_CONFIG_CAPTCHA + config_filename)),
+                    MarkCAPTCHA.__CONFIG_THRESHOLD, outliers.getMinOutlier())
+
+                #The new threshold is in use, so it starts a new result version rather than a reload.
+                with self.__reload_lock:
+                    self.__fingerprints[config_filename] = self.__fingerprint(config_filename)
+
+                if sampled:
+                    print("Threshold: {} (95% confidence interval {} - {}, sampled {} of {} CAPTCHAs)" \
+                        .format(outliers.getMinOutlier(), *outliers.getMinOutlierInterval(seed=seed),
+                            total_calibration_images, total_captcha_images))
+
+                if stream:
+                    #The segments are re-derived from the source CAPTCHAs.
+                    number_of_images = total_captcha_images
+                    results = pool.imap(MarkCAPTCHA._extractWorker, ((pipeline, captcha,
+                        cleaned_folder if sampled else None, captcha_length, outliers.getMinOutlier(),
+                        characters_folder, backend, shard_size) for captcha in captcha_images),
+                        self.__chunkSize(number_of_images, workers))
+                else:
+                    number_of_images = outliers.getSumImageObjects()
+                    results = pool.imap(MarkCAPTCHA._segmentWorker, ((outliers.getImageObject(),
+                        captcha_length, outliers.getMinOutlier(), characters_folder, backend, shard_size)
+                        for _ in range(number_of_images)), self.__chunkSize(number_of_images, workers))
+
+                for counter, _ in enumerate(results):
+                    self.printProgress(counter + 1, number_of_images,
+                        "Segmenting:", bar_length=25)
+        except BaseException:
+            #An unfinished run is never published.
+            if shard_size is not None:
+                MarkCAPTCHA.__closeShardWriter(characters_folder, shard_size)
+                shutil.rmtree(str(characters_folder), ignore_errors=True)
+            raise
+
+        if shard_size is not None:
+            MarkCAPTCHA.__closeShardWriter(characters_folder, shard_size)
+            Factory.getClass(Factory.CLASS_SHARDS).publish(self.__shardsPath(captcha_config),
+                characters_folder)
 
-            Factory().create(Factory.CLASS_SEGMENT) \
-                .segment(outliers.getImageObject(), captcha_config[MarkCAPTCHA.__CONFIG_CAPTCHA_LENGTH],
-                    outliers.getMinOutlier()) \
-                .saveCharacters(Path(MarkCAPTCHA.__PATH_CAPTCHAS +
-                    captcha_config[MarkCAPTCHA.__CONFIG_FOLDER] +
-                    MarkCAPTCHA.__PATH_CHARACTERS))
         return self
 
-    def buildModel(self, config_filename):
+    @staticmethod
+    def _cleanWorker(task):
+        '''
+        Clean, optionally save, and pre-segment a single CAPTCHA, run serially or in a worker process.
+        @params:
+            task   - Required  : pipeline, CAPTCHA path, cleaned folder or None and preview (Tuple)
+        '''
+        (pipeline, captcha, cleaned_folder, preview) = task
+
+        cleaned_image = pipeline.apply(Factory().create(Factory.CLASS_IMAGEPROCESSING_STRING) \
+            .importImage(Path(captcha)))
+
+        if cleaned_folder is not None:
+            cleaned_image.save(cleaned_folder, preview)
+
+        return MarkCAPTCHA.preSegmentImage(cleaned_image)
+
+    @staticmethod
+    def _calibrateWorker(task):
+        '''
+        Clean a single CAPTCHA and return only the aspect ratios of its largest contours.
+        @params:
+            task   - Required  : pipeline, CAPTCHA path, cleaned folder or None, preview,
+                                 maximum CAPTCHA length and segmentation backend (Tuple)
+        '''
+        (pipeline, captcha, cleaned_folder, preview, captcha_length, backend) = task
+
+        return Factory().create(Factory.CLASS_OUTLIERS).setBackend(backend).getAspectRatios(
+            MarkCAPTCHA._cleanWorker((pipeline, captcha, cleaned_folder, preview)), captcha_length)
+
+    @staticmethod
+    def _segmentWorker(task):
+        '''
+        Segment a pre-segmented CAPTCHA and save its characters, or append them to a shard.
+        @params:
+            task   - Required  : image object, CAPTCHA length, threshold, characters or shards
+                                 folder, segmentation backend and shard image size or None (Tuple)
+        '''
+        (image_object, captcha_length, threshold, characters_folder, backend, shard_size) = task
+
+        segmented_captcha = Factory().create(Factory.CLASS_SEGMENT).setBackend(backend) \
+            .segment(image_object, captcha_length, threshold)
+
+        if shard_size is None:
+            segmented_captcha.saveCharacters(characters_folder)
+        else:
+            segmented_captcha.appendCharacters(MarkCAPTCHA.__shardWriter(characters_folder, shard_size))
+
+    @staticmethod
+    def _extractWorker(task):
+        '''
+        Clean and pre-segment a CAPTCHA again, then segment it and save its characters.
+        @params:
+            task   - Required  : pipeline, CAPTCHA path, cleaned folder or None, CAPTCHA length,
+                                 threshold, characters or shards folder, segmentation backend
+                                 and shard image size or None (Tuple)
+        '''
+        (pipeline, captcha, cleaned_folder, captcha_length, threshold, characters_folder, backend,
+            shard_size) = task
+
+        MarkCAPTCHA._segmentWorker((MarkCAPTCHA._cleanWorker((pipeline, captcha, cleaned_folder, False)),
+            captcha_length, threshold, characters_folder, backend, shard_size))
+
+    @staticmethod
+    def __shardWriter(shards_folder, image_size):
+        '''
+            The shard writer of this process, each worker process appends to its own shard.
+        '''
+        key = (str(shards_folder), tuple(image_size))
+        if key not in MarkCAPTCHA.__shard_writers:
+            MarkCAPTCHA.__shard_writers[key] = Factory().create(Factory.CLASS_SHARDWRITER) \
+                .open(shards_folder, image_size)
+
+        return MarkCAPTCHA.__shard_writers[key]
+
+    @staticmethod
+    def __closeShardWriter(shards_folder, image_size):
+        writer = MarkCAPTCHA.__shard_writers.pop((str(shards_folder), tuple(image_size)), None)
+        if writer is not None:
+            writer.close()
+
+    def __workerPool(self, workers):
+        '''
+            A process pool, or an in-process stand in when only one worker is requested.
+        '''
+        if workers == 1:
+            return SerialPool()
+
+        return multiprocessing.Pool(workers)
+
+    def __chunkSize(self, total, workers):
+        return max(1, total // (workers * 4))
+
+    def buildModel(self, config_filename, resume = False, finetune = False):
+        '''
+        Train a config's model on its extracted characters.
+        @params:
+            config_filename  - Required  : CAPTCHA config filename (Str)
+            resume           - Optional  : continue the checkpoint of an interrupted build (Bool)
+            finetune         - Optional  : continue training the saved model on the current
+                                           characters, including new labels (Bool)
+        '''
+        if resume and finetune:
+            raise Exception("A build can either resume or fine tune, not both.")
+
         model_config = self.__model_config.getParsedContent()
         model = Factory().create(Factory.CLASS_MODEL) \
             .initialise(model_config[MarkCAPTCHA.__MODEL_IMAGE_SIZE],
@@ -135,86 +490,792 @@ class MarkCAPTCHA():
                 model_config[MarkCAPTCHA.__MODEL_ITERATIONS],
                 model_config[MarkCAPTCHA.__MODEL_TESTING_RATIO],
                 model_config[MarkCAPTCHA.__MODEL_POOL_SIZE],
-                model_config[MarkCAPTCHA.__MODEL_STRIDE])
+                model_config[MarkCAPTCHA.__MODEL_STRIDE],
+                **{key : model_config[key] for key in MarkCAPTCHA.__MODEL_TRAINING_INPUT
+                    if key in model_config})
 
         self.__checkForConfig(config_filename)
         config = self.__image_configs[config_filename]
         captcha_config = config.getParsedContent()
 
-        model.train(Factory().create(Factory.CLASS_IMAGEPROCESSING_STRING),
-            Path((MarkCAPTCHA.__PATH_CAPTCHAS + captcha_config[MarkCAPTCHA.__CONFIG_FOLDER]
-                + MarkCAPTCHA.__PATH_CHARACTERS))) \
+        model.train(self.__characterDataset(captcha_config)) \
             .build(Factory().create(Factory.CLASS_PICKLEPARSER),
                 MarkCAPTCHA.__PATH_MODELS + captcha_config[MarkCAPTCHA.__CONFIG_LABEL_FILENAME],
                 MarkCAPTCHA.__PATH_MODELS + captcha_config[MarkCAPTCHA.__CONFIG_MODEL_FILENAME],
-                model_config[MarkCAPTCHA.__MODEL_PREVIEW])
+                model_config[MarkCAPTCHA.__MODEL_PREVIEW], resume, finetune)
+
+        self.__modelWritten(config_filename)
 
         return self
 
+    def exportModel(self, config_filename):
+        '''
+        Export a config's model weights to a .npz file the numpy backend loads without h5py.
+        @params:
+            config_filename  - Required  : CAPTCHA config filename (Str)
+        '''
+        self.__checkForConfig(config_filename)
+        captcha_config = self.__image_configs[config_filename].getParsedContent()
+
+        model_path = Path(MarkCAPTCHA.__PATH_MODELS + captcha_config[MarkCAPTCHA.__CONFIG_MODEL_FILENAME])
+        engine_class = Factory.getClass(Factory.CLASS_ENGINE_NUMPY)
+        export_path = model_path.with_suffix(engine_class.EXPORT_SUFFIX)
+
+        engine_class().load(model_path).export(export_path)
+        self.__modelWritten(config_filename)
+
+        return str(export_path)
+
+    def quantizeModel(self, config_filename):
+        '''
+        Export a config's model with int8 weights for the int8 backend. Nothing is written
+        when its accuracy on held out characters falls more than the model.json
+        quantization_margin below the float model's.
+        @params:
+            config_filename  - Required  : CAPTCHA config filename (Str)
+        '''
+        self.__checkForConfig(config_filename)
+        captcha_config = self.__image_configs[config_filename].getParsedContent()
+        model_config = self.__model_config.getParsedContent()
+
+        dataset = self.__characterDataset(captcha_config)
+        (sections, labels) = (dataset.getImages(), dataset.getLabels())
+
+        if len(sections) < 2:
+            raise Exception("Not enough characters to quantize the model: {}".format(len(sections)))
+
+        #The test split Model.build held out, scikit-learn is only imported to quantize.
+        from sklearn.model_selection import train_test_split
+        (training, testing) = train_test_split(np.arange(len(sections)),
+            test_size=model_config[MarkCAPTCHA.__MODEL_TESTING_RATIO], random_state=0)
+        calibration = training[:MarkCAPTCHA.__QUANTIZATION_CALIBRATION_SIZE]
+
+        model_path = Path(MarkCAPTCHA.__PATH_MODELS + captcha_config[MarkCAPTCHA.__CONFIG_MODEL_FILENAME])
+        label_binary = Factory().create(Factory.CLASS_PICKLEPARSER) \
+            .parse(MarkCAPTCHA.__PATH_MODELS + captcha_config[MarkCAPTCHA.__CONFIG_LABEL_FILENAME]) \
+            .getParsedContent()
+
+        float_engine = Factory().create(Factory.CLASS_ENGINE_NUMPY).load(model_path)
+        quantized_engine = Factory().create(Factory.CLASS_ENGINE_QUANTIZED) \
+            .quantize(float_engine, sections[calibration])
+
+        decode = Factory.getClass(Factory.CLASS_PREDICT).decode
+        (float_accuracy, quantized_accuracy) = [np.mean(decode(label_binary,
+            engine.predict(sections[testing])) == labels[testing])
+            for engine in (float_engine, quantized_engine)]
+
+        print("Accuracy: float {:.4f}, int8 {:.4f} on {} held out characters".format(
+            float_accuracy, quantized_accuracy, len(testing)))
+
+        margin = model_config.get(MarkCAPTCHA.__MODEL_QUANTIZATION_MARGIN,
+            MarkCAPTCHA.__DEFAULT_QUANTIZATION_MARGIN)
+        if float_accuracy - quantized_accuracy > margin:
+            raise Exception("Quantized model not exported: accuracy {:.4f} is more than {} below {:.4f}" \
+                .format(quantized_accuracy, margin, float_accuracy))
+
+        export_path = self.__quantizedPath(model_path)
+        quantized_engine.export(export_path)
+        self.__modelWritten(config_filename)
+
+        return str(export_path)
+
     def predict(self, config_filename, image, show = False):
+        '''
+        Predict the text of a CAPTCHA image.
+        @params:
+            config_filename  - Required  : CAPTCHA config filename (Str)
+            image            - Required  : image file (Path), Base64 image (Str) or encoded
+                                           image (Bytes/Bytearray/Memoryview/File-like)
+            show             - Optional  : display the prediction (Bool)
+        '''
         self.__checkForConfig(config_filename)
-        captcha_config = self.__image_configs[config_filename]
+        image = self.__imageInput(image)
+
+        start = self.__metrics.clock()
+        self.__metrics.increment(MarkCAPTCHA.METRIC_PREDICTIONS, config=config_filename)
 
-        if '.' in image:
-            cleaned_image = Factory().create(Factory.CLASS_IMAGEPROCESSING_STRING) \
-                .importImage(Path(image))
+        #Shown predictions need the images, so they skip the cache.
+        cache_key = None
+        if self.__cache is not None and not show:
+            cache_key = self.__cacheKey(config_filename, image)
+
+            result = self.__cachedResult(config_filename, cache_key)
+            if result is not None:
+                if isinstance(image, Path):
+                    self.__image_filename = image.name
+                self.__metrics.observeSince(MarkCAPTCHA.METRIC_STAGE_SECONDS, start,
+                    config=config_filename, stage=MarkCAPTCHA.STAGE_PREDICT)
+                return result
+
+        cleaned_image = self.__importImage(config_filename, image)
+        if isinstance(cleaned_image, Factory.getClass(Factory.CLASS_IMAGEPROCESSING_STRING)):
             self.__image_filename = cleaned_image.getFilename()
+
+        segmented_captcha = self.__segmentImage(config_filename, cleaned_image)
+        predictor = self.__getPredictor(config_filename)
+        image_size = self.__model_config.getParsedContent()[MarkCAPTCHA.__MODEL_IMAGE_SIZE]
+
+        if show:
+            #Shown predictions wait on the display, they aren't timed.
+            return predictor.predict(segmented_captcha,
+                Factory().create(Factory.CLASS_IMAGEPROCESSING_SECTION), image_size, show).getResult()
+
+        if segmented_captcha.successful():
+            sections = self.__sections(config_filename, predictor, segmented_captcha,
+                Factory().create(Factory.CLASS_IMAGEPROCESSING_SECTION), image_size)
+            result = "".join(self.__classify(config_filename, predictor, sections))
         else:
-            cleaned_image = Factory().create(Factory.CLASS_IMAGEPROCESSING_BASE64) \
+            result = Factory.getClass(Factory.CLASS_PREDICT).FAILED
+
+        #The predictor loaded for this prediction may have started a new version.
+        if cache_key is not None:
+            self.__cache.put(self.__cacheKey(config_filename, image), result)
+
+        self.__metrics.observeSince(MarkCAPTCHA.METRIC_STAGE_SECONDS, start,
+            config=config_filename, stage=MarkCAPTCHA.STAGE_PREDICT)
+
+        return result
+
+    def predictBatch(self, config_filename, images, batch_size = BATCH_SIZE):
+        '''
+        Predict many CAPTCHA images, classifying their characters in large batches.
+        @params:
+            config_filename  - Required  : CAPTCHA config filename (Str)
+            images           - Required  : images of any type predict accepts (Iterable)
+            batch_size       - Optional  : characters classified per model call (Int)
+        '''
+        self.__checkForConfig(config_filename)
+
+        if batch_size <= 0:
+            raise Exception("Invalid batch size supplied: {}".format(batch_size))
+
+        start = self.__metrics.clock()
+
+        predictor = self.__getPredictor(config_filename)
+        section_image_object = Factory().create(Factory.CLASS_IMAGEPROCESSING_SECTION)
+        image_size = self.__model_config.getParsedContent()[MarkCAPTCHA.__MODEL_IMAGE_SIZE]
+
+        results = []
+        pending = []
+        pending_characters = 0
+        uncached = []
+        for image in images:
+            image = self.__imageInput(image)
+
+            if self.__cache is not None:
+                cache_key = self.__cacheKey(config_filename, image)
+
+                result = self.__cachedResult(config_filename, cache_key)
+                if result is not None:
+                    results.append(result)
+                    continue
+
+                uncached.append((len(results), cache_key))
+
+            segmented_captcha = self.__segmentImage(config_filename,
+                self.__importImage(config_filename, image))
+
+            if not segmented_captcha.successful():
+                results.append(Factory.getClass(Factory.CLASS_PREDICT).FAILED)
+                continue
+
+            sections = self.__sections(config_filename, predictor, segmented_captcha,
+                section_image_object, image_size)
+
+            #Flushed before the batch would overflow, no model call exceeds the batch size.
+            if pending and pending_characters + len(sections) > batch_size:
+                self.__classifyPending(config_filename, predictor, pending, results, batch_size)
+                pending = []
+                pending_characters = 0
+
+            pending.append((len(results), sections))
+            pending_characters += len(sections)
+            results.append(None)
+
+        if pending:
+            self.__classifyPending(config_filename, predictor, pending, results, batch_size)
+
+        for index, cache_key in uncached:
+            self.__cache.put(cache_key, results[index])
+
+        self.__metrics.increment(MarkCAPTCHA.METRIC_PREDICTIONS, len(results), config=config_filename)
+        self.__metrics.observeSince(MarkCAPTCHA.METRIC_STAGE_SECONDS, start,
+            config=config_filename, stage=MarkCAPTCHA.STAGE_PREDICT_BATCH)
+
+        return results
+
+    def preloadModels(self, config_filenames):
+        '''
+        Load the models of hot configs before their first prediction.
+        @params:
+            config_filenames  - Required  : CAPTCHA config filenames, most important last (List[Str])
+        '''
+        for config_filename in config_filenames:
+            self.__checkForConfig(config_filename)
+            self.__predictors.preload(config_filename,
+                lambda: self.__loadCurrentPredictor(config_filename))
+
+        return self
+
+    def getCacheStats(self):
+        '''
+            Result cache hits by tier, misses and hit rate, None without a cache.
+        '''
+        return None if self.__cache is None else self.__cache.getStats()
+
+    def getModelStats(self):
+        '''
+            Loaded models and the registry's hit, miss and eviction counters.
+        '''
+        stats = self.__predictors.getStats()
+        stats["loaded"] = self.__predictors.getKeys()
+
+        return stats
+
+    def getMetrics(self):
+        '''
+            Snapshot of the stage time histograms and prediction, segmentation failure,
+            cache and model load counters, by metric name.
+        '''
+        return self.__metrics.snapshot()
+
+    def exportMetrics(self):
+        '''
+            The metrics in the Prometheus text exposition format.
+        '''
+        return self.__metrics.exportPrometheus()
+
+    def getImageFilename(self):
+        return self.__image_filename
+
+    def getConfigs(self):
+        return list(self.__image_configs)
+
+    def __imageInput(self, image):
+        '''
+            Check an image's type, a file-like object is read once for both the cache and import.
+        '''
+        if isinstance(image, (Path, str) + MarkCAPTCHA.__BUFFER_TYPES):
+            return image
+
+        if hasattr(image, "getbuffer"):
+            return image.getbuffer()
+
+        if hasattr(image, "read"):
+            return image.read()
+
+        raise Exception("Unsupported image type: {}, expected a Path, Base64 str, bytes or file-like object" \
+            .format(type(image).__name__))
+
+    def __imageBytes(self, image):
+        '''
+            The encoded image of a path, Base64 string or buffer.
+        '''
+        if isinstance(image, MarkCAPTCHA.__BUFFER_TYPES):
+            return image
+
+        if isinstance(image, Path):
+            return image.read_bytes()
+
+        return base64.b64decode(image)
+
+    def __cacheKey(self, config_filename, image):
+        return Factory.getClass(Factory.CLASS_RESULTCACHE).key(self.__imageBytes(image),
+            config_filename, self.__resultVersion(config_filename))
+
+    def __resultVersion(self, config_filename):
+        '''
+            Hash of the config, model.json and the fingerprints of their files as last loaded,
+            hashed again only once a reload, processImages, a build or export or a model load
+            changes them.
+        '''
+        config = self.__image_configs[config_filename]
+        fingerprints = (self.__fingerprints.get(config_filename),
+            self.__fingerprints.get(MarkCAPTCHA.__FILENAME_MODEL_JSON))
+
+        #Parsers are compared by identity, a reload parses new ones.
+        state = (config, self.__model_config, fingerprints)
+        (version_state, version) = self.__result_versions.get(config_filename, (None, None))
+        if version_state == state:
+            return version
+
+        version = hashlib.sha1(json.dumps([config.getParsedContent(),
+            self.__model_config.getParsedContent(), fingerprints], sort_keys=True).encode()).hexdigest()
+        self.__result_versions = dict(self.__result_versions, **{config_filename : (state, version)})
+
+        return version
+
+    def __watch(self, interval):
+        pending = {}
+        while not self.__watching.wait(interval):
+            with self.__reload_lock:
+                changed = self.__changedFiles()
+
+                #Only changes seen unchanged by the previous check are reloaded.
+                self.__reload({filename : fingerprint for filename, fingerprint in changed.items()
+                    if pending.get(filename) == fingerprint})
+                pending = changed
+
+    def __fingerprint(self, filename):
+        '''
+            Size and modification time of model.json, or a config's JSON, model and labels files.
+            Missing files are None, so their reappearance is a change too.
+        '''
+        if filename == MarkCAPTCHA.__FILENAME_MODEL_JSON:
+            paths = [Path(MarkCAPTCHA.__PATH_CONFIG_MODEL + filename)]
+        else:
+            paths = [Path(MarkCAPTCHA.__PATH_CONFIG_CAPTCHA + filename)]
+
+            if filename in self.__image_configs:
+                paths += self.__modelFiles(self.__image_configs[filename].getParsedContent())
+
+        return self.__pathsFingerprint(paths)
+
+    def __modelFiles(self, captcha_config):
+        return [self.__modelPath(captcha_config), Path(MarkCAPTCHA.__PATH_MODELS +
+            captcha_config[MarkCAPTCHA.__CONFIG_LABEL_FILENAME])]
+
+    def __pathsFingerprint(self, paths):
+        fingerprint = []
+        for path in paths:
+            try:
+                stat = path.stat()
+                fingerprint.append((str(path), stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                fingerprint.append((str(path), None))
+
+        return tuple(fingerprint)
+
+    def __changedFiles(self):
+        '''
+            Fingerprints of model.json and every config added, removed or changed since they
+            were loaded.
+        '''
+        filenames = set(self.__fingerprints) | set(config.name for config
+            in Path(MarkCAPTCHA.__PATH_CONFIG_CAPTCHA).glob('*.json'))
+
+        changed = {}
+        for filename in filenames:
+            fingerprint = self.__fingerprint(filename)
+            if self.__fingerprints.get(filename) != fingerprint:
+                changed[filename] = fingerprint
+
+        return changed
+
+    def __reload(self, changed):
+        '''
+        Load the changed files, then swap them in.
+        @params:
+            changed   - Required  : fingerprints of the changed model.json and configs (Dictionary)
+        '''
+        changed = {filename : fingerprint for filename, fingerprint in changed.items()
+            if self.__failed_fingerprints.get(filename) != fingerprint}
+
+        model_json = MarkCAPTCHA.__FILENAME_MODEL_JSON
+        if model_json in changed:
+            fingerprint = changed.pop(model_json)
+            try:
+                model_config = self.__parseModelConfig()
+            except Exception as ex:
+                self.__reloadFailed(model_json, fingerprint, ex)
+            else:
+                return self.__reloadModelConfig(model_config, fingerprint, changed)
+
+        reloaded = []
+        for config_filename, fingerprint in sorted(changed.items()):
+            if not Path(MarkCAPTCHA.__PATH_CONFIG_CAPTCHA + config_filename).is_file():
+                self.__removeConfig(config_filename)
+                reloaded.append(config_filename)
+                continue
+
+            try:
+                loaded = self.__loadConfig(config_filename, self.__model_config)
+            except Exception as ex:
+                self.__reloadFailed(config_filename, fingerprint, ex)
+                continue
+
+            self.__swapConfigs(self.__model_config, {config_filename : loaded})
+            self.__reloaded(config_filename)
+            reloaded.append(config_filename)
+
+        return reloaded
+
+    def __reloadModelConfig(self, model_config, fingerprint, changed):
+        '''
+        Every model depends on model.json's image size and backend, so every config is loaded
+        with the new model.json before any is swapped in. When one fails none are and the
+        loaded model.json is kept.
+        @params:
+            model_config  - Required  : parsed new model.json (JSONParser)
+            fingerprint   - Required  : fingerprint of the new model.json (Tuple)
+            changed       - Required  : fingerprints of the changed configs (Dictionary)
+        '''
+        model_json = MarkCAPTCHA.__FILENAME_MODEL_JSON
+
+        loaded = {}
+        removed = []
+        for config_filename in sorted(set(self.__image_configs) | set(changed)):
+            if not Path(MarkCAPTCHA.__PATH_CONFIG_CAPTCHA + config_filename).is_file():
+                removed.append(config_filename)
+                continue
+
+            try:
+                loaded[config_filename] = self.__loadConfig(config_filename, model_config)
+            except Exception as ex:
+                if config_filename in changed:
+                    self.__reloadFailed(config_filename, changed[config_filename], ex)
+                self.__reloadFailed(model_json, fingerprint,
+                    Exception("{}: {}".format(config_filename, ex)))
+                return []
+
+        self.__swapConfigs(model_config, loaded)
+        self.__fingerprints[model_json] = fingerprint
+        self.__failed_fingerprints.pop(model_json, None)
+
+        for config_filename in removed:
+            self.__removeConfig(config_filename)
+        for config_filename in loaded:
+            self.__reloaded(config_filename)
+
+        return sorted(list(loaded) + removed)
+
+    def __loadConfig(self, config_filename, model_config):
+        '''
+            A config's parsed JSON, compiled pipeline and warmed up predictor. Only models
+            already in use are loaded, any other loads on its first prediction.
+        '''
+        config = Factory().create(Factory.CLASS_JSONPARSER) \
+            .parse(MarkCAPTCHA.__PATH_CONFIG_CAPTCHA + config_filename)
+        pipeline = self.__compileConfig(config_filename, config.getParsedContent())
+
+        predictor = None
+        if config_filename in self.__predictors.getKeys():
+            predictor = self.__loadPredictor(config_filename, config.getParsedContent(), model_config)
+            self.__warmUp(predictor, model_config)
+
+        return (config, pipeline, predictor)
+
+    def __swapConfigs(self, model_config, loaded):
+        '''
+            Swap in loaded configs with the model.json they were loaded with, nothing is
+            loaded in between.
+        '''
+        #Rebinding whole dictionaries keeps lookups from other threads consistent.
+        self.__image_configs = dict(self.__image_configs,
+            **{config_filename : config for config_filename, (config, pipeline, predictor) in loaded.items()})
+        self.__pipelines = dict(self.__pipelines,
+            **{config_filename : pipeline for config_filename, (config, pipeline, predictor) in loaded.items()})
+        self.__model_config = model_config
+
+        #A model first loaded while these were loading used the old files.
+        for config_filename, (config, pipeline, predictor) in loaded.items():
+            if predictor is None:
+                self.__predictors.remove(config_filename)
+            else:
+                self.__predictors.replace(config_filename, predictor)
+
+    def __reloaded(self, config_filename):
+        #A new model or labels filename is part of the next fingerprint.
+        self.__fingerprints[config_filename] = self.__fingerprint(config_filename)
+        self.__failed_fingerprints.pop(config_filename, None)
+        self.__metrics.increment(MarkCAPTCHA.METRIC_RELOADS, config=config_filename)
+
+    def __removeConfig(self, config_filename):
+        self.__image_configs = {filename : config for filename, config
+            in self.__image_configs.items() if filename != config_filename}
+        self.__pipelines = {filename : pipeline for filename, pipeline
+            in self.__pipelines.items() if filename != config_filename}
+        self.__predictors.remove(config_filename)
+        self.__fingerprints.pop(config_filename, None)
+        self.__failed_fingerprints.pop(config_filename, None)
+
+    def __reloadFailed(self, filename, fingerprint, ex):
+        self.__failed_fingerprints[filename] = fingerprint
+        self.__metrics.increment(MarkCAPTCHA.METRIC_RELOAD_FAILURES, config=filename)
+        print("MARKCAPTCHA: unable to reload {}, keeping the loaded version: {}".format(filename, ex))
+
+    def __warmUp(self, predictor, model_config):
+        '''
+            One prediction on a blank section, so the first request doesn't pay for building
+            the model's predict function.
+        '''
+        image_size = model_config.getParsedContent()[MarkCAPTCHA.__MODEL_IMAGE_SIZE]
+        predictor.classify(np.zeros((1, image_size[1], image_size[0], 1), dtype=np.float32))
+
+    def __cachedResult(self, config_filename, cache_key):
+        result = self.__cache.get(cache_key)
+
+        self.__metrics.increment(MarkCAPTCHA.METRIC_CACHE_MISSES if result is None
+            else MarkCAPTCHA.METRIC_CACHE_HITS, config=config_filename)
+
+        return result
+
+    def __importImage(self, config_filename, image):
+        start = self.__metrics.clock()
+
+        if isinstance(image, MarkCAPTCHA.__BUFFER_TYPES):
+            image_object = Factory().create(Factory.CLASS_IMAGEPROCESSING_BYTES).importImage(image)
+        elif isinstance(image, Path):
+            image_object = Factory().create(Factory.CLASS_IMAGEPROCESSING_STRING).importImage(image)
+        else:
+            image_object = Factory().create(Factory.CLASS_IMAGEPROCESSING_BASE64) \
                 .importImage(image)
 
-        cleaned_image = self.__classFunctionsFromJSON(captcha_config.getParsedContent()[MarkCAPTCHA.__CONFIG_FUNCTIONS], cleaned_image)
+        self.__metrics.observeSince(MarkCAPTCHA.METRIC_STAGE_SECONDS, start,
+            config=config_filename, stage=MarkCAPTCHA.STAGE_DECODE)
+
+        return image_object
+
+    def __segmentImage(self, config_filename, image_object):
+        captcha_config = self.__image_configs[config_filename].getParsedContent()
+
+        start = self.__metrics.clock()
+        cleaned_image = self.__pipelines[config_filename].apply(image_object.useScratch(self.__scratch),
+            self.__metrics, config_filename)
+        start = self.__observeStage(config_filename, MarkCAPTCHA.STAGE_CLEAN, start)
 
-        pre_segmented_image = self.__preSegmentImage(cleaned_image)
+        presegmented_image = MarkCAPTCHA.preSegmentImage(cleaned_image)
+        start = self.__observeStage(config_filename, MarkCAPTCHA.STAGE_PRESEGMENT, start)
 
-        captcha_config = captcha_config.getParsedContent()
         segmented_captcha = Factory().create(Factory.CLASS_SEGMENT) \
-            .segment(pre_segmented_image,
+            .setBackend(self.__segmentationBackend(captcha_config)) \
+            .segment(presegmented_image,
                 captcha_config[MarkCAPTCHA.__CONFIG_CAPTCHA_LENGTH],
                 captcha_config[MarkCAPTCHA.__CONFIG_THRESHOLD])
+        self.__observeStage(config_filename, MarkCAPTCHA.STAGE_SEGMENT, start)
+
+        if not segmented_captcha.successful():
+            self.__metrics.increment(MarkCAPTCHA.METRIC_SEGMENTATION_FAILURES, config=config_filename)
+
+        return segmented_captcha
+
+    def __sections(self, config_filename, predictor, segmented_captcha, section_image_object, image_size):
+        start = self.__metrics.clock()
+        sections = predictor.sections(segmented_captcha, section_image_object, image_size)
+        self.__observeStage(config_filename, MarkCAPTCHA.STAGE_SECTIONS, start)
 
-        #.get(x, y) not working.
-        if config_filename not in self.__predictors:
-            self.__predictors[config_filename] = Factory().create(Factory.CLASS_PREDICT) \
-            .initialise(Path(MarkCAPTCHA.__PATH_MODELS + captcha_config[MarkCAPTCHA.__CONFIG_MODEL_FILENAME]),
+        return sections
+
+    def __classify(self, config_filename, predictor, sections):
+        start = self.__metrics.clock()
+        predicted_characters = predictor.classify(sections)
+        self.__observeStage(config_filename, MarkCAPTCHA.STAGE_INFERENCE, start)
+
+        return predicted_characters
+
+    def __observeStage(self, config_filename, stage, start):
+        '''
+            Observe a stage's seconds since start, returning the start of the next stage.
+        '''
+        if not self.__metrics.enabled():
+            return 0
+
+        end = self.__metrics.clock()
+        self.__metrics.observe(MarkCAPTCHA.METRIC_STAGE_SECONDS, end - start,
+            config=config_filename, stage=stage)
+
+        return end
+
+    def __getPredictor(self, config_filename):
+        return self.__predictors.get(config_filename, lambda: self.__loadCurrentPredictor(config_filename))
+
+    def __loadCurrentPredictor(self, config_filename):
+        '''
+            Load a predictor on its first prediction or after an eviction, its files may have
+            changed since they were fingerprinted so their fingerprint is taken again.
+        '''
+        captcha_config = self.__image_configs[config_filename].getParsedContent()
+
+        #Taken before loading, files written during the load start another version.
+        model_fingerprint = self.__pathsFingerprint(self.__modelFiles(captcha_config))
+        predictor = self.__loadPredictor(config_filename, captcha_config)
+        self.__refreshModelFingerprint(config_filename, model_fingerprint)
+
+        return predictor
+
+    def __modelWritten(self, config_filename):
+        '''
+            A build or export wrote a config's model, its loaded predictor is dropped and its
+            results start a new version.
+        '''
+        self.__predictors.remove(config_filename)
+        self.__refreshModelFingerprint(config_filename)
+
+    def __refreshModelFingerprint(self, config_filename, model_fingerprint = None):
+        '''
+            Fingerprint a config's model and labels files again. The config JSON keeps the
+            fingerprint it was last loaded with, so a change to it is still reloaded.
+        '''
+        with self.__reload_lock:
+            if config_filename not in self.__fingerprints:
+                return
+
+            if model_fingerprint is None:
+                model_fingerprint = self.__pathsFingerprint(self.__modelFiles(
+                    self.__image_configs[config_filename].getParsedContent()))
+
+            self.__fingerprints[config_filename] = self.__fingerprints[config_filename][:1] + \
+                model_fingerprint
+
+    def __loadPredictor(self, config_filename, captcha_config = None, model_config = None):
+        if captcha_config is None:
+            captcha_config = self.__image_configs[config_filename].getParsedContent()
+
+        start = self.__metrics.clock()
+
+        predictor = Factory().create(Factory.CLASS_PREDICT) \
+            .initialise(self.__modelPath(captcha_config, model_config),
                 Factory().create(Factory.CLASS_PICKLEPARSER) \
             .parse(MarkCAPTCHA.__PATH_MODELS + captcha_config[MarkCAPTCHA.__CONFIG_LABEL_FILENAME]) \
-            .getParsedContent())
+            .getParsedContent(),
+                engine=Factory().create(MarkCAPTCHA.__BACKEND_ENGINES[self.__modelBackend(model_config)]))
 
-        return self.__predictors[config_filename].predict(segmented_captcha,
-                    Factory().create(Factory.CLASS_IMAGEPROCESSING_SECTION),
-                    self.__model_config.getParsedContent()[MarkCAPTCHA.__MODEL_IMAGE_SIZE],
-                    show) \
-                .getResult()
+        self.__metrics.increment(MarkCAPTCHA.METRIC_MODEL_LOADS, config=config_filename)
+        self.__metrics.observeSince(MarkCAPTCHA.METRIC_MODEL_LOAD_SECONDS, start, config=config_filename)
 
-    def getImageFilename(self):
-        return self.__image_filename
+        return predictor
 
-    def __checkForConfig(self, config_name):
+    def __classifyPending(self, config_filename, predictor, pending, results, batch_size):
         '''
-            key in dict is the second fastest look up, outperformed by try except.
+        Classify the sections of several CAPTCHAs, batch size characters per model call.
+        @params:
+            config_filename  - Required  : CAPTCHA config filename (Str)
+            predictor        - Required  : initialised predictor (Predict)
+            pending          - Required  : result index and sections of each CAPTCHA (List[Tuple])
+            results          - Required  : results to fill in input order (List[Str])
+            batch_size       - Required  : most characters classified per model call (Int)
         '''
-        if config_name not in self.__image_configs:
-            raise Exception("Invalid configuration name: {}".format(config_name))
+        sections = np.concatenate([sections for index, sections in pending])
 
-        return True
+        #Only a CAPTCHA with more characters than the batch size takes several calls.
+        predicted_characters = []
+        for offset in range(0, len(sections), batch_size):
+            predicted_characters.extend(self.__classify(config_filename, predictor,
+                sections[offset:offset + batch_size]))
 
-    def __classFunctionsFromJSON(self, config, image_object):
+        offset = 0
+        for index, sections in pending:
+            results[index] = "".join(predicted_characters[offset:offset + len(sections)])
+            offset += len(sections)
+
+    def __compileConfig(self, config_name, captcha_config):
         '''
-        Process a image based on its JSON functions.
+        Validate a CAPTCHA config and compile its functions into a Pipeline.
         @params:
-            config        - Required  : JSON functions key configuration.  (Dictionary)
-            image_object  - Required  : ImageProcessing Object (ImageProcessing)
+            config_name     - Required  : CAPTCHA config filename (Str)
+            captcha_config  - Required  : parsed CAPTCHA config (Dictionary)
         '''
-        for function in config:
-            for function_name, function_value in function.items():
-                try:
-                    getattr(image_object, function_name.split("_", 1)[0])(*function_value)
-                except Exception as ex:
-                    raise Exception("Invalid image processing function provided: {}:{}\nError: {}" \
-                        .format(function_name, function_value, ex))
+        missing_keys = [key for key in MarkCAPTCHA.__CONFIG_REQUIRED if key not in captcha_config]
+        if missing_keys:
+            raise Exception("Invalid configuration {}: missing {}".format(config_name,
+                ", ".join(missing_keys)))
 
-        return image_object
+        captcha_length = captcha_config[MarkCAPTCHA.__CONFIG_CAPTCHA_LENGTH]
+        if not isinstance(captcha_length, list) or len(captcha_length) != 2 \
+            or captcha_length[0] > captcha_length[1]:
+            raise Exception("Invalid configuration {}: {} must be [minimum, maximum]" \
+                .format(config_name, MarkCAPTCHA.__CONFIG_CAPTCHA_LENGTH))
+
+        backends = Factory.getClass(Factory.CLASS_SEGMENT).BACKENDS
+        if self.__segmentationBackend(captcha_config) not in backends:
+            raise Exception("Invalid configuration {}: {} must be one of {}".format(config_name,
+                MarkCAPTCHA.__CONFIG_SEGMENTATION, ", ".join(backends)))
+
+        try:
+            return Factory().create(Factory.CLASS_PIPELINE) \
+                .compile(captcha_config[MarkCAPTCHA.__CONFIG_FUNCTIONS])
+        except Exception as ex:
+            raise Exception("Invalid configuration {}: {}".format(config_name, ex))
+
+    def __createMetrics(self, enabled):
+        metrics = Factory().create(Factory.CLASS_METRICS).initialise(enabled)
+        histogram = Factory.getClass(Factory.CLASS_METRICS).TYPE_HISTOGRAM
+        counter = Factory.getClass(Factory.CLASS_METRICS).TYPE_COUNTER
+
+        return metrics \
+            .describe(MarkCAPTCHA.METRIC_STAGE_SECONDS, histogram, "Seconds spent in each prediction stage.") \
+            .describe(Factory.getClass(Factory.CLASS_PIPELINE).METRIC_FUNCTION_SECONDS, histogram,
+                "Seconds spent in each image processing function of a config.") \
+            .describe(MarkCAPTCHA.METRIC_MODEL_LOAD_SECONDS, histogram, "Seconds spent loading a model.") \
+            .describe(MarkCAPTCHA.METRIC_PREDICTIONS, counter, "CAPTCHAs predicted.") \
+            .describe(MarkCAPTCHA.METRIC_SEGMENTATION_FAILURES, counter,
+                "CAPTCHAs whose characters could not be segmented.") \
+            .describe(MarkCAPTCHA.METRIC_CACHE_HITS, counter, "Predictions returned from the result cache.") \
+            .describe(MarkCAPTCHA.METRIC_CACHE_MISSES, counter, "Predictions not in the result cache.") \
+            .describe(MarkCAPTCHA.METRIC_MODEL_LOADS, counter, "Models loaded, including reloads after eviction.") \
+            .describe(MarkCAPTCHA.METRIC_RELOADS, counter, "Configs reloaded after their files changed.") \
+            .describe(MarkCAPTCHA.METRIC_RELOAD_FAILURES, counter,
+                "Changed configs that failed to load and kept their loaded version.")
+
+    def __parseModelConfig(self):
+        model_config = Factory().create(Factory.CLASS_JSONPARSER) \
+                .parse(MarkCAPTCHA.__PATH_CONFIG_MODEL +
+                    MarkCAPTCHA.__FILENAME_MODEL_JSON)
+
+        backend = model_config.getParsedContent().get(MarkCAPTCHA.__MODEL_BACKEND,
+            MarkCAPTCHA.__BACKEND_KERAS)
+        if backend not in MarkCAPTCHA.__BACKEND_ENGINES:
+            raise Exception("Invalid model configuration: {} must be one of {}".format(
+                MarkCAPTCHA.__MODEL_BACKEND, ", ".join(MarkCAPTCHA.__BACKEND_ENGINES)))
+
+        return model_config
+
+    def __modelBackend(self, model_config = None):
+        if model_config is None:
+            model_config = self.__model_config
+
+        return model_config.getParsedContent().get(MarkCAPTCHA.__MODEL_BACKEND,
+            MarkCAPTCHA.__BACKEND_KERAS)
+
+    def __modelPath(self, captcha_config, model_config = None):
+        '''
+            The model file the configured backend loads, or the backend of another model.json.
+        '''
+        model_path = Path(MarkCAPTCHA.__PATH_MODELS + captcha_config[MarkCAPTCHA.__CONFIG_MODEL_FILENAME])
+        if self.__modelBackend(model_config) == MarkCAPTCHA.__BACKEND_INT8:
+            model_path = self.__quantizedPath(model_path)
+
+        return model_path
+
+    def __quantizedPath(self, model_path):
+        return model_path.with_suffix(Factory.getClass(Factory.CLASS_ENGINE_QUANTIZED).EXPORT_SUFFIX)
+
+    def __shardsPath(self, captcha_config):
+        return Path(MarkCAPTCHA.__PATH_CAPTCHAS + captcha_config[MarkCAPTCHA.__CONFIG_FOLDER] +
+            MarkCAPTCHA.__PATH_SHARDS)
+
+    def __characterDataset(self, captcha_config):
+        '''
+            A config's extracted characters, read from its shards when processImages wrote
+            them at the model image size, otherwise packed from the PNGs on first use.
+        '''
+        captcha_folder = MarkCAPTCHA.__PATH_CAPTCHAS + captcha_config[MarkCAPTCHA.__CONFIG_FOLDER]
+        image_size = self.__model_config.getParsedContent()[MarkCAPTCHA.__MODEL_IMAGE_SIZE]
+
+        shards_class = Factory.getClass(Factory.CLASS_SHARDS)
+        if shards_class.paths(self.__shardsPath(captcha_config), image_size):
+            return shards_class().load(self.__shardsPath(captcha_config), image_size)
+
+        return Factory().create(Factory.CLASS_DATASET) \
+            .load(Factory().create(Factory.CLASS_IMAGEPROCESSING_STRING),
+                Path(captcha_folder + MarkCAPTCHA.__PATH_CHARACTERS), image_size,
+                Path(captcha_folder + MarkCAPTCHA.__PATH_CHARACTERS_CACHE))
+
+    def __segmentationBackend(self, captcha_config):
+        '''
+            Configs without a segmentation key keep the contour backend.
+        '''
+        return captcha_config.get(MarkCAPTCHA.__CONFIG_SEGMENTATION,
+            Factory.getClass(Factory.CLASS_SEGMENT).BACKEND_CONTOURS)
+
+    def __checkForConfig(self, config_name):
+        '''
+            key in dict is the second fastest look up, outperformed by try except.
+        '''
+        if config_name not in self.__image_configs:
+            raise Exception("Invalid configuration name: {}".format(config_name))
+
+        return True
 
     #Credit: https://gist.github.com/aubricus/f91fb55dc6ba5557fbab06119420dd6a
     def printProgress(self, iteration, total, prefix='', suffix='', decimals=1, bar_length=100):
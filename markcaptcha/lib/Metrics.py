@@ -0,0 +1,219 @@
+from bisect import bisect_left
+import threading, time
+
+
+class Metrics():
+
+    '''
+        In process counters and timing histograms, each series named and labelled, e.g. by
+        config and stage. Read as a snapshot or exported in the Prometheus text format.
+        A disabled instance records nothing and its clock is never read.
+    '''
+
+    TYPE_COUNTER = "counter"
+    TYPE_HISTOGRAM = "histogram"
+
+    '''
+        Histogram bucket upper bounds in seconds, from image operations to model loads.
+    '''
+    BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+        0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    __PERCENTILES = (50, 90, 99)
+
+    def __init__(self):
+        self.__enabled = True
+        self.__types = {}
+        self.__descriptions = {}
+        self.__counters = {}
+        self.__histograms = {}
+        self.__lock = threading.Lock()
+
+    def initialise(self, enabled = True):
+        '''
+        @params:
+            enabled   - Optional  : record metrics, False makes every call a no-op (Bool)
+        '''
+        self.__enabled = enabled
+
+        return self
+
+    def enabled(self):
+        return self.__enabled
+
+    def describe(self, name, metric_type, description):
+        '''
+        Declare a metric so it is exported with its type and help text.
+        @params:
+            name          - Required  : metric name, e.g. markcaptcha_stage_seconds (Str)
+            metric_type   - Required  : TYPE_COUNTER or TYPE_HISTOGRAM (Str)
+            description   - Required  : help text (Str)
+        '''
+        if metric_type not in (Metrics.TYPE_COUNTER, Metrics.TYPE_HISTOGRAM):
+            raise Exception("Invalid metric type supplied: {}".format(metric_type))
+
+        with self.__lock:
+            self.__types[name] = metric_type
+            self.__descriptions[name] = description
+
+        return self
+
+    def clock(self):
+        '''
+            Start of a timing passed to observeSince, 0 when disabled.
+        '''
+        return time.perf_counter() if self.__enabled else 0
+
+    def increment(self, name, amount = 1, **labels):
+        '''
+        @params:
+            name     - Required  : counter name (Str)
+            amount   - Optional  : added to the counter (Int)
+            labels   - Optional  : label values of the series (Str)
+        '''
+        if not self.__enabled:
+            return
+
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.__types.setdefault(name, Metrics.TYPE_COUNTER)
+            self.__counters[key] = self.__counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        '''
+        @params:
+            name     - Required  : histogram name (Str)
+            value    - Required  : seconds observed (Float)
+            labels   - Optional  : label values of the series (Str)
+        '''
+        if not self.__enabled:
+            return
+
+        key = (name, tuple(sorted(labels.items())))
+        bucket = bisect_left(Metrics.BUCKETS, value)
+
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                self.__types.setdefault(name, Metrics.TYPE_HISTOGRAM)
+                #Counts per bucket, the last past every bound, then the sum.
+                histogram = self.__histograms[key] = [0] * (len(Metrics.BUCKETS) + 1) + [0.0]
+
+            histogram[bucket] += 1
+            histogram[-1] += value
+
+    def observeSince(self, name, start, **labels):
+        '''
+            Observe the seconds since a clock() start.
+        '''
+        if not self.__enabled:
+            return
+
+        self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        '''
+            Every series by name, counters as their value and histograms as their count, sum,
+            mean, cumulative buckets and percentiles estimated from the buckets.
+        '''
+        with self.__lock:
+            counters = dict(self.__counters)
+            histograms = {key: list(histogram) for key, histogram in self.__histograms.items()}
+
+        snapshot = {}
+        for (name, labels), value in counters.items():
+            snapshot.setdefault(name, []).append({"labels": dict(labels), "value": value})
+
+        for (name, labels), histogram in histograms.items():
+            (counts, total) = (histogram[:-1], histogram[-1])
+            count = sum(counts)
+
+            series = {"labels": dict(labels), "count": count, "sum": total,
+                "mean": total / count if count else 0.0,
+                "buckets": dict(zip([str(bound) for bound in Metrics.BUCKETS] + ["+Inf"],
+                    self.__cumulative(counts)))}
+            for percentile in Metrics.__PERCENTILES:
+                series["p{}".format(percentile)] = self.__percentile(counts, percentile)
+
+            snapshot.setdefault(name, []).append(series)
+
+        return snapshot
+
+    def exportPrometheus(self):
+        '''
+            Every series in the Prometheus text exposition format.
+        '''
+        with self.__lock:
+            types = dict(self.__types)
+            descriptions = dict(self.__descriptions)
+            counters = dict(self.__counters)
+            histograms = {key: list(histogram) for key, histogram in self.__histograms.items()}
+
+        lines = []
+        for name in sorted(set(name for name, labels in counters) | set(name for name, labels in histograms)):
+            if name in descriptions:
+                lines.append("# HELP {} {}".format(name, descriptions[name]))
+            lines.append("# TYPE {} {}".format(name, types[name]))
+
+            for (series_name, labels), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append("{}{} {}".format(name, self.__labels(labels), value))
+
+            for (series_name, labels), histogram in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+
+                counts = histogram[:-1]
+                for bound, count in zip([repr(bound) for bound in Metrics.BUCKETS] + ["+Inf"],
+                    self.__cumulative(counts)):
+                    lines.append("{}_bucket{} {}".format(name, self.__labels(labels + (("le", bound),)),
+                        count))
+                lines.append("{}_sum{} {}".format(name, self.__labels(labels), repr(histogram[-1])))
+                lines.append("{}_count{} {}".format(name, self.__labels(labels), sum(counts)))
+
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def reset(self):
+        with self.__lock:
+            self.__counters.clear()
+            self.__histograms.clear()
+
+        return self
+
+    def __cumulative(self, counts):
+        cumulative = []
+        total = 0
+        for count in counts:
+            total += count
+            cumulative.append(total)
+
+        return cumulative
+
+    def __percentile(self, counts, percentile):
+        '''
+            Seconds at a percentile, interpolated within its bucket as Prometheus'
+            histogram_quantile does. Past the last bound the last bound is returned.
+        '''
+        count = sum(counts)
+        if count == 0:
+            return 0.0
+
+        rank = count * percentile / 100.0
+        seen = 0
+        for bucket, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                if bucket == len(Metrics.BUCKETS):
+                    return Metrics.BUCKETS[-1]
+
+                lower = Metrics.BUCKETS[bucket - 1] if bucket > 0 else 0.0
+                return lower + (Metrics.BUCKETS[bucket] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+
+        return Metrics.BUCKETS[-1]
+
+    def __labels(self, labels):
+        if not labels:
+            return ""
+
+        return "{" + ",".join('{}="{}"'.format(key, str(value).replace("\\", "\\\\") \
+            .replace('"', '\\"').replace("\n", "\\n")) for key, value in labels) + "}"
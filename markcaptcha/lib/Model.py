@@ -1,21 +1,67 @@
 import glob
 import pickle
+import json, os
 import numpy as np
-import os
 from pathlib import Path
 
-from keras.models import Sequential
+from keras.models import Sequential, load_model
+from keras.callbacks import ModelCheckpoint, LambdaCallback, EarlyStopping
+from keras.utils import Sequence
 from keras.layers.convolutional import Conv2D, MaxPooling2D
 from keras.layers.core import Flatten, Dense
 from sklearn.preprocessing import LabelBinarizer
 from sklearn.model_selection import train_test_split
 
-import matplotlib.pyplot as plt
+from lib.Dataset import CharacterBatches
+
+
+class CharacterSequence(CharacterBatches, Sequence):
+
+    '''
+        CharacterBatches Keras recognises as a Sequence, so loader threads can share it.
+    '''
+    pass
+
+
+class ResumableEarlyStopping(EarlyStopping):
+
+    '''
+        EarlyStopping continuing the best validation loss and epochs waited of an
+        interrupted build, rather than starting over when training begins.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.__resumed = None
+
+    def resume(self, best, wait):
+        self.__resumed = (best, wait)
+
+        return self
+
+    def on_train_begin(self, logs = None):
+        super().on_train_begin(logs)
+
+        if self.__resumed is not None:
+            (self.best, self.wait) = self.__resumed
 
 
 class Model():
     __instance = None
 
+    '''
+        Files next to the model holding the last epoch's checkpoint and its state, and
+        the epoch with the lowest validation loss when stopping early.
+    '''
+    CHECKPOINT_SUFFIX = ".checkpoint.hdf5"
+    CHECKPOINT_STATE_SUFFIX = ".checkpoint.json"
+    CHECKPOINT_BEST_SUFFIX = ".best.hdf5"
+
+    __STATE_EPOCH = "epoch"
+    __STATE_CLASSES = "classes"
+    __STATE_BEST = "best"
+    __STATE_WAIT = "wait"
+
     def __init__(self):
         self.__getInstance()
 
@@ -26,47 +72,144 @@ class Model():
             return Model.__instance
 
     def initialise(self, image_size, hidden_layers, iterations,
-    testing_ratio, pool_size, stride):
+    testing_ratio, pool_size, stride, batch_size = 6, shuffle_buffer = None, workers = 1,
+    prefetch = 10, patience = 0):
+        '''
+        @params:
+            batch_size      - Optional  : characters per training step (Int)
+            shuffle_buffer  - Optional  : characters shuffled together each epoch, every
+                                          character when None, 0 keeps the split's random order (Int)
+            workers         - Optional  : threads loading batches (Int)
+            prefetch        - Optional  : batches loaded ahead of training (Int)
+            patience        - Optional  : epochs without a lower validation loss before
+                                          training stops, 0 never stops early (Int)
+        '''
         self.__image_size = image_size
         self.__hidden_layers = hidden_layers
         self.__iterations = iterations
         self.__testing_ratio = testing_ratio
         self.__pool_size = pool_size
         self.__stride = stride
+        self.__batch_size = batch_size
+        self.__shuffle_buffer = shuffle_buffer
+        self.__workers = workers
+        self.__prefetch = prefetch
+        self.__patience = patience
+        self.__history = None
 
         return self
 
-    def train(self, image_object, images_path):
-        self.__data = []
-        self.__labels = []
-
-        if not images_path.exists():
-            raise Exception("Path does not exist: {}".format(str(images_path)))
-
-        for character_folder in images_path.iterdir():
-            for character in character_folder.glob("*.png"):
-                try:
-                    image_object.importImage(Path(character)) \
-                        .resize(self.__image_size[0], self.__image_size[1])\
-                        .grey()
-
-                    self.__data.append(np.expand_dims(image_object.getImage(), axis=2))
-                    self.__labels.append(str(character.parents[0]).split(os.path.sep)[-1])
-                except Exception as ex:
-                    print(ex)
-                    continue
+    def train(self, dataset):
+        '''
+        Use the packed characters of a dataset, memory mapped rather than copied.
+        @params:
+            dataset   - Required  : loaded character dataset (CharacterDataset)
+        '''
+        self.__data = dataset.getImages()
+        self.__labels = dataset.getLabels()
+
+        if len(self.__data) == 0:
+            raise Exception("No characters to train on.")
+
         return self
 
-    def build(self, labelBinaryObject, labelBinary_path, model_path, show = False):
-        (x_train, x_test, y_train, y_test) = train_test_split(np.array(self.__data, dtype="float") / 255.0,
-            np.array(self.__labels), test_size=self.__testing_ratio, random_state=0)
+    def build(self, labelBinaryObject, labelBinary_path, model_path, show = False, resume = False,
+        finetune = False):
+        '''
+        Train and save a model and its labels, checkpointing every epoch.
+        @params:
+            labelBinaryObject  - Required  : label binarizer parser (PickleParser)
+            labelBinary_path   - Required  : labels file (Str)
+            model_path         - Required  : .hdf5 model file (Str)
+            show               - Optional  : plot the training metrics (Bool)
+            resume             - Optional  : continue the last checkpoint of an interrupted build (Bool)
+            finetune           - Optional  : continue training the saved model and labels,
+                                             adding an output for every new label (Bool)
+        '''
+        model_path = Path(model_path)
+        (checkpoint_path, state_path, best_path) = self.__checkpointPaths(model_path)
+
+        #Split indices, batches are read from the memory map as they are trained on.
+        (train_indices, test_indices) = train_test_split(np.arange(len(self.__data)),
+            test_size=self.__testing_ratio, random_state=0)
 
-        labelbinary = LabelBinarizer().fit(y_train)
-        y_train = labelbinary.transform(y_train)
-        y_test = labelbinary.transform(y_test)
+        initial_epoch = 0
+        state = {}
+        if resume:
+            if not checkpoint_path.is_file() or not state_path.is_file():
+                raise Exception("No checkpoint to resume exists for: {}".format(str(model_path)))
 
+            with open(str(state_path)) as f:
+                state = json.load(f)
+
+            model = load_model(str(checkpoint_path))
+            labelbinary = LabelBinarizer().fit(state[Model.__STATE_CLASSES])
+            initial_epoch = state[Model.__STATE_EPOCH]
+        elif finetune:
+            if not model_path.is_file():
+                raise Exception("No Model exists to fine tune: {}".format(str(model_path)))
+
+            (model, labelbinary) = self.__addLabels(load_model(str(model_path)),
+                labelBinaryObject.parse(labelBinary_path).getParsedContent(),
+                self.__labels[train_indices])
+        else:
+            labelbinary = LabelBinarizer().fit(self.__labels[train_indices])
+            model = self.__network(len(labelbinary.classes_))
+
+        if not resume and best_path.exists():
+            best_path.unlink()
+
+        targets = labelbinary.transform(self.__labels).astype(np.uint8)
+        #Two labels are binarized into a single column, the softmax has an output per label.
+        if targets.shape[1] == 1:
+            targets = np.hstack((1 - targets, targets))
+
+        history = model.fit_generator(CharacterSequence(self.__data, targets, train_indices,
+                self.__batch_size, self.__shuffle_buffer, seed=initial_epoch),
+            validation_data=CharacterSequence(self.__data, targets, test_indices, self.__batch_size, 0),
+            epochs=self.__iterations, initial_epoch=initial_epoch,
+            callbacks=self.__callbacks(checkpoint_path, state_path, best_path,
+                labelbinary.classes_, state),
+            workers=self.__workers, max_queue_size=self.__prefetch,
+            use_multiprocessing=False, shuffle=False)
+        self.__history = history.history
+
+        if show:
+            #Only needed to plot, matplotlib is slow to import.
+            import matplotlib.pyplot as plt
+
+            plt.plot(history.history['acc'], label="Accuracy")
+            plt.plot(history.history['loss'], label="Loss")
+            plt.title('Model Training Metrics')
+            plt.ylabel('Metrics')
+            plt.xlabel('Epochs')
+            plt.legend(loc='upper left')
+            plt.show()
+
+        #Training may end without stopping early, the best epoch is kept either way.
+        if self.__patience > 0 and best_path.is_file():
+            model.load_weights(str(best_path))
+
+        #The labels are saved with the model, so an interrupted build never leaves them mismatched.
+        model.save(str(model_path))
         labelBinaryObject.save(labelBinary_path, labelbinary)
 
+        for path in (checkpoint_path, state_path, best_path):
+            if path.exists():
+                path.unlink()
+
+        return self
+
+    def getHistory(self):
+        '''
+            Training metrics of each epoch of the last build, by metric name.
+        '''
+        if self.__history is None:
+            raise Exception("No model has been built.")
+
+        return self.__history
+
+    def __network(self, classes):
         model = Sequential()
 
         model.add(Conv2D(32, (3, 3), padding="same", input_shape=(self.__image_size[0],
@@ -84,23 +227,80 @@ class Model():
 
         model.add(Dense(self.__hidden_layers, activation="relu"))
 
-        model.add(Dense(len(set(self.__labels)), activation="softmax"))
+        model.add(Dense(classes, activation="softmax"))
 
         model.compile(loss="categorical_crossentropy", optimizer="adam",
             metrics=["accuracy"])
 
-        history = model.fit(x_train, y_train, validation_data=(x_test, y_test),
-            batch_size=6, epochs=self.__iterations)
+        return model
 
-        if show:
-            plt.plot(history.history['acc'], label="Accuracy")
-            plt.plot(history.history['loss'], label="Loss")
-            plt.title('Model Training Metrics')
-            plt.ylabel('Metrics')
-            plt.xlabel('Epochs')
-            plt.legend(loc='upper left')
-            plt.show()
+    def __addLabels(self, model, labelbinary, labels):
+        '''
+            Extend a trained model's labels with any new ones. The output layer is replaced by
+            a wider one, keeping the trained weights of every known label.
+        '''
+        classes = np.union1d(labelbinary.classes_, labels)
+        if len(classes) == len(labelbinary.classes_):
+            return (model, labelbinary)
 
-        model.save(str(Path(model_path)))
+        (kernel, bias) = model.layers[-1].get_weights()
 
-        return self
+        model.pop()
+        model.add(Dense(len(classes), activation="softmax"))
+
+        #New labels keep their fresh initial weights, classes_ is sorted so known labels move.
+        (new_kernel, new_bias) = model.layers[-1].get_weights()
+        positions = np.searchsorted(classes, labelbinary.classes_)
+        new_kernel[:, positions] = kernel
+        new_bias[positions] = bias
+        model.layers[-1].set_weights([new_kernel, new_bias])
+
+        model.compile(loss="categorical_crossentropy", optimizer="adam",
+            metrics=["accuracy"])
+
+        print("New labels: {}".format(", ".join(np.setdiff1d(classes, labelbinary.classes_))))
+
+        return (model, LabelBinarizer().fit(classes))
+
+    def __callbacks(self, checkpoint_path, state_path, best_path, classes, state):
+        '''
+            Checkpoint every epoch, its state is written after the model so it never points
+            at a checkpoint that wasn't saved. With a patience the epoch with the lowest
+            validation loss is saved too, and training stops once it stalls. The lowest loss
+            and epochs waited are part of the state, so a resumed build continues them.
+        '''
+        callbacks = [ModelCheckpoint(str(checkpoint_path))]
+
+        early_stopping = None
+        if self.__patience > 0:
+            best_checkpoint = ModelCheckpoint(str(best_path), monitor="val_loss", save_best_only=True)
+            early_stopping = ResumableEarlyStopping(monitor="val_loss", patience=self.__patience,
+                verbose=1)
+
+            if Model.__STATE_BEST in state:
+                best_checkpoint.best = state[Model.__STATE_BEST]
+                early_stopping.resume(state[Model.__STATE_BEST], state[Model.__STATE_WAIT])
+
+            callbacks += [best_checkpoint, early_stopping]
+
+        def saveState(epoch, logs):
+            epoch_state = {Model.__STATE_EPOCH : epoch + 1, Model.__STATE_CLASSES : classes.tolist()}
+            if early_stopping is not None:
+                epoch_state[Model.__STATE_BEST] = float(early_stopping.best)
+                epoch_state[Model.__STATE_WAIT] = int(early_stopping.wait)
+
+            temporary_path = state_path.with_name(state_path.name + ".tmp")
+            with open(str(temporary_path), "w") as f:
+                json.dump(epoch_state, f)
+
+            os.replace(str(temporary_path), str(state_path))
+
+        #Last, so the state holds this epoch's early stopping progress.
+        callbacks.append(LambdaCallback(on_epoch_end=saveState))
+
+        return callbacks
+
+    def __checkpointPaths(self, model_path):
+        return (model_path.with_suffix(Model.CHECKPOINT_SUFFIX),
+            model_path.with_suffix(Model.CHECKPOINT_STATE_SUFFIX),
+            model_path.with_suffix(Model.CHECKPOINT_BEST_SUFFIX))
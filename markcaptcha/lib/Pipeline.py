@@ -0,0 +1,117 @@
+import inspect
+import numpy as np
+
+from lib.ImageProcessing import ImageProcessing, ImageProcessingSection
+
+
+class Pipeline():
+
+    '''
+        A CAPTCHA config's JSON functions, validated and compiled once into
+        ImageProcessing calls with their arguments and kernels prepared.
+    '''
+
+    '''
+        ImageProcessing methods that are not image processing functions.
+    '''
+    __EXCLUDED_FUNCTIONS = {"importImage", "getImage", "getBeforeImage", "getFilename",
+        "findContours", "show", "save", "kernel", "useScratch"}
+
+    '''
+        Functions whose first argument is a square kernel size.
+    '''
+    __KERNEL_FUNCTIONS = {"erode", "dilate", "opening", "closing", "gradient"}
+
+    '''
+        Blank image the compiled functions are dry run on to surface config errors.
+    '''
+    __VALIDATION_IMAGE_SHAPE = (64, 64, 3)
+
+    '''
+        Histogram of each function's seconds by config and function name.
+    '''
+    METRIC_FUNCTION_SECONDS = "markcaptcha_function_seconds"
+
+    def __init__(self):
+        self.__stages = []
+
+    def compile(self, functions):
+        '''
+        Validate and compile JSON functions.
+        @params:
+            functions   - Required  : JSON functions key configuration. (List[Dictionary])
+        '''
+        if not isinstance(functions, list):
+            raise Exception("Image processing functions must be a list: {}".format(functions))
+
+        stages = []
+        for function in functions:
+            for function_name, function_value in function.items():
+                stages.append(self.__compileStage(function_name, function_value))
+
+        self.__stages = stages
+        self.__validate()
+
+        return self
+
+    def apply(self, image_object, metrics = None, config_name = None):
+        '''
+        Process an image with the compiled functions.
+        @params:
+            image_object  - Required  : ImageProcessing Object (ImageProcessing)
+            metrics       - Optional  : records each function's time when enabled (Metrics)
+            config_name   - Optional  : config label of the recorded times (Str)
+        '''
+        if metrics is None or not metrics.enabled():
+            for operation, arguments, description in self.__stages:
+                operation(image_object, *arguments)
+
+            return image_object
+
+        for operation, arguments, description in self.__stages:
+            start = metrics.clock()
+            operation(image_object, *arguments)
+            metrics.observeSince(Pipeline.METRIC_FUNCTION_SECONDS, start, config=config_name,
+                function=operation.__name__)
+
+        return image_object
+
+    def getFunctionNames(self):
+        return [operation.__name__ for operation, arguments, description in self.__stages]
+
+    def __compileStage(self, function_name, function_value):
+        #Suffixes allow a function to be repeated, e.g. erode and erode_2.
+        name = function_name.split("_", 1)[0]
+        operation = getattr(ImageProcessing, name, None)
+
+        if operation is None or not callable(operation) or name.startswith("_") \
+            or name in Pipeline.__EXCLUDED_FUNCTIONS:
+            raise Exception("Invalid image processing function provided: {}".format(function_name))
+
+        if not isinstance(function_value, list):
+            raise Exception("Invalid image processing function provided: {}:{}\nError: {}" \
+                .format(function_name, function_value, "arguments must be a list"))
+
+        arguments = list(function_value)
+        try:
+            inspect.signature(operation).bind(None, *arguments)
+
+            if name in Pipeline.__KERNEL_FUNCTIONS:
+                arguments[0] = ImageProcessing.kernel(arguments[0])
+        except (TypeError, ValueError) as ex:
+            raise Exception("Invalid image processing function provided: {}:{}\nError: {}" \
+                .format(function_name, function_value, ex))
+
+        return (operation, tuple(arguments), "{}:{}".format(function_name, function_value))
+
+    def __validate(self):
+        image_object = ImageProcessingSection().importImage(
+            np.zeros(Pipeline.__VALIDATION_IMAGE_SHAPE, np.uint8))
+
+        for operation, arguments, description in self.__stages:
+            try:
+                operation(image_object, *arguments)
+            except Exception as ex:
+                raise Exception("Invalid image processing function provided: {}\nError: {}" \
+                    .format(description, ex))
+
@@ -1,64 +1,118 @@
-from keras.models import load_model
-
 import numpy as np
 import cv2
 
+from lib.Inference import KerasEngine
+
 class Predict():
-    __instance = None
+    FAILED = "FAILED"
 
     def __init__(self):
-        self.__getInstance()
-
-    def __getInstance(self):
-        if Predict.__instance == None:
-            self.__instance = self
-            self.__prediction = None
-            self.__model = None
-            self.__labelBinary = None
-        else:
-            return Predict.__instance
-
-    def initialise(self, model_path, labelBinary, force_initialise = False):
+        self.__prediction = None
+        self.__model = None
+        self.__labelBinary = None
+
+    def initialise(self, model_path, labelBinary, force_initialise = False, engine = None):
+        '''
+        Load a model and the label binarizer its predictions are decoded with.
+        @params:
+            model_path        - Required  : model file (Path)
+            labelBinary       - Required  : fitted label binarizer (LabelBinarizer)
+            force_initialise  - Optional  : reload an already loaded model (Bool)
+            engine            - Optional  : inference engine, Keras when None (Engine)
+        '''
         if (self.__model == None or self.__labelBinary == None) or force_initialise == True:
             if not model_path.is_file():
                 raise Exception("No Model exists for: {}".format(str(model_path)))
 
-            self.__model = load_model(str(model_path))
+            self.__model = (KerasEngine() if engine is None else engine).load(model_path)
 
             self.__labelBinary = labelBinary
 
         return self
 
+    def getSize(self):
+        '''
+            Approximate bytes held by the loaded model.
+        '''
+        if self.__model is None:
+            raise Exception("Predict needs to be initialised.")
+
+        return self.__model.getSize()
+
+    def sections(self, segmented_image, section_image_object, image_size):
+        '''
+        Crop and resize every character of a segmented CAPTCHA into one tensor.
+        @params:
+            segmented_image       - Required  : successfully segmented CAPTCHA (Segment)
+            section_image_object  - Required  : ImageProcessing Object (ImageProcessingSection)
+            image_size            - Required  : model input width and height (List[Int])
+        '''
+        character_cords = segmented_image.getCharacterCords()
+        image = segmented_image.getImage()
+
+        sections = np.empty((len(character_cords), image_size[1], image_size[0], 1),
+            dtype=np.float32)
+
+        for counter, (x, y, w, h) in enumerate(character_cords):
+            section_image_object.importImage(image[y - 2:y + h + 2, x - 2:x + w + 2]) \
+                .resize(image_size[0], image_size[1])
+            sections[counter, :, :, 0] = section_image_object.getImage()
+
+        return sections
+
+    def classify(self, sections):
+        '''
+        Classify a tensor of character sections with a single forward pass.
+        @params:
+            sections   - Required  : character sections (numpy.ndarray (N, h, w, 1))
+        '''
+        if len(sections) == 0:
+            return np.empty(0, dtype=self.__labelBinary.classes_.dtype)
+
+        predictions = self.__model.predict(sections, batch_size=len(sections))
+
+        return Predict.decode(self.__labelBinary, predictions)
+
+    @staticmethod
+    def decode(labelBinary, predictions):
+        '''
+        The label of each row of model outputs.
+        @params:
+            labelBinary   - Required  : fitted label binarizer (LabelBinarizer)
+            predictions   - Required  : one row of outputs per character (numpy.ndarray (N, outputs))
+        '''
+        #Two labels are binarized into a single column, its threshold picks the label.
+        if predictions.shape[1] == 1:
+            return labelBinary.inverse_transform(predictions)
+
+        return labelBinary.classes_[np.argmax(predictions, axis=1)]
+
     def predict(self, segmented_image, section_image_object, image_size, show = False):
         if segmented_image.successful():
-            self.__prediction = ""
-
-            output = segmented_image.getImage().copy()
-            for character_cord in segmented_image.getCharacterCords():
-                (x, y, w, h) = character_cord
+            predicted_characters = self.classify(self.sections(segmented_image,
+                section_image_object, image_size))
 
-                section_image_object.importImage(segmented_image.getImage()[y - 2:y + h + 2, x - 2:x + w + 2]) \
-                    .resize(image_size[0], image_size[1])
-                image_section = np.expand_dims(section_image_object.getImage(), axis=2)
-                image_section = np.expand_dims(image_section, axis=0)
-
-                predict = self.__model.predict(image_section)
-                predicted_character = self.__labelBinary.inverse_transform(predict)[0]
-
-                self.__prediction += predicted_character
-
-                cv2.rectangle(output, (x - 2, y - 2), (x + w + 4, y + h + 4),
-                    (255, 255, 255), 1)
-                cv2.putText(output, predicted_character, (x + 2, y + 2),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            self.__prediction = "".join(predicted_characters)
 
             if show:
-                cv2.imshow("Result", output)
-                cv2.waitKey(0)
+                self.__show(segmented_image, predicted_characters)
         else:
-            self.__prediction = "FAILED"
+            self.__prediction = Predict.FAILED
 
         return self
 
+    def __show(self, segmented_image, predicted_characters):
+        output = segmented_image.getImage().copy()
+
+        for (x, y, w, h), predicted_character in zip(segmented_image.getCharacterCords(),
+            predicted_characters):
+            cv2.rectangle(output, (x - 2, y - 2), (x + w + 4, y + h + 4),
+                (255, 255, 255), 1)
+            cv2.putText(output, predicted_character, (x + 2, y + 2),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+        cv2.imshow("Result", output)
+        cv2.waitKey(0)
+
     def getResult(self):
         return self.__prediction
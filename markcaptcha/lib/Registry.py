@@ -0,0 +1,172 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import threading
+
+
+class Registry():
+
+    '''
+        Loaded predictors by config, least recently used first. Past the memory budget the
+        least recently used predictors are evicted, the one just loaded is always kept.
+        Models load outside the lock, requests for a model already loading wait for that load.
+    '''
+
+    STAT_HITS = "hits"
+    STAT_MISSES = "misses"
+    STAT_EVICTIONS = "evictions"
+    STAT_MODELS = "models"
+    STAT_SIZE = "size"
+    STAT_BUDGET = "budget"
+
+    def __init__(self):
+        self.__budget = None
+        self.__predictors = OrderedDict()
+        self.__loading = {}
+        self.__size = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__lock = threading.RLock()
+
+    def initialise(self, budget = None):
+        '''
+        @params:
+            budget   - Optional  : bytes of model weights kept loaded, None is unlimited (Int)
+        '''
+        if budget is not None and budget <= 0:
+            raise Exception("Invalid model memory budget supplied: {}".format(budget))
+
+        with self.__lock:
+            self.__budget = budget
+            self.__evict()
+
+        return self
+
+    def get(self, key, loader):
+        '''
+        A loaded predictor, loaded and registered on a miss.
+        @params:
+            key      - Required  : config filename (Str)
+            loader   - Required  : function returning a loaded predictor (Callable)
+        '''
+        with self.__lock:
+            if key in self.__predictors:
+                self.__hits += 1
+                self.__predictors.move_to_end(key)
+                return self.__predictors[key][0]
+
+            (loading, owner) = self.__loadingFuture(key)
+            if owner:
+                self.__misses += 1
+            else:
+                self.__hits += 1
+
+        return self.__load(key, loader, loading, owner)
+
+    def preload(self, key, loader):
+        '''
+        Load a predictor ahead of its first request, without counting a miss.
+        @params:
+            key      - Required  : config filename (Str)
+            loader   - Required  : function returning a loaded predictor (Callable)
+        '''
+        with self.__lock:
+            if key in self.__predictors:
+                self.__predictors.move_to_end(key)
+                return self.__predictors[key][0]
+
+            (loading, owner) = self.__loadingFuture(key)
+
+        return self.__load(key, loader, loading, owner)
+
+    def replace(self, key, predictor):
+        '''
+        Swap a loaded predictor for a newer one, keeping its place in the LRU order.
+        Predictions already holding the old predictor finish with it, a load still running
+        is returned to its callers but never registered.
+        @params:
+            key         - Required  : config filename (Str)
+            predictor   - Required  : loaded predictor (Predict)
+        '''
+        size = predictor.getSize()
+
+        with self.__lock:
+            self.__loading.pop(key, None)
+            if key not in self.__predictors:
+                return False
+
+            self.__size += size - self.__predictors[key][1]
+            self.__predictors[key] = (predictor, size)
+            self.__evict()
+
+            return True
+
+    def remove(self, key):
+        with self.__lock:
+            self.__loading.pop(key, None)
+            if key in self.__predictors:
+                self.__size -= self.__predictors.pop(key)[1]
+
+        return self
+
+    def getKeys(self):
+        '''
+            Loaded configs, least recently used first.
+        '''
+        with self.__lock:
+            return list(self.__predictors)
+
+    def getStats(self):
+        with self.__lock:
+            return {Registry.STAT_HITS : self.__hits, Registry.STAT_MISSES : self.__misses,
+                Registry.STAT_EVICTIONS : self.__evictions,
+                Registry.STAT_MODELS : len(self.__predictors), Registry.STAT_SIZE : self.__size,
+                Registry.STAT_BUDGET : self.__budget}
+
+    def __loadingFuture(self, key):
+        '''
+            The running load of a key, or a new one the caller owns.
+        '''
+        if key in self.__loading:
+            return self.__loading[key], False
+
+        self.__loading[key] = Future()
+
+        return self.__loading[key], True
+
+    def __load(self, key, loader, loading, owner):
+        '''
+            Run the loader without holding the lock, waiting instead when another caller owns the load.
+        '''
+        if not owner:
+            return loading.result()
+
+        try:
+            predictor = loader()
+            size = predictor.getSize()
+        except BaseException as ex:
+            with self.__lock:
+                if self.__loading.get(key) is loading:
+                    del self.__loading[key]
+            loading.set_exception(ex)
+            raise
+
+        with self.__lock:
+            #Replaced or removed while loading, the predictor may be out of date.
+            if self.__loading.get(key) is loading:
+                del self.__loading[key]
+                self.__predictors[key] = (predictor, size)
+                self.__size += size
+                self.__evict()
+
+        loading.set_result(predictor)
+
+        return predictor
+
+    def __evict(self):
+        if self.__budget is None:
+            return
+
+        while self.__size > self.__budget and len(self.__predictors) > 1:
+            self.__size -= self.__predictors.popitem(last=False)[1][1]
+            self.__evictions += 1
@@ -4,10 +4,28 @@ import numpy as np
 
 class Segmentation():
 
+    '''
+        Backends that find the largest characters of an image.
+        contours sorts every contour by the pixels in its bounding box,
+        components ranks connected components by area from a single native call.
+    '''
+    BACKEND_CONTOURS = "contours"
+    BACKEND_COMPONENTS = "components"
+    BACKENDS = (BACKEND_CONTOURS, BACKEND_COMPONENTS)
+
     def __init__(self):
         if type(self) is Segmentation:
             raise Exception('Segmentation is an abstract class and cannot be instantiated.')
         self._image = None
+        self._backend = Segmentation.BACKEND_CONTOURS
+
+    def setBackend(self, backend):
+        if backend not in Segmentation.BACKENDS:
+            raise Exception("Invalid segmentation backend supplied: {}, expected one of {}" \
+                .format(backend, ", ".join(Segmentation.BACKENDS)))
+
+        self._backend = backend
+        return self
 
     def getImage(self):
         if self._image.getImage().all() == None:
@@ -23,6 +41,9 @@ class Segmentation():
         return cv2.countNonZero(self._image.getImage()[y:y + h, x:x + w])
 
     def getLargestContours(self, amount):
+        if self._backend == Segmentation.BACKEND_COMPONENTS:
+            return self.getLargestComponents(amount)
+
         contours = self._image.findContours(cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
 
         largest_contours = sorted(contours, key=lambda x: self.pixelCount(x),
@@ -30,37 +51,77 @@ class Segmentation():
 
         return [cv2.boundingRect(contour) for contour in largest_contours]
 
+    def getLargestComponents(self, amount):
+        '''
+        Bounding boxes of the largest 8-connected components, largest first.
+        @params:
+            amount   - Required  : maximum amount of components (Int)
+        '''
+        stats = cv2.connectedComponentsWithStats(self._image.getImage(), connectivity=8)[2]
+
+        #The first component is the background.
+        stats = stats[1:]
+        areas = stats[:, cv2.CC_STAT_AREA]
+
+        if amount <= 0:
+            return []
+
+        largest = np.arange(len(areas))
+        if amount < len(areas):
+            largest = np.argpartition(-areas, amount - 1)[:amount]
+
+        largest = largest[np.argsort(-areas[largest], kind="stable")]
+
+        return [tuple(int(value) for value in stats[index, :cv2.CC_STAT_AREA]) for index in largest]
+
 
 class Outliers(Segmentation):
     THRESHOLD = 3
 
+    '''
+        Minimum outlier used when no aspect ratio is an outlier.
+    '''
+    DEFAULT_MIN_OUTLIER = 1.5
+
     def __init__(self):
+        super().__init__()
         self.__outliers = []
         self.__image_objects = []
+        self.__aspect_ratios = []
+        self.__calibrated_aspect_ratios = np.empty(0)
 
     def addImageObject(self, image):
         self.__image_objects.append(image)
         return self
 
+    def addAspectRatios(self, aspect_ratios):
+        '''
+        Add precomputed aspect ratios, so calibration doesn't need to hold the images.
+        @params:
+            aspect_ratios   - Required  : aspect ratios of an image's largest contours (List[Float])
+        '''
+        self.__aspect_ratios.extend(aspect_ratios)
+        return self
+
+    def getAspectRatios(self, image_object, captcha_length):
+        self._image = image_object
+
+        return [w / h for (x, y, w, h) in super().getLargestContours(captcha_length)]
+
     def setOutliers(self, outlier):
         self.__outliers = [outlier]
 
     def doOutliers(self, captcha_length):
-        if len(self.__image_objects) == 0:
+        if len(self.__image_objects) == 0 and len(self.__aspect_ratios) == 0:
             raise Exception("No image objects supplied for outliers.")
 
-        aspect_ratios = []
+        aspect_ratios = list(self.__aspect_ratios)
 
         for image_object in self.__image_objects:
-            self._image = image_object
-            image_contours = super().getLargestContours(captcha_length)
-
-            for cords in image_contours:
-                (x, y, w, h) = cords
-
-                aspect_ratios.append(w/h)
+            aspect_ratios.extend(self.getAspectRatios(image_object, captcha_length))
 
-        self.__outliers = self.calculateZScore(aspect_ratios, Outliers.THRESHOLD)
+        self.__calibrated_aspect_ratios = np.array(aspect_ratios, dtype=np.float64)
+        self.__outliers = self.calculateZScore(self.__calibrated_aspect_ratios, Outliers.THRESHOLD)
 
         return self
 
@@ -71,9 +132,15 @@ class Outliers(Segmentation):
             data        - Required  : aspect ratios (List[Int])
             threshold   - Required  : standard deviations (Int)
         '''
+        data = np.asarray(data, dtype=np.float64)
+        if len(data) == 0:
+            return []
 
-        data = np.array(data)
-        return [value for value in data if np.abs((value - np.mean(data)) / np.std(data)) > threshold]
+        #A constant list has no outliers, its z-scores are NaN.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = np.abs((data - data.mean()) / data.std())
+
+        return data[z_scores > threshold].tolist()
 
     def getOutliers(self):
         if self.__outliers == None:
@@ -83,10 +150,39 @@ class Outliers(Segmentation):
 
     def getMinOutlier(self):
         if len(self.__outliers) == 0:
-            self.__outliers = [1.5]
+            self.__outliers = [Outliers.DEFAULT_MIN_OUTLIER]
 
         return round(min(self.__outliers), 2)
 
+    def getMinOutlierInterval(self, confidence = 0.95, resamples = 200, seed = None):
+        '''
+        Bootstrap confidence interval of the minimum outlier, for calibrating from a sample.
+        @params:
+            confidence  - Optional  : confidence level of the interval (Float)
+            resamples   - Optional  : amount of bootstrap resamples (Int)
+            seed        - Optional  : random seed for the resamples (Int)
+        '''
+        data = self.__calibrated_aspect_ratios
+        if len(data) == 0:
+            raise Exception("Outliers need to be calculated before their interval.")
+
+        random_state = np.random.RandomState(seed)
+
+        min_outliers = np.empty(resamples)
+        for counter in range(resamples):
+            resample = data[random_state.randint(0, len(data), len(data))]
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                outliers = resample[np.abs((resample - resample.mean()) / resample.std())
+                    > Outliers.THRESHOLD]
+
+            min_outliers[counter] = outliers.min() if len(outliers) else Outliers.DEFAULT_MIN_OUTLIER
+
+        tail = (1 - confidence) / 2 * 100
+        (lower, upper) = np.percentile(min_outliers, [tail, 100 - tail])
+
+        return (round(lower, 2), round(upper, 2))
+
     def getImageObjects(self):
         return self.__image_objects
 
@@ -101,7 +197,6 @@ class Outliers(Segmentation):
 
 
 class Segment(Segmentation):
-    __CHARACTER_COUNTER = {}
 
     def __init__(self):
         super().__init__()
@@ -141,15 +236,40 @@ class Segment(Segmentation):
         return self.__character_cords != False
 
     def saveCharacters(self, save_path):
+        '''
+        Save each character as <label>/<CAPTCHA filename>_<position>.png, names are unique
+        per CAPTCHA so concurrent processes never write to the same file.
+        @params:
+            save_path   - Required  : characters folder (Path)
+        '''
         if self.successful():
-            for character_cord, character in zip(self.__character_cords,
-                self._image.getFilename()[:len(self.__character_cords)]):
+            filename = Path(self._image.getFilename())
+
+            for position, (character_cord, character) in enumerate(zip(self.__character_cords,
+                filename.stem[:len(self.__character_cords)])):
                 (x, y, w, h) = character_cord
 
                 new_save_path = save_path / character
                 new_save_path.mkdir(parents=True, exist_ok=True)
 
-                current_count = Segment.__CHARACTER_COUNTER.get(character, 1)
-                cv2.imwrite(str(new_save_path / "{}.png".format(str(current_count))),
+                cv2.imwrite(str(new_save_path / "{}_{}.png".format(filename.stem, position)),
                     self._image.getImage()[y - 2:y + h + 2, x - 2:x + w + 2])
-                Segment.__CHARACTER_COUNTER[character] = current_count + 1
+
+    def appendCharacters(self, shard_writer):
+        '''
+        Append each character, its label and its <CAPTCHA filename>_<position> name to a shard
+        instead of saving it as a PNG.
+        @params:
+            shard_writer   - Required  : opened shard writer (ShardWriter)
+        '''
+        if self.successful():
+            filename = Path(self._image.getFilename())
+
+            for position, (character_cord, character) in enumerate(zip(self.__character_cords,
+                filename.stem[:len(self.__character_cords)])):
+                (x, y, w, h) = character_cord
+
+                shard_writer.append(self._image.getImage()[y - 2:y + h + 2, x - 2:x + w + 2],
+                    character, "{}_{}".format(filename.stem, position))
+
+        return self
@@ -0,0 +1,301 @@
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from collections import OrderedDict
+import threading, queue, time, json, base64, binascii
+
+from lib.Factory import Factory
+
+
+class PendingPrediction():
+
+    '''
+        A queued request, resolved with its prediction or with the HTTP status and message of
+        its error. Error details are only logged, never sent to the client.
+    '''
+
+    def __init__(self, config_filename, image):
+        self.config_filename = config_filename
+        self.image = image
+        self.result = None
+        self.status = None
+        self.error = None
+        self.__done = threading.Event()
+
+    def resolve(self, result = None, status = None, error = None):
+        self.result = result
+        self.status = status
+        self.error = error
+        self.__done.set()
+
+    def wait(self, timeout):
+        return self.__done.wait(timeout)
+
+
+class MicroBatcher():
+
+    '''
+        Coalesces concurrent prediction requests into MarkCAPTCHA.predictBatch calls.
+        A single worker thread owns the MarkCAPTCHA object, requests wait in a
+        bounded queue and are rejected once it is full.
+    '''
+
+    def __init__(self, mark, max_batch_size, max_wait, max_queue):
+        if max_batch_size <= 0 or max_queue <= 0 or max_wait < 0:
+            raise Exception("Invalid micro batch settings: batch size {}, wait {}, queue {}." \
+                .format(max_batch_size, max_wait, max_queue))
+
+        self.__mark = mark
+        self.__max_batch_size = max_batch_size
+        self.__max_wait = max_wait
+        self.__queue = queue.Queue(maxsize=max_queue)
+        self.__running = False
+        self.__worker = None
+
+    def start(self):
+        self.__running = True
+        self.__worker = threading.Thread(target=self.__run, daemon=True)
+        self.__worker.start()
+
+        return self
+
+    def stop(self):
+        self.__running = False
+        if self.__worker is not None:
+            self.__worker.join()
+            self.__worker = None
+
+        return self
+
+    def getQueueSize(self):
+        return self.__queue.qsize()
+
+    def submit(self, config_filename, image):
+        '''
+        Queue an image for prediction without blocking.
+        @params:
+            config_filename  - Required  : CAPTCHA config filename (Str)
+            image            - Required  : Base64 string or raw bytes (Str/Bytes)
+        '''
+        pending = PendingPrediction(config_filename, image)
+
+        try:
+            self.__queue.put_nowait(pending)
+        except queue.Full:
+            return None
+
+        return pending
+
+    def __nextBatch(self):
+        try:
+            batch = [self.__queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.__max_wait
+        while len(batch) < self.__max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.__queue.get(timeout=remaining) if remaining > 0
+                    else self.__queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def __run(self):
+        while self.__running:
+            configs = OrderedDict()
+            for pending in self.__nextBatch():
+                configs.setdefault(pending.config_filename, []).append(pending)
+
+            for config_filename, batch in configs.items():
+                self.__predict(config_filename, batch)
+
+    def __predict(self, config_filename, batch):
+        try:
+            results = self.__mark.predictBatch(config_filename,
+                [pending.image for pending in batch])
+        except Exception as ex:
+            #One bad image must not fail the requests batched with it, each is predicted alone.
+            if len(batch) > 1:
+                for pending in batch:
+                    self.__predict(config_filename, [pending])
+                return
+
+            (pending,) = batch
+            if not self.__decodable(pending.image):
+                pending.resolve(status=400, error="CAPTCHA image could not be decoded.")
+            else:
+                print("MARKCAPTCHA: unable to predict a CAPTCHA for {}: {}".format(config_filename, ex))
+                pending.resolve(status=500, error="Prediction failed.")
+            return
+
+        for pending, result in zip(batch, results):
+            pending.resolve(result)
+
+    def __decodable(self, image):
+        try:
+            Factory().create(Factory.CLASS_IMAGEPROCESSING_BYTES).importImage(image)
+        except Exception:
+            return False
+
+        return True
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+
+    __PATH_PREDICT = "/predict/"
+    __PATH_HEALTH = "/health"
+    __PATH_METRICS = "/metrics"
+
+    __METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    __BINARY_CONTENT_TYPES = ("application/octet-stream", "image/")
+
+    def do_GET(self):
+        if self.path == PredictionRequestHandler.__PATH_METRICS:
+            return self.__respondText(200, self.server.mark.exportMetrics(),
+                PredictionRequestHandler.__METRICS_CONTENT_TYPE)
+
+        if self.path != PredictionRequestHandler.__PATH_HEALTH:
+            return self.__respond(404, {"error": "Unknown path: {}".format(self.path)})
+
+        return self.__respond(200, {"configs": self.server.mark.getConfigs(),
+            "queued": self.server.batcher.getQueueSize(), "models": self.server.mark.getModelStats(),
+            "cache": self.server.mark.getCacheStats()})
+
+    def do_POST(self):
+        if not self.path.startswith(PredictionRequestHandler.__PATH_PREDICT):
+            return self.__respond(404, {"error": "Unknown path: {}".format(self.path)})
+
+        config_filename = self.path[len(PredictionRequestHandler.__PATH_PREDICT):]
+        if config_filename not in self.server.mark.getConfigs():
+            return self.__respond(404, {"error": "Invalid configuration name: {}".format(config_filename)})
+
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            content_length = -1
+
+        if content_length < 0:
+            self.close_connection = True
+            return self.__respond(400, {"error": "Invalid Content-Length."})
+
+        #Oversized bodies are never read, the connection is closed instead.
+        if content_length > self.server.max_body_bytes:
+            self.close_connection = True
+            return self.__respond(413, {"error": "CAPTCHA image is larger than {} bytes.".format(
+                self.server.max_body_bytes)})
+
+        body = self.rfile.read(content_length)
+        if not body:
+            return self.__respond(400, {"error": "No CAPTCHA image supplied."})
+
+        if not self.headers.get("Content-Type", "").startswith(PredictionRequestHandler.__BINARY_CONTENT_TYPES):
+            try:
+                body = base64.b64decode(body, validate=True)
+            except (binascii.Error, ValueError):
+                return self.__respond(400, {"error": "CAPTCHA image is not valid Base64."})
+
+        pending = self.server.batcher.submit(config_filename, body)
+        if pending is None:
+            return self.__respond(503, {"error": "Prediction queue is full."}, {"Retry-After": "1"})
+
+        if not pending.wait(self.server.timeout_seconds):
+            return self.__respond(504, {"error": "Prediction timed out."})
+
+        if pending.error is not None:
+            return self.__respond(pending.status, {"error": pending.error})
+
+        return self.__respond(200, {"config": config_filename, "prediction": pending.result})
+
+    def __respond(self, status, content, headers = None):
+        self.__respondText(status, json.dumps(content), "application/json", headers)
+
+    def __respondText(self, status, content, content_type, headers = None):
+        body = content.encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Server():
+
+    '''
+        Long running HTTP prediction server.
+            POST /predict/<config.json> with a Base64 or binary
+            (application/octet-stream, image/*) CAPTCHA body. Responds 400 when the image
+            can't be decoded, 413 when the body is too large and 500 when prediction fails.
+            GET /health for the served configs, queue size, loaded models and result cache.
+            GET /metrics for the prediction metrics in the Prometheus text format.
+    '''
+
+    MAX_BODY_BYTES = 2 ** 20
+
+    def __init__(self):
+        self.__httpd = None
+        self.__batcher = None
+        self.__thread = None
+
+    def initialise(self, mark, host, port, max_batch_size, max_wait, max_queue,
+    timeout_seconds = 30, max_body_bytes = MAX_BODY_BYTES):
+        if max_body_bytes <= 0:
+            raise Exception("Invalid maximum body size supplied: {}".format(max_body_bytes))
+
+        self.__batcher = MicroBatcher(mark, max_batch_size, max_wait, max_queue)
+
+        self.__httpd = ThreadingHTTPServer((host, port), PredictionRequestHandler)
+        self.__httpd.mark = mark
+        self.__httpd.batcher = self.__batcher
+        self.__httpd.timeout_seconds = timeout_seconds
+        self.__httpd.max_body_bytes = max_body_bytes
+
+        return self
+
+    def getAddress(self):
+        if self.__httpd is None:
+            raise Exception("Server needs to be initialised.")
+
+        return self.__httpd.server_address
+
+    def start(self):
+        '''
+            Serve requests on a background thread.
+        '''
+        self.__batcher.start()
+        self.__thread = threading.Thread(target=self.__httpd.serve_forever, daemon=True)
+        self.__thread.start()
+
+        return self
+
+    def serveForever(self):
+        self.__batcher.start()
+        try:
+            self.__httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self.__thread is not None:
+            self.__httpd.shutdown()
+            self.__thread.join()
+            self.__thread = None
+
+        self.__httpd.server_close()
+        self.__batcher.stop()
+
+        return self
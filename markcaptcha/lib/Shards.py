@@ -0,0 +1,280 @@
+from pathlib import Path
+import os, shutil, uuid
+
+import numpy as np
+
+from lib.ImageProcessing import ImageProcessingSection
+
+
+class ShardWriter():
+
+    '''
+        Appends characters to a shard of its own, a new one after the process forks, so
+        any number of processes write to a run folder without locking. Every character's
+        pixels are flushed before its label, so a reader never sees a label without its character.
+    '''
+
+    def __init__(self):
+        self.__shards_path = None
+        self.__image_size = None
+        self.__pid = None
+        self.__data = None
+        self.__index = None
+        self.__section = ImageProcessingSection()
+
+    def open(self, shards_path, image_size):
+        '''
+        @params:
+            shards_path   - Required  : run folder made by CharacterShards.createRun (Path)
+            image_size    - Required  : model input width and height (List[Int])
+        '''
+        self.close()
+
+        self.__shards_path = Path(shards_path)
+        self.__image_size = tuple(image_size)
+        self.__shards_path.mkdir(parents=True, exist_ok=True)
+
+        return self
+
+    def append(self, image, label, name = ""):
+        '''
+        Resize a character as Predict.sections does and append it with its label.
+        @params:
+            image   - Required  : character crop (numpy.ndarray)
+            label   - Required  : character text, without a line break or tab (Str)
+            name    - Optional  : unique name of the character, ordering it when loaded (Str)
+        '''
+        if self.__shards_path is None:
+            raise Exception("Shard writer needs to be opened.")
+
+        if not label or any(separator in label for separator in CharacterShards.SEPARATORS):
+            raise Exception("Invalid character label supplied: {!r}".format(label))
+
+        if "\n" in name:
+            raise Exception("Invalid character name supplied: {!r}".format(name))
+
+        if self.__pid != os.getpid():
+            self.__openShard()
+
+        character = self.__section.importImage(image) \
+            .resize(self.__image_size[0], self.__image_size[1]).grey().getImage()
+
+        self.__data.write(np.ascontiguousarray(character, dtype=np.uint8).tobytes())
+        self.__data.flush()
+        self.__index.write(label + "\t" + name + "\n")
+        self.__index.flush()
+
+        return self
+
+    def close(self):
+        if self.__data is not None and self.__pid == os.getpid():
+            self.__data.close()
+            self.__index.close()
+
+        self.__data = None
+        self.__index = None
+        self.__pid = None
+
+        return self
+
+    def __openShard(self):
+        #A forked child must not close its parent's files, they are only dropped.
+        self.__data = None
+        self.__index = None
+
+        name = "{}x{}-{}-{}".format(self.__image_size[0], self.__image_size[1], os.getpid(),
+            uuid.uuid4().hex)
+
+        self.__data = open(str(self.__shards_path / (name + CharacterShards.DATA_SUFFIX)), "xb")
+        self.__index = open(str(self.__shards_path / (name + CharacterShards.INDEX_SUFFIX)), "x",
+            encoding="utf-8")
+        self.__pid = os.getpid()
+
+
+class ShardImages():
+
+    '''
+        Rows of several memory mapped shards indexed as one (N, height, width, 1) array.
+    '''
+
+    def __init__(self, shards, image_size, order = None):
+        '''
+        @params:
+            shards       - Required  : memory mapped shards (List[numpy.memmap])
+            image_size   - Required  : model input width and height (List[Int])
+            order        - Optional  : shard row of each row, in shard order when None (numpy.ndarray)
+        '''
+        self.__shards = shards
+        self.__shape = (image_size[1], image_size[0], 1)
+        self.__offsets = np.cumsum([0] + [len(shard) for shard in shards])
+        self.__order = order
+
+    def __len__(self):
+        return int(self.__offsets[-1])
+
+    @property
+    def shape(self):
+        return (len(self),) + self.__shape
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self[np.array([index])][0]
+
+        if isinstance(index, slice):
+            rows = np.arange(*index.indices(len(self)))
+        else:
+            rows = np.asarray(index)
+            if rows.dtype == bool:
+                rows = np.flatnonzero(rows)
+            rows = np.where(rows < 0, rows + len(self), rows)
+
+        if rows.size and (rows.min() < 0 or rows.max() >= len(self)):
+            raise IndexError("Character index out of range.")
+
+        if self.__order is not None:
+            rows = self.__order[rows]
+
+        shards = np.searchsorted(self.__offsets, rows, side="right") - 1
+
+        characters = np.empty((len(rows),) + self.__shape, dtype=np.uint8)
+        for shard in np.unique(shards):
+            selected = shards == shard
+            characters[selected] = self.__shards[shard][rows[selected] - self.__offsets[shard]]
+
+        return characters
+
+    def __array__(self, dtype = None, copy = None):
+        characters = self[:]
+        return characters if dtype is None else characters.astype(dtype)
+
+
+class CharacterShards():
+
+    '''
+        The characters of a shards folder read in place, with the CharacterDataset
+        interface Model.train and MarkCAPTCHA.quantizeModel use.
+        Every run writes to a run folder of its own, published by replacing the shards
+        folder's current file with its name, so runs never read or remove each other's shards.
+        A shard is a pair of files written by one process, <width>x<height>-<pid>-<token>.bin
+        holding uint8 characters at the model image size one after another, and a .labels
+        index with the label and name of each character on its own line, separated by a tab.
+    '''
+
+    DATA_SUFFIX = ".bin"
+    INDEX_SUFFIX = ".labels"
+    CURRENT_FILENAME = "current"
+    RUN_PREFIX = "run-"
+    SEPARATORS = ("\n", "\t")
+
+    def __init__(self):
+        self.__images = None
+        self.__labels = None
+
+    @staticmethod
+    def createRun(shards_path):
+        '''
+            A new empty run folder in the shards folder.
+        '''
+        run_path = Path(shards_path) / (CharacterShards.RUN_PREFIX + uuid.uuid4().hex)
+        run_path.mkdir(parents=True)
+
+        return run_path
+
+    @staticmethod
+    def publish(shards_path, run_path):
+        '''
+            Make a finished run the shards folder's current run, then remove the run it replaced.
+            Runs still being written are never removed.
+        '''
+        shards_path = Path(shards_path)
+        replaced = CharacterShards.currentRun(shards_path)
+
+        current_path = shards_path / CharacterShards.CURRENT_FILENAME
+        temporary_path = shards_path / (CharacterShards.CURRENT_FILENAME + "." + Path(run_path).name)
+        temporary_path.write_text(Path(run_path).name, encoding="utf-8")
+        os.replace(str(temporary_path), str(current_path))
+
+        #Readers already holding its shards keep their memory maps.
+        if replaced is not None and replaced.name != Path(run_path).name:
+            shutil.rmtree(str(replaced), ignore_errors=True)
+
+    @staticmethod
+    def currentRun(shards_path):
+        '''
+            The run folder last published in a shards folder, None before the first.
+        '''
+        current_path = Path(shards_path) / CharacterShards.CURRENT_FILENAME
+        try:
+            run_path = Path(shards_path) / current_path.read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+
+        return run_path if run_path.is_dir() else None
+
+    @staticmethod
+    def paths(shards_path, image_size):
+        '''
+            Data files of every shard of the current run written at an image size, in a stable order.
+        '''
+        run_path = CharacterShards.currentRun(shards_path)
+        if run_path is None:
+            return []
+
+        return sorted(run_path.glob("{}x{}-*{}".format(image_size[0], image_size[1],
+            CharacterShards.DATA_SUFFIX)))
+
+    def load(self, shards_path, image_size):
+        '''
+        Memory map every shard of the current run written at the model image size. Characters
+        are ordered by label and name, however the processes that wrote them were scheduled.
+        @params:
+            shards_path   - Required  : shards folder (Path)
+            image_size    - Required  : model input width and height (List[Int])
+        '''
+        data_paths = CharacterShards.paths(shards_path, image_size)
+        if not data_paths:
+            raise Exception("No {}x{} character shards exist in: {}".format(image_size[0],
+                image_size[1], str(shards_path)))
+
+        record_size = image_size[0] * image_size[1]
+
+        shards = []
+        labels = []
+        names = []
+        for data_path in data_paths:
+            with open(str(data_path.with_suffix(CharacterShards.INDEX_SUFFIX)), encoding="utf-8") as f:
+                shard_index = [line.split("\t", 1) for line in f.read().split("\n")[:-1]]
+
+            #A writer may still be appending, only characters with a label are read.
+            count = min(len(shard_index), data_path.stat().st_size // record_size)
+            if count == 0:
+                continue
+
+            shards.append(np.memmap(str(data_path), dtype=np.uint8, mode="r",
+                shape=(count, image_size[1], image_size[0], 1)))
+            for entry in shard_index[:count]:
+                labels.append(entry[0])
+                names.append(entry[1] if len(entry) > 1 else "")
+
+        labels = np.array(labels)
+        order = np.lexsort((np.array(names), labels)) if len(labels) else None
+
+        self.__images = ShardImages(shards, image_size, order)
+        self.__labels = labels if order is None else labels[order]
+
+        return self
+
+    def getImages(self):
+        '''
+            Read only uint8 characters, shape (N, height, width, 1).
+        '''
+        if self.__images is None:
+            raise Exception("Character shards need to be loaded.")
+
+        return self.__images
+
+    def getLabels(self):
+        if self.__labels is None:
+            raise Exception("Character shards need to be loaded.")
+
+        return self.__labels
@@ -3,13 +3,39 @@ from pathlib import Path
 import argparse
 
 from lib.MarkCAPTCHA import MarkCAPTCHA
+from lib.Factory import Factory
 
 ARGUMENT_CONFIG = "config"
 
 ARGUMENT_PREDICT = "predict"
 ARGUMENT_IMAGEPROCESSING = "imageprocessing"
 ARGUMENT_BUILD = "build"
+ARGUMENT_RESUME = "resume"
+ARGUMENT_FINETUNE = "finetune"
+ARGUMENT_EXPORT = "export"
+ARGUMENT_QUANTIZE = "quantize"
 ARGUMENT_SHOW = "show"
+ARGUMENT_WORKERS = "workers"
+ARGUMENT_STREAM = "stream"
+ARGUMENT_NO_CLEANED = "nocleaned"
+ARGUMENT_SAMPLE = "sample"
+ARGUMENT_SHARDS = "shards"
+ARGUMENT_INPLACE = "inplace"
+ARGUMENT_NO_METRICS = "nometrics"
+
+ARGUMENT_SERVE = "serve"
+ARGUMENT_HOST = "host"
+ARGUMENT_PORT = "port"
+ARGUMENT_BATCH_SIZE = "batchsize"
+ARGUMENT_MAX_WAIT = "maxwait"
+ARGUMENT_QUEUE_SIZE = "queuesize"
+ARGUMENT_MAX_BODY = "maxbody"
+ARGUMENT_MODEL_BUDGET = "modelbudget"
+ARGUMENT_PRELOAD = "preload"
+ARGUMENT_CACHE = "cache"
+ARGUMENT_CACHE_PATH = "cachepath"
+ARGUMENT_CACHE_ROWS = "cacherows"
+ARGUMENT_RELOAD = "reload"
 
 IS_DOCKER = os.getenv('AM_I_IN_A_DOCKER_CONTAINER', False)
 
@@ -38,18 +64,98 @@ def main():
         help='Clean CAPTCHA images', action='store_true', default=False)
     parser.add_argument('--' + ARGUMENT_BUILD,
         help='Build a new CAPTCHA classifier model', action='store_true', default=False)
+    parser.add_argument('--' + ARGUMENT_RESUME,
+        help='Resume an interrupted --build from its last checkpoint', action='store_true',
+        default=False)
+    parser.add_argument('--' + ARGUMENT_FINETUNE,
+        help='Continue training the existing model in --build, adding new labels',
+        action='store_true', default=False)
+    parser.add_argument('--' + ARGUMENT_EXPORT,
+        help='Export the config model weights for the numpy backend', action='store_true',
+        default=False)
+    parser.add_argument('--' + ARGUMENT_QUANTIZE,
+        help='Export the config model with int8 weights for the int8 backend',
+        action='store_true', default=False)
     parser.add_argument('--' + ARGUMENT_SHOW,
         help='Display CAPTCHA text prediction', action='store_true', default=False)
 
+    parser.add_argument('--' + ARGUMENT_WORKERS,
+        help='Processes used to clean and segment CAPTCHA images', type=int, default=1)
+    parser.add_argument('--' + ARGUMENT_STREAM,
+        help='Clean CAPTCHA images in two passes without holding them in memory',
+        action='store_true', default=False)
+    parser.add_argument('--' + ARGUMENT_NO_CLEANED,
+        help='Skip writing cleaned CAPTCHA images to disk', action='store_true', default=False)
+    parser.add_argument('--' + ARGUMENT_SAMPLE,
+        help='Calibrate the threshold from a random sample of CAPTCHA images', type=int)
+    parser.add_argument('--' + ARGUMENT_SHARDS,
+        help='Append the characters to packed shard files instead of saving each as a PNG',
+        action='store_true', default=False)
+
+    parser.add_argument('--' + ARGUMENT_INPLACE,
+        help='Reuse scratch buffers for the images cleaned during prediction',
+        action='store_true', default=False)
+    parser.add_argument('--' + ARGUMENT_NO_METRICS,
+        help='Skip recording prediction stage times and counters', action='store_true',
+        default=False)
+
+    parser.add_argument('--' + ARGUMENT_SERVE,
+        help='Serve predictions over HTTP with the config model kept loaded',
+        action='store_true', default=False)
+    parser.add_argument('--' + ARGUMENT_HOST,
+        help='Server host address', default="127.0.0.1")
+    parser.add_argument('--' + ARGUMENT_PORT,
+        help='Server port', type=int, default=8080)
+    parser.add_argument('--' + ARGUMENT_BATCH_SIZE,
+        help='Maximum CAPTCHAs coalesced into one prediction batch', type=int, default=32)
+    parser.add_argument('--' + ARGUMENT_MAX_WAIT,
+        help='Maximum milliseconds to wait while filling a prediction batch', type=float,
+        default=5)
+    parser.add_argument('--' + ARGUMENT_QUEUE_SIZE,
+        help='Maximum queued CAPTCHAs before requests are rejected', type=int, default=256)
+    parser.add_argument('--' + ARGUMENT_MAX_BODY,
+        help='Maximum kilobytes of a request body before it is rejected', type=int, default=1024)
+    parser.add_argument('--' + ARGUMENT_MODEL_BUDGET,
+        help='Megabytes of model weights kept loaded, least recently used models are evicted past it',
+        type=float)
+    parser.add_argument('--' + ARGUMENT_PRELOAD,
+        help='Configs whose models are loaded before serving', metavar="config.json", nargs='+',
+        default=[])
+    parser.add_argument('--' + ARGUMENT_CACHE,
+        help='Predictions cached in memory by image content', type=int)
+    parser.add_argument('--' + ARGUMENT_CACHE_PATH,
+        help='SQLite file caching predictions across processes, requires --cache',
+        metavar="cache.sqlite")
+    parser.add_argument('--' + ARGUMENT_CACHE_ROWS,
+        help='Predictions kept in the --cachepath SQLite file, the oldest written are deleted past it',
+        type=int)
+    parser.add_argument('--' + ARGUMENT_RELOAD,
+        help='Seconds between checks for changed configs, models and labels to reload while serving',
+        type=float, metavar="SECONDS")
+
     args = vars(parser.parse_args())
 
-    mark = MarkCAPTCHA().importConfigs()
+    model_budget = args[ARGUMENT_MODEL_BUDGET]
+    mark = MarkCAPTCHA(args[ARGUMENT_INPLACE],
+        None if model_budget is None else int(model_budget * 2 ** 20),
+        not args[ARGUMENT_NO_METRICS]).importConfigs()
+
+    if args[ARGUMENT_CACHE]:
+        mark.useCache(args[ARGUMENT_CACHE], args[ARGUMENT_CACHE_PATH], args[ARGUMENT_CACHE_ROWS])
 
     if args[ARGUMENT_IMAGEPROCESSING]:
-        mark.processImages(args[ARGUMENT_CONFIG])
+        mark.processImages(args[ARGUMENT_CONFIG], args[ARGUMENT_WORKERS],
+            args[ARGUMENT_STREAM], not args[ARGUMENT_NO_CLEANED], args[ARGUMENT_SAMPLE],
+            shards=args[ARGUMENT_SHARDS])
 
     if args[ARGUMENT_BUILD]:
-        mark.buildModel(args[ARGUMENT_CONFIG])
+        mark.buildModel(args[ARGUMENT_CONFIG], args[ARGUMENT_RESUME], args[ARGUMENT_FINETUNE])
+
+    if args[ARGUMENT_EXPORT]:
+        print("MARKCAPTCHA: exported {}".format(mark.exportModel(args[ARGUMENT_CONFIG])))
+
+    if args[ARGUMENT_QUANTIZE]:
+        print("MARKCAPTCHA: exported {}".format(mark.quantizeModel(args[ARGUMENT_CONFIG])))
 
     if IS_DOCKER and args[ARGUMENT_SHOW]:
         print("WARNING: --show can not be used inside a container.\n")
@@ -60,5 +166,20 @@ def main():
 
         print("MARKCAPTCHA: {} ".format(prediction))
 
+    if args[ARGUMENT_SERVE]:
+        #Load the models before accepting requests, the config's is used most recently.
+        mark.preloadModels(args[ARGUMENT_PRELOAD] + [args[ARGUMENT_CONFIG]])
+
+        if args[ARGUMENT_RELOAD]:
+            mark.watch(args[ARGUMENT_RELOAD])
+
+        server = Factory().create(Factory.CLASS_SERVER) \
+            .initialise(mark, args[ARGUMENT_HOST], args[ARGUMENT_PORT],
+                args[ARGUMENT_BATCH_SIZE], args[ARGUMENT_MAX_WAIT] / 1000.0,
+                args[ARGUMENT_QUEUE_SIZE], max_body_bytes=args[ARGUMENT_MAX_BODY] * 2 ** 10)
+
+        print("MARKCAPTCHA: serving on http://{}:{}/predict/<config.json>".format(*server.getAddress()))
+        server.serveForever()
+
 if __name__ == "__main__":
     main()
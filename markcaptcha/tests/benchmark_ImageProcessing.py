@@ -0,0 +1,128 @@
+import os
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import cv2
+import numpy as np
+from lib.Factory import Factory
+
+ARGUMENT_CONFIG = "config"
+ARGUMENT_FOLDER = "folder"
+
+ARGUMENT_SAMPLE = "sample"
+ARGUMENT_REPEAT = "repeat"
+
+PATH_CONFIG_CAPTCHA = "data/configs/captchas/"
+
+def operations(captcha_config):
+    '''
+    The config functions followed by the MarkCAPTCHA pre-segmentation functions.
+    '''
+    functions = [(function_name.split("_", 1)[0], function_value)
+        for function in captcha_config["functions"]
+        for function_name, function_value in function.items()]
+
+    return functions + [("grey", []), ("threshold", [0]), ("border", [4, 4]), ("fillHoles", [])]
+
+def clean(functions, image, scratch):
+    image_object = Factory().create(Factory.CLASS_IMAGEPROCESSING_SECTION) \
+        .importImage(image).useScratch(scratch)
+
+    for function_name, function_value in functions:
+        getattr(image_object, function_name)(*function_value)
+
+    return image_object
+
+def countAllocations(functions, image, scratch):
+    '''
+    Clean a CAPTCHA, returning the amount of images allocated by its operations.
+    '''
+    image_object = Factory().create(Factory.CLASS_IMAGEPROCESSING_SECTION) \
+        .importImage(image).useScratch(scratch)
+
+    allocations = 0
+    for function_name, function_value in functions:
+        previous_image = image_object.getImage()
+        getattr(image_object, function_name)(*function_value)
+
+        result = image_object.getImage()
+        if result is not previous_image and (scratch is None or not scratch.owns(result)):
+            allocations += 1
+
+    return allocations
+
+def peakMemory(functions, images, scratch):
+    '''
+    Average peak of memory traced while cleaning each CAPTCHA, in bytes.
+    '''
+    tracemalloc.start()
+
+    peaks = []
+    for image in images:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        clean(functions, image, scratch)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+
+    tracemalloc.stop()
+
+    return np.mean(peaks)
+
+def main():
+    print("Sample Usage:\n{}".format(r"python tests/benchmark_ImageProcessing.py --config \
+        captcha03.json --folder data/captchas/captcha_03/captchas --sample 200"))
+
+    parser = argparse.ArgumentParser(
+        description='MarkCAPTCHA - Benchmark Image Processing')
+    parser.add_argument('--' + ARGUMENT_CONFIG,
+        help='Provide filename for CAPTCHA config', metavar="config.json",
+        required=True)
+    parser.add_argument('--' + ARGUMENT_FOLDER,
+        help='Provide directory with CAPTCHA images',
+        required=True)
+
+    parser.add_argument('--' + ARGUMENT_SAMPLE,
+        help='Amount of images to benchmark', type=int, default=200)
+    parser.add_argument('--' + ARGUMENT_REPEAT,
+        help='Amount of timing repetitions', type=int, default=5)
+
+    args = vars(parser.parse_args())
+
+    captcha_config = Factory().create(Factory.CLASS_JSONPARSER) \
+        .parse(PATH_CONFIG_CAPTCHA + args[ARGUMENT_CONFIG]).getParsedContent()
+    functions = operations(captcha_config)
+
+    path = Path(args[ARGUMENT_FOLDER])
+    if not path.exists():
+        raise Exception("Invalid path provided: {}".format(path))
+
+    #Images are read up front so only the image processing is measured.
+    images = [cv2.imread(str(image)) for image in sorted(path.glob('*.png'))[:args[ARGUMENT_SAMPLE]]]
+    if not images:
+        raise Exception("No images found in: {}".format(path))
+
+    modes = {
+        "allocating": lambda: None,
+        "scratch": lambda: Factory().create(Factory.CLASS_SCRATCHBUFFERS),
+    }
+
+    for name, scratch_factory in modes.items():
+        scratch = scratch_factory()
+        allocations = [countAllocations(functions, image, scratch) for image in images]
+
+        best = min(timeit.repeat(lambda: [clean(functions, image, scratch) for image in images],
+            number=1, repeat=args[ARGUMENT_REPEAT]))
+
+        print("{:>12}: {:.3f} ms / CAPTCHA, {:.2f} images allocated / CAPTCHA, {:.1f} KiB peak / CAPTCHA" \
+            .format(name, best * 1000 / len(images), np.mean(allocations),
+                peakMemory(functions, images, scratch) / 1024))
+
+    return
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import os
+import sys
+import json
+import random
+import tempfile
+import timeit
+from pathlib import Path
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import numpy as np
+from lib.Factory import Factory
+
+ARGUMENT_CONFIG = "config"
+ARGUMENT_SAMPLE = "sample"
+ARGUMENT_SEED = "seed"
+ARGUMENT_REPEAT = "repeat"
+ARGUMENT_ARGUMENTS = "arguments"
+ARGUMENT_WORKERS = "workers"
+ARGUMENT_OUTPUT = "output"
+ARGUMENT_MIN_AGREEMENT = "minagreement"
+ARGUMENT_MAX_ACCURACY_LOSS = "maxaccuracyloss"
+
+FUNCTION_LINE_REMOVAL = "lineRemoval"
+FUNCTION_LINE_REMOVAL_FAST = "lineRemovalFast"
+
+PERCENTILES = (50, 90, 99)
+
+PATH_CONFIG_CAPTCHA = "data/configs/captchas/"
+PATH_CAPTCHAS = "data/captchas/"
+
+def summarise(timings):
+    '''
+    Milliseconds at each percentile, with the mean and amount of samples.
+    '''
+    timings = np.array(timings) * 1000
+
+    summary = {"p{}".format(percentile): round(float(value), 4)
+        for percentile, value in zip(PERCENTILES, np.percentile(timings, PERCENTILES))}
+    summary["mean"] = round(float(timings.mean()), 4)
+    summary["samples"] = len(timings)
+
+    return summary
+
+def lineRemovalConfig(captcha_config, function, arguments):
+    '''
+    The config with each line removal replaced by a function, keeping its line width.
+    '''
+    functions = []
+    for config_function in captcha_config["functions"]:
+        replaced = {}
+        for function_name, function_value in config_function.items():
+            (name, separator, suffix) = function_name.partition("_")
+            if name in (FUNCTION_LINE_REMOVAL, FUNCTION_LINE_REMOVAL_FAST):
+                function_name = function + separator + suffix
+                function_value = function_value[:1] + arguments
+            replaced[function_name] = function_value
+        functions.append(replaced)
+
+    return dict(captcha_config, functions=functions)
+
+def lineRemovalStage(captcha_config):
+    '''
+    The functions before the config's first line removal, and its name and arguments.
+    '''
+    functions = []
+    for function in captcha_config["functions"]:
+        for function_name, function_value in function.items():
+            name = function_name.split("_", 1)[0]
+            if name in (FUNCTION_LINE_REMOVAL, FUNCTION_LINE_REMOVAL_FAST):
+                return (functions, name, function_value)
+            functions.append({function_name: function_value})
+
+    raise Exception("Config has no line removal function.")
+
+def timeFunctions(configs, pipelines, images, repeat):
+    '''
+    Seconds of each config's line removal on its own and of its whole cleaning pipeline,
+    per image.
+    '''
+    stages = {}
+    for config_filename, captcha_config in configs.items():
+        (functions, name, arguments) = lineRemovalStage(captcha_config)
+        stages[config_filename] = (Factory().create(Factory.CLASS_PIPELINE).compile(functions),
+            name, arguments)
+
+    timings = {}
+    for counter in range(repeat):
+        for image in images:
+            for config_filename, (prefix, name, arguments) in stages.items():
+                image_object = prefix.apply(Factory().create(Factory.CLASS_IMAGEPROCESSING_BYTES) \
+                    .importImage(image))
+
+                start = timeit.default_timer()
+                getattr(image_object, name)(*arguments)
+                timings.setdefault("{} {}".format(config_filename, name), []).append(
+                    timeit.default_timer() - start)
+
+                image_object = Factory().create(Factory.CLASS_IMAGEPROCESSING_BYTES).importImage(image)
+                start = timeit.default_timer()
+                pipelines[config_filename].apply(image_object)
+                timings.setdefault("{} clean".format(config_filename), []).append(
+                    timeit.default_timer() - start)
+
+    return {stage: summarise(stage_timings) for stage, stage_timings in timings.items()}
+
+def agreement(pipelines, images):
+    '''
+    Fraction of cleaned pixels the fast pipeline leaves equal to the current one.
+    '''
+    (current, fast) = pipelines.values()
+
+    equal = []
+    for image in images:
+        current_image = current.apply(Factory().create(Factory.CLASS_IMAGEPROCESSING_BYTES) \
+            .importImage(image)).getImage()
+        fast_image = fast.apply(Factory().create(Factory.CLASS_IMAGEPROCESSING_BYTES) \
+            .importImage(image)).getImage()
+        equal.append(float(np.mean(current_image == fast_image)))
+
+    return round(float(np.mean(equal)), 6)
+
+def evaluate(configs, images, workers):
+    '''
+    Evaluation reports of each config, run from a copy of the configs sharing the models.
+    '''
+    reports = {}
+
+    root = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        data = Path(folder) / "data"
+        (data / "configs").mkdir(parents=True)
+        for name in ("captchas", "models"):
+            (data / name).symlink_to(Path(root) / "data" / name)
+        (data / "configs/models").symlink_to(Path(root) / "data/configs/models")
+        (data / "configs/captchas").mkdir()
+
+        for config_filename, captcha_config in configs.items():
+            with open(str(data / "configs/captchas" / config_filename), "w") as f:
+                json.dump(captcha_config, f)
+
+        os.chdir(folder)
+        try:
+            for config_filename in configs:
+                reports[config_filename] = Factory().create(Factory.CLASS_EVALUATION) \
+                    .initialise(config_filename, workers).evaluate(images)
+        finally:
+            os.chdir(root)
+
+    return reports
+
+def main():
+    print("Sample Usage:\n{}".format(r"python tests/benchmark_LineRemoval.py \
+        --config captcha03.json --sample 500 --output lineremoval.json"))
+
+    parser = argparse.ArgumentParser(
+        description='MarkCAPTCHA - Benchmark Line Removal')
+
+    parser.add_argument('--' + ARGUMENT_CONFIG,
+        help='CAPTCHA config using lineRemoval or lineRemovalFast', metavar="config.json", default="captcha03.json")
+    parser.add_argument('--' + ARGUMENT_SAMPLE,
+        help='Amount of images to sample, every image when not set', type=int, default=500)
+    parser.add_argument('--' + ARGUMENT_SEED,
+        help='Random seed for the sample', type=int, default=0)
+    parser.add_argument('--' + ARGUMENT_REPEAT,
+        help='Amount of timing repetitions', type=int, default=3)
+    parser.add_argument('--' + ARGUMENT_ARGUMENTS,
+        help='JSON list of lineRemovalFast arguments after the line width, e.g. [20, 30], '
+        'the config\'s own when not set', type=json.loads)
+    parser.add_argument('--' + ARGUMENT_WORKERS,
+        help='Processes predicting images for the accuracy', type=int, default=1)
+    parser.add_argument('--' + ARGUMENT_OUTPUT,
+        help='Write the results to a JSON file')
+    parser.add_argument('--' + ARGUMENT_MIN_AGREEMENT,
+        help='Minimum pixel agreement of the fast pipeline', type=float, default=0.999)
+    parser.add_argument('--' + ARGUMENT_MAX_ACCURACY_LOSS,
+        help='Maximum accuracy the fast pipeline may lose', type=float, default=0.0)
+
+    args = vars(parser.parse_args())
+
+    captcha_config = Factory().create(Factory.CLASS_JSONPARSER) \
+        .parse(PATH_CONFIG_CAPTCHA + args[ARGUMENT_CONFIG]).getParsedContent()
+
+    (functions, name, arguments) = lineRemovalStage(captcha_config)
+    if args[ARGUMENT_ARGUMENTS] is None:
+        args[ARGUMENT_ARGUMENTS] = arguments[1:] if name == FUNCTION_LINE_REMOVAL_FAST else []
+
+    #The config's own name is kept for the current line removal, results stay comparable.
+    configs = {
+        args[ARGUMENT_CONFIG]: lineRemovalConfig(captcha_config, FUNCTION_LINE_REMOVAL, []),
+        Path(args[ARGUMENT_CONFIG]).stem + "_fast.json": lineRemovalConfig(captcha_config,
+            FUNCTION_LINE_REMOVAL_FAST, args[ARGUMENT_ARGUMENTS]),
+    }
+
+    images = sorted(Path(PATH_CAPTCHAS + captcha_config["folder"]).resolve().glob("*.png"))
+    if args[ARGUMENT_SAMPLE] is not None:
+        images = sorted(random.Random(args[ARGUMENT_SEED]).sample(images,
+            min(args[ARGUMENT_SAMPLE], len(images))))
+
+    if not images:
+        raise Exception("No CAPTCHA images found for: {}".format(args[ARGUMENT_CONFIG]))
+
+    pipelines = {config_filename: Factory().create(Factory.CLASS_PIPELINE) \
+        .compile(config["functions"]) for config_filename, config in configs.items()}
+    encoded_images = [image.read_bytes() for image in images]
+
+    results = {
+        "images": len(images),
+        "timings": timeFunctions(configs, pipelines, encoded_images, args[ARGUMENT_REPEAT]),
+        "pixel_agreement": agreement(pipelines, encoded_images),
+        "accuracy": {},
+    }
+
+    evaluation = Factory.getClass(Factory.CLASS_EVALUATION)
+    for config_filename, report in evaluate(configs, images, args[ARGUMENT_WORKERS]).items():
+        results["accuracy"][config_filename] = {key: report[key] for key in (
+            evaluation.REPORT_ACCURACY, evaluation.REPORT_SEGMENTED_ACCURACY,
+            evaluation.REPORT_CHARACTER_ACCURACY, evaluation.REPORT_SEGMENTATION_FAILURE_RATE)}
+
+    for name, summary in results["timings"].items():
+        print("{:<48} p50 {p50:>8.4f} ms  mean {mean:>8.4f} ms".format(name, **summary))
+    print("\nPixel agreement: {:.4%}".format(results["pixel_agreement"]))
+    for config_filename, accuracy in results["accuracy"].items():
+        print("{:<24} accuracy {:.2%}, characters {:.2%}, segmentation failures {:.2%}".format(
+            config_filename, accuracy[evaluation.REPORT_ACCURACY],
+            accuracy[evaluation.REPORT_CHARACTER_ACCURACY],
+            accuracy[evaluation.REPORT_SEGMENTATION_FAILURE_RATE]))
+
+    if args[ARGUMENT_OUTPUT]:
+        with open(args[ARGUMENT_OUTPUT], "w") as f:
+            json.dump(results, f, indent=2)
+        print("Results: {}".format(args[ARGUMENT_OUTPUT]))
+
+    failures = []
+    if results["pixel_agreement"] < args[ARGUMENT_MIN_AGREEMENT]:
+        failures.append("pixel agreement {:.4%} below {:.4%}".format(results["pixel_agreement"],
+            args[ARGUMENT_MIN_AGREEMENT]))
+
+    (current, fast) = [accuracy[evaluation.REPORT_ACCURACY] for accuracy in results["accuracy"].values()]
+    if current - fast > args[ARGUMENT_MAX_ACCURACY_LOSS]:
+        failures.append("accuracy {:.2%} below {:.2%}".format(fast, current))
+
+    if failures:
+        print("Fast line removal rejected: {}".format(", ".join(failures)))
+        sys.exit(1)
+
+    return
+
+if __name__ == "__main__":
+    main()
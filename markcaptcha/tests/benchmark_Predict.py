@@ -0,0 +1,159 @@
+import os
+import sys
+import timeit
+from pathlib import Path
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import cv2
+import numpy as np
+from lib.Factory import Factory
+from lib.MarkCAPTCHA import MarkCAPTCHA
+
+ARGUMENT_CONFIG = "config"
+ARGUMENT_FOLDER = "folder"
+
+ARGUMENT_SAMPLE = "sample"
+ARGUMENT_REPEAT = "repeat"
+ARGUMENT_BACKEND = "backend"
+
+ENGINES = {
+    "keras": Factory.CLASS_ENGINE_KERAS,
+    "numpy": Factory.CLASS_ENGINE_NUMPY,
+    "int8": Factory.CLASS_ENGINE_QUANTIZED,
+}
+
+PATH_CONFIG_CAPTCHA = "data/configs/captchas/"
+PATH_CONFIG_MODEL = "data/configs/models/model.json"
+PATH_MODELS = "data/models/"
+
+def segmentImage(captcha_config, image):
+    image_object = Factory().create(Factory.CLASS_IMAGEPROCESSING_STRING) \
+        .importImage(image)
+
+    for function in captcha_config["functions"]:
+        for function_name, function_value in function.items():
+            getattr(image_object, function_name.split("_", 1)[0])(*function_value)
+
+    return Factory().create(Factory.CLASS_SEGMENT).segment(MarkCAPTCHA.preSegmentImage(image_object),
+        captcha_config["captcha_length"], captcha_config["threshold"])
+
+def predictPerCharacter(engine, label_binary, segmented_image, section_image_object, image_size):
+    '''
+    The previous Predict.predict loop, resizing, dispatching to the model, decoding with
+    inverse_transform and drawing one character at a time.
+    '''
+    output = segmented_image.getImage().copy()
+
+    prediction = ""
+    for character_cord in segmented_image.getCharacterCords():
+        (x, y, w, h) = character_cord
+
+        section_image_object.importImage(segmented_image.getImage()[y - 2:y + h + 2, x - 2:x + w + 2]) \
+            .resize(image_size[0], image_size[1])
+        image_section = np.expand_dims(section_image_object.getImage(), axis=2)
+        image_section = np.expand_dims(image_section, axis=0)
+
+        predict = engine.predict(image_section)
+        predicted_character = label_binary.inverse_transform(predict)[0]
+
+        prediction += predicted_character
+
+        cv2.rectangle(output, (x - 2, y - 2), (x + w + 4, y + h + 4),
+            (255, 255, 255), 1)
+        cv2.putText(output, predicted_character, (x + 2, y + 2),
+            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+    return prediction
+
+def stackSections(segmented_images, section_image_object, image_size):
+    '''
+    Every character section of the CAPTCHAs in a single model input, timing the model alone.
+    '''
+    sections = []
+    for segmented_image in segmented_images:
+        for (x, y, w, h) in segmented_image.getCharacterCords():
+            section_image_object.importImage(segmented_image.getImage()[y - 2:y + h + 2, x - 2:x + w + 2]) \
+                .resize(image_size[0], image_size[1])
+            sections.append(np.expand_dims(section_image_object.getImage(), axis=2))
+
+    return np.stack(sections)
+
+def main():
+    print("Sample Usage:\n{}".format(r"python tests/benchmark_Predict.py --config \
+        captcha03.json --folder data/captchas/captcha_03/captchas/testing --sample 50"))
+
+    parser = argparse.ArgumentParser(
+        description='MarkCAPTCHA - Benchmark Prediction')
+    parser.add_argument('--' + ARGUMENT_CONFIG,
+        help='Provide filename for CAPTCHA config', metavar="config.json",
+        required=True)
+    parser.add_argument('--' + ARGUMENT_FOLDER,
+        help='Provide directory with CAPTCHA images',
+        required=True)
+
+    parser.add_argument('--' + ARGUMENT_SAMPLE,
+        help='Amount of images to benchmark', type=int, default=50)
+    parser.add_argument('--' + ARGUMENT_REPEAT,
+        help='Amount of timing repetitions', type=int, default=5)
+    parser.add_argument('--' + ARGUMENT_BACKEND,
+        help='Inference backend', choices=list(ENGINES), default="numpy")
+
+    args = vars(parser.parse_args())
+
+    captcha_config = Factory().create(Factory.CLASS_JSONPARSER) \
+        .parse(PATH_CONFIG_CAPTCHA + args[ARGUMENT_CONFIG]).getParsedContent()
+    image_size = Factory().create(Factory.CLASS_JSONPARSER) \
+        .parse(PATH_CONFIG_MODEL).getParsedContent()["image_size"]
+
+    path = Path(args[ARGUMENT_FOLDER])
+    if not path.exists():
+        raise Exception("Invalid path provided: {}".format(path))
+
+    segmented_images = [segmented for segmented in (segmentImage(captcha_config, image)
+        for image in sorted(path.glob('*.png'))[:args[ARGUMENT_SAMPLE]]) if segmented.successful()]
+
+    if not segmented_images:
+        raise Exception("No images could be segmented in: {}".format(path))
+
+    label_binary = Factory().create(Factory.CLASS_PICKLEPARSER) \
+        .parse(PATH_MODELS + captcha_config["label_filename"]).getParsedContent()
+
+    engine = Factory().create(ENGINES[args[ARGUMENT_BACKEND]])
+
+    #The int8 backend runs the file written by --quantize.
+    model_path = Path(PATH_MODELS + captcha_config["model_filename"])
+    if args[ARGUMENT_BACKEND] == "int8":
+        model_path = model_path.with_suffix(Factory.getClass(Factory.CLASS_ENGINE_QUANTIZED).EXPORT_SUFFIX)
+
+    start = timeit.default_timer()
+    predictor = Factory().create(Factory.CLASS_PREDICT) \
+        .initialise(model_path, label_binary, engine=engine)
+    print("{:>15}: {:.2f} s".format("model load", timeit.default_timer() - start))
+    section_image_object = Factory().create(Factory.CLASS_IMAGEPROCESSING_SECTION)
+
+    for segmented_image in segmented_images:
+        batched = predictor.predict(segmented_image, section_image_object, image_size).getResult()
+        if batched != predictPerCharacter(engine, label_binary, segmented_image, section_image_object,
+            image_size):
+            raise Exception("Batched and per character predictions differ: {}".format(batched))
+
+    sections = stackSections(segmented_images, section_image_object, image_size)
+
+    timings = {
+        "model": lambda: engine.predict(sections),
+        "per character": lambda: [predictPerCharacter(engine, label_binary, segmented_image,
+            section_image_object, image_size) for segmented_image in segmented_images],
+        "batched": lambda: [predictor.predict(segmented_image, section_image_object,
+            image_size).getResult() for segmented_image in segmented_images],
+    }
+
+    for name, function in timings.items():
+        best = min(timeit.repeat(function, number=1, repeat=args[ARGUMENT_REPEAT]))
+        print("{:>15}: {:.2f} ms / CAPTCHA".format(name, best * 1000 / len(segmented_images)))
+
+    return
+
+if __name__ == "__main__":
+    main()
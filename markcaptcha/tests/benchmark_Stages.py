@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import platform
+import shutil
+import tempfile
+import contextlib, io
+import timeit
+from pathlib import Path
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import cv2
+import numpy as np
+from lib.Factory import Factory
+from lib.MarkCAPTCHA import MarkCAPTCHA
+
+ARGUMENT_SAMPLE = "sample"
+ARGUMENT_REPEAT = "repeat"
+ARGUMENT_BACKEND = "backend"
+ARGUMENT_OUTPUT = "output"
+ARGUMENT_BASELINE = "baseline"
+ARGUMENT_UPDATE = "update"
+ARGUMENT_TOLERANCE = "tolerance"
+ARGUMENT_MIN_DIFFERENCE = "mindifference"
+
+ENGINES = {
+    "keras": Factory.CLASS_ENGINE_KERAS,
+    "numpy": Factory.CLASS_ENGINE_NUMPY,
+    "int8": Factory.CLASS_ENGINE_QUANTIZED,
+}
+
+'''
+    Bundled datasets by their config.
+'''
+DATASETS = ["captcha03.json", "pastebin.json", "simplecaptcha.json"]
+
+PERCENTILES = (50, 90, 99)
+
+PATH_CONFIG_CAPTCHA = "data/configs/captchas/"
+PATH_CONFIG_MODEL = "data/configs/models/model.json"
+PATH_CAPTCHAS = "data/captchas/"
+PATH_CHARACTERS = "characters/"
+PATH_MODELS = "data/models/"
+PATH_BASELINE = "tests/benchmarks/baseline.json"
+
+def summarise(timings):
+    '''
+    Milliseconds at each percentile, with the mean and amount of samples.
+    '''
+    timings = np.array(timings) * 1000
+
+    summary = {"p{}".format(percentile): round(float(value), 4)
+        for percentile, value in zip(PERCENTILES, np.percentile(timings, PERCENTILES))}
+    summary["mean"] = round(float(timings.mean()), 4)
+    summary["samples"] = len(timings)
+
+    return summary
+
+def timeStage(timings, stage, function, *arguments):
+    start = timeit.default_timer()
+    result = function(*arguments)
+    timings.setdefault(stage, []).append(timeit.default_timer() - start)
+
+    return result
+
+def loadEngine(captcha_config, backend):
+    model_path = Path(PATH_MODELS + captcha_config["model_filename"])
+    if backend == "int8":
+        model_path = model_path.with_suffix(Factory.getClass(Factory.CLASS_ENGINE_QUANTIZED).EXPORT_SUFFIX)
+
+    return Factory().create(ENGINES[backend]).load(model_path)
+
+def predictStages(captcha_config, images, image_size, engine, repeat):
+    '''
+    Each stage of MarkCAPTCHA.predict timed separately for every image.
+    '''
+    pipeline = Factory().create(Factory.CLASS_PIPELINE).compile(captcha_config["functions"])
+    predictor = Factory().create(Factory.CLASS_PREDICT)
+    section_image_object = Factory().create(Factory.CLASS_IMAGEPROCESSING_SECTION)
+    backend = captcha_config.get("segmentation", Factory.getClass(Factory.CLASS_SEGMENT).BACKEND_CONTOURS)
+
+    encoded_images = [image.read_bytes() for image in images]
+
+    timings = {}
+    for counter in range(repeat):
+        for encoded_image in encoded_images:
+            image_object = timeStage(timings, "decode",
+                Factory().create(Factory.CLASS_IMAGEPROCESSING_BYTES).importImage, encoded_image)
+            timeStage(timings, "clean", pipeline.apply, image_object)
+            timeStage(timings, "presegment", MarkCAPTCHA.preSegmentImage, image_object)
+
+            segmented = timeStage(timings, "segment", Factory().create(Factory.CLASS_SEGMENT) \
+                .setBackend(backend).segment, image_object, captcha_config["captcha_length"],
+                captcha_config["threshold"])
+            if not segmented.successful():
+                continue
+
+            sections = timeStage(timings, "sections", predictor.sections, segmented,
+                section_image_object, image_size)
+            timeStage(timings, "inference", engine.predict, sections, len(sections))
+
+    return timings
+
+def processStages(captcha_config, config_filename, images, repeat):
+    '''
+    MarkCAPTCHA.processImages per image, run in a copy of the data folders.
+    '''
+    timings = {}
+
+    root = os.getcwd()
+    for counter in range(repeat):
+        with tempfile.TemporaryDirectory() as folder:
+            shutil.copytree(os.path.join(root, "data/configs"), os.path.join(folder, "data/configs"))
+            captcha_folder = Path(folder) / (PATH_CAPTCHAS + captcha_config["folder"])
+            captcha_folder.mkdir(parents=True)
+            for image in images:
+                shutil.copy(str(image), str(captcha_folder))
+
+            os.chdir(folder)
+            try:
+                mark = MarkCAPTCHA().importConfigs()
+
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = timeit.default_timer()
+                    mark.processImages(config_filename, save_cleaned=False)
+                    timings.setdefault("processImages", []).append(
+                        (timeit.default_timer() - start) / len(images))
+            finally:
+                os.chdir(root)
+
+    return timings
+
+def readDataset(dataset):
+    '''
+    Every character read once, as an epoch of Model.train does.
+    '''
+    return np.asarray(dataset.getImages()).sum()
+
+def writeShards(characters_path, image_size, shards_path):
+    '''
+    The PNG characters written to shards, as processImages(shards=True) leaves them.
+    '''
+    shards_class = Factory.getClass(Factory.CLASS_SHARDS)
+    run_path = shards_class.createRun(shards_path)
+
+    writer = Factory().create(Factory.CLASS_SHARDWRITER).open(run_path, image_size)
+    for character in sorted(characters_path.glob("*/*.png")):
+        writer.append(Factory().create(Factory.CLASS_IMAGEPROCESSING_STRING).importImage(character) \
+            .grey().getImage(), character.parent.name, character.stem)
+    writer.close()
+
+    shards_class.publish(shards_path, run_path)
+
+def datasetStages(captcha_config, image_size, repeat):
+    '''
+    Model.train's character loading from the PNG cache, packed once and memory mapped after,
+    and from the shards processImages writes.
+    '''
+    timings = {}
+
+    characters_path = Path(PATH_CAPTCHAS + captcha_config["folder"] + PATH_CHARACTERS)
+    if not characters_path.exists():
+        return timings
+
+    for counter in range(repeat):
+        with tempfile.TemporaryDirectory() as folder:
+            for stage in ("dataset pack", "dataset load"):
+                timeStage(timings, stage, lambda: readDataset(Factory().create(Factory.CLASS_DATASET) \
+                    .load(Factory().create(Factory.CLASS_IMAGEPROCESSING_STRING), characters_path,
+                        image_size, Path(folder) / "characters")))
+
+            writeShards(characters_path, image_size, Path(folder) / "shards")
+            timeStage(timings, "shards load", lambda: readDataset(Factory().create(Factory.CLASS_SHARDS) \
+                .load(Path(folder) / "shards", image_size)))
+
+    return timings
+
+def host():
+    '''
+    The machine and libraries timings are only comparable on.
+    '''
+    return {"node": platform.node(), "machine": platform.machine(), "processor": platform.processor(),
+        "cpus": os.cpu_count(), "python": platform.python_version(), "numpy": np.__version__,
+        "opencv": cv2.__version__}
+
+def compare(results, baseline, tolerance, min_difference):
+    '''
+    Stages whose median is slower than the baseline by the tolerance and the minimum difference.
+    '''
+    regressions = []
+    for dataset, stages in baseline.items():
+        for stage, expected in stages.items():
+            current = results.get(dataset, {}).get(stage)
+            if current is None:
+                regressions.append("{} {}: missing".format(dataset, stage))
+                continue
+
+            if current["p50"] > expected["p50"] * (1 + tolerance) \
+                and current["p50"] - expected["p50"] > min_difference:
+                regressions.append("{} {}: p50 {:.4f} ms, baseline {:.4f} ms".format(dataset,
+                    stage, current["p50"], expected["p50"]))
+
+    return regressions
+
+def main():
+    print("Sample Usage:\n{}".format(r"python tests/benchmark_Stages.py --sample 50 \
+        --output stages.json"))
+
+    parser = argparse.ArgumentParser(
+        description='MarkCAPTCHA - Benchmark Prediction Stages')
+
+    parser.add_argument('--' + ARGUMENT_SAMPLE,
+        help='Amount of images per dataset', type=int, default=50)
+    parser.add_argument('--' + ARGUMENT_REPEAT,
+        help='Amount of timing repetitions', type=int, default=3)
+    parser.add_argument('--' + ARGUMENT_BACKEND,
+        help='Inference backend', choices=list(ENGINES), default="numpy")
+    parser.add_argument('--' + ARGUMENT_OUTPUT,
+        help='Write the results to a JSON file')
+    parser.add_argument('--' + ARGUMENT_BASELINE,
+        help='Baseline JSON file the results are compared to', default=PATH_BASELINE)
+    parser.add_argument('--' + ARGUMENT_UPDATE,
+        help='Replace the baseline with these results', action='store_true', default=False)
+    parser.add_argument('--' + ARGUMENT_TOLERANCE,
+        help='Fraction a median may be slower than the baseline', type=float, default=0.25)
+    parser.add_argument('--' + ARGUMENT_MIN_DIFFERENCE,
+        help='Milliseconds a median may be slower than the baseline regardless of the tolerance',
+        type=float, default=0.05)
+
+    args = vars(parser.parse_args())
+
+    image_size = Factory().create(Factory.CLASS_JSONPARSER) \
+        .parse(PATH_CONFIG_MODEL).getParsedContent()["image_size"]
+
+    results = {}
+    for config_filename in DATASETS:
+        captcha_config = Factory().create(Factory.CLASS_JSONPARSER) \
+            .parse(PATH_CONFIG_CAPTCHA + config_filename).getParsedContent()
+
+        images = sorted(Path(PATH_CAPTCHAS + captcha_config["folder"]).glob("*.png"))[:args[ARGUMENT_SAMPLE]]
+        if not images:
+            raise Exception("No CAPTCHA images exist for: {}".format(config_filename))
+
+        timings = predictStages(captcha_config, images, image_size,
+            loadEngine(captcha_config, args[ARGUMENT_BACKEND]), args[ARGUMENT_REPEAT])
+        timings.update(processStages(captcha_config, config_filename, images, args[ARGUMENT_REPEAT]))
+        timings.update(datasetStages(captcha_config, image_size, args[ARGUMENT_REPEAT]))
+
+        results[config_filename] = {stage: summarise(stage_timings)
+            for stage, stage_timings in timings.items()}
+
+        for stage, summary in results[config_filename].items():
+            print("{:>20} {:>15}: p50 {:>9.4f} ms, p90 {:>9.4f} ms, p99 {:>9.4f} ms".format(
+                config_filename, stage, summary["p50"], summary["p90"], summary["p99"]))
+
+    if args[ARGUMENT_OUTPUT]:
+        with open(args[ARGUMENT_OUTPUT], "w") as f:
+            json.dump(results, f, indent=2)
+
+    #Baselines are recorded per host and never committed, timings from another machine
+    #or library build are not compared.
+    baseline_path = Path(args[ARGUMENT_BASELINE])
+    if args[ARGUMENT_UPDATE]:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(str(baseline_path), "w") as f:
+            json.dump({"host": host(), "results": results}, f, indent=2)
+        print("Baseline updated: {}".format(baseline_path))
+        return
+
+    if not baseline_path.is_file():
+        print("No baseline to compare to, record one on this host with --update: {}".format(baseline_path))
+        return
+
+    with open(str(baseline_path)) as f:
+        baseline = json.load(f)
+
+    if baseline.get("host") != host():
+        print("Baseline was recorded on another host, record one on this host with --update: {}" \
+            .format(baseline_path))
+        return
+
+    regressions = compare(results, baseline["results"], args[ARGUMENT_TOLERANCE],
+        args[ARGUMENT_MIN_DIFFERENCE])
+
+    if regressions:
+        print("\nRegressions:\n{}".format("\n".join(regressions)))
+        sys.exit(1)
+
+    print("\nNo regressions against: {}".format(baseline_path))
+
+if __name__ == "__main__":
+    main()
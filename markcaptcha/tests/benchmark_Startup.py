@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import base64
+import shutil
+import subprocess
+import tempfile
+import statistics
+import importlib.util
+import time
+import urllib.request
+from pathlib import Path
+import argparse
+
+ARGUMENT_CONFIG = "config"
+ARGUMENT_IMAGE = "image"
+ARGUMENT_REPEAT = "repeat"
+ARGUMENT_HELP_BUDGET = "helpbudget"
+ARGUMENT_IMAGEPROCESSING_BUDGET = "imageprocessingbudget"
+ARGUMENT_BUILD_BUDGET = "buildbudget"
+ARGUMENT_PREDICT_BUDGET = "predictbudget"
+ARGUMENT_SERVE_BUDGET = "servebudget"
+
+PATH_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+PATH_CLI = os.path.join(PATH_ROOT, "markcaptcha.py")
+PATH_CONFIGS = "data/configs/"
+PATH_CONFIG_CAPTCHA = "data/configs/captchas/"
+PATH_CONFIG_MODEL = "data/configs/models/model.json"
+PATH_CAPTCHAS = "data/captchas/"
+PATH_MODELS = "data/models/"
+
+'''
+    The config --imageprocessing and --build run on, with a single CAPTCHA and training iteration
+    and no preview.
+'''
+STARTUP_CONFIG = "startup.json"
+STARTUP_FOLDER = "startup_captcha/"
+STARTUP_MODEL = "startup"
+
+'''
+    Modules each model.json backend loads a model with, labels are always unpickled with scikit-learn.
+'''
+BACKEND_MODULES = {
+    "keras": ["keras", "sklearn"],
+    "numpy": ["h5py", "sklearn"],
+    "int8": ["sklearn"],
+}
+
+HEAVY_MODULES = ["keras", "tensorflow", "sklearn", "matplotlib"]
+
+'''
+    Modules a mode must never import, cleaning CAPTCHAs doesn't need a model.
+'''
+FORBIDDEN_MODULES = {
+    "imageprocessing": ["keras", "tensorflow"],
+}
+
+SERVE_TIMEOUT = 120
+
+def command(arguments):
+    '''
+    The CLI run by a fresh interpreter, reporting every module it imports on stderr.
+    '''
+    return [sys.executable, "-X", "importtime", PATH_CLI] + arguments
+
+def heavyModules(stderr):
+    imported = set(line.split("|")[-1].strip().split(".")[0] for line in stderr.splitlines()
+        if line.startswith("import time:"))
+
+    return [module for module in HEAVY_MODULES if module in imported]
+
+def lastError(stderr):
+    lines = [line for line in stderr.splitlines() if not line.startswith("import time:")]
+
+    return lines[-1] if lines else "no output"
+
+def createWorkspace(folder, config_filename, image):
+    '''
+    A copy of the configs with a config of one CAPTCHA, trained for a single iteration without a preview.
+    @params:
+        folder            - Required  : empty folder the CLI runs in (Path)
+        config_filename   - Required  : config whose cleaning functions are copied (Str)
+        image             - Required  : CAPTCHA image named by its text (Path)
+    '''
+    shutil.copytree(PATH_CONFIGS, str(folder / PATH_CONFIGS))
+
+    with open(PATH_CONFIG_CAPTCHA + config_filename) as f:
+        captcha_config = json.load(f)
+    captcha_config.update({"folder": STARTUP_FOLDER, "model_filename": STARTUP_MODEL + ".hdf5",
+        "label_filename": STARTUP_MODEL + ".labels"})
+    with open(str(folder / PATH_CONFIG_CAPTCHA / STARTUP_CONFIG), "w") as f:
+        json.dump(captcha_config, f)
+
+    with open(str(folder / PATH_CONFIG_MODEL)) as f:
+        model_config = json.load(f)
+    model_config.update({"iterations": 1, "preview": False})
+    with open(str(folder / PATH_CONFIG_MODEL), "w") as f:
+        json.dump(model_config, f)
+
+    (folder / PATH_CAPTCHAS / STARTUP_FOLDER).mkdir(parents=True)
+    shutil.copy(str(image), str(folder / PATH_CAPTCHAS / STARTUP_FOLDER))
+    (folder / PATH_MODELS).mkdir(parents=True)
+
+    return folder
+
+def runCommand(mode, arguments, cwd = None):
+    '''
+    Seconds until the CLI exits.
+    '''
+    start = time.perf_counter()
+    output = subprocess.run(command(arguments), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, cwd=cwd)
+    seconds = time.perf_counter() - start
+
+    if output.returncode != 0:
+        raise Exception("Unable to run --{}: {}".format(mode, lastError(output.stderr)))
+
+    return seconds, heavyModules(output.stderr)
+
+def runServer(mode, arguments, cwd = None):
+    '''
+    Seconds until the CLI server answers its first health check.
+    '''
+    #The import times go to a file, a full stderr pipe would block the server.
+    stderr_file = tempfile.TemporaryFile(mode="w+")
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command(arguments + ["--port", "0"]), stdout=subprocess.PIPE,
+        stderr=stderr_file, universal_newlines=True, env=dict(os.environ, PYTHONUNBUFFERED="1"),
+        cwd=cwd)
+
+    try:
+        address = None
+        for line in process.stdout:
+            if line.startswith("MARKCAPTCHA: serving on "):
+                address = line.split()[-1].rsplit("/predict/", 1)[0]
+                break
+
+        if address is None:
+            process.wait()
+            stderr_file.seek(0)
+            raise Exception("Unable to run --{}: {}".format(mode, lastError(stderr_file.read())))
+
+        while True:
+            try:
+                with urllib.request.urlopen(address + "/health", timeout=SERVE_TIMEOUT) as response:
+                    response.read()
+                break
+            except OSError:
+                if time.perf_counter() - start > SERVE_TIMEOUT:
+                    raise
+                time.sleep(0.01)
+
+        seconds = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.communicate()
+
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+        stderr_file.close()
+
+    return seconds, heavyModules(stderr)
+
+def measure(run, mode, arguments, cwd, repeat):
+    '''
+    Median seconds over fresh interpreters, with the heavy modules any of them imported.
+    '''
+    timings = []
+    heavy_modules = set()
+    for _ in range(repeat):
+        (seconds, imported) = run(mode, arguments, cwd)
+        timings.append(seconds)
+        heavy_modules.update(imported)
+
+    return statistics.median(timings), [module for module in HEAVY_MODULES if module in heavy_modules]
+
+def missingModules(modules):
+    return [module for module in modules if importlib.util.find_spec(module) is None]
+
+def main():
+    print("Sample Usage:\n{}".format(r"python tests/benchmark_Startup.py --config pastebin.json \
+        --image data/captchas/pastebin_captcha/captchas/22CV.png --repeat 5"))
+
+    parser = argparse.ArgumentParser(
+        description='MarkCAPTCHA - Benchmark Startup')
+    parser.add_argument('--' + ARGUMENT_CONFIG,
+        help='Provide filename for CAPTCHA config', metavar="config.json", default="pastebin.json")
+    parser.add_argument('--' + ARGUMENT_IMAGE,
+        help='CAPTCHA image named by its text, predicted and cleaned with the config',
+        default="data/captchas/pastebin_captcha/captchas/22CV.png")
+    parser.add_argument('--' + ARGUMENT_REPEAT,
+        help='Amount of interpreters started per mode', type=int, default=5)
+    parser.add_argument('--' + ARGUMENT_HELP_BUDGET,
+        help='Maximum --help seconds', type=float, default=1.0)
+    parser.add_argument('--' + ARGUMENT_IMAGEPROCESSING_BUDGET,
+        help='Maximum --imageprocessing seconds of a single CAPTCHA', type=float, default=2.0)
+    parser.add_argument('--' + ARGUMENT_BUILD_BUDGET,
+        help='Maximum --build seconds of a single CAPTCHA and iteration', type=float, default=30.0)
+    parser.add_argument('--' + ARGUMENT_PREDICT_BUDGET,
+        help='Maximum --predict seconds', type=float, default=15.0)
+    parser.add_argument('--' + ARGUMENT_SERVE_BUDGET,
+        help='Maximum --serve seconds until the first health check is answered', type=float,
+        default=15.0)
+
+    args = vars(parser.parse_args())
+
+    with open(PATH_CONFIG_MODEL) as f:
+        backend = json.load(f)["backend"]
+
+    image = base64.b64encode(Path(args[ARGUMENT_IMAGE]).read_bytes()).decode("utf-8")
+
+    over_budget = []
+    forbidden = []
+    with tempfile.TemporaryDirectory() as folder:
+        workspace = str(createWorkspace(Path(folder), args[ARGUMENT_CONFIG], Path(args[ARGUMENT_IMAGE])))
+
+        #--build trains on the characters --imageprocessing extracted.
+        modes = {
+            "help": (runCommand, ["--help"], None, [], args[ARGUMENT_HELP_BUDGET]),
+            "imageprocessing": (runCommand, ["--config", STARTUP_CONFIG, "--imageprocessing",
+                "--nocleaned"], workspace, [], args[ARGUMENT_IMAGEPROCESSING_BUDGET]),
+            "build": (runCommand, ["--config", STARTUP_CONFIG, "--build"], workspace,
+                ["keras", "sklearn"], args[ARGUMENT_BUILD_BUDGET]),
+            "predict": (runCommand, ["--config", args[ARGUMENT_CONFIG], "--predict", image], None,
+                BACKEND_MODULES[backend], args[ARGUMENT_PREDICT_BUDGET]),
+            "serve": (runServer, ["--config", args[ARGUMENT_CONFIG], "--serve"], None,
+                BACKEND_MODULES[backend], args[ARGUMENT_SERVE_BUDGET]),
+        }
+
+        for mode, (run, arguments, cwd, modules, budget) in modes.items():
+            missing = missingModules(modules)
+            if missing:
+                print("{:>16}: skipped, needs: {}".format(mode, ", ".join(missing)))
+                continue
+
+            (seconds, heavy_modules) = measure(run, mode, arguments, cwd, args[ARGUMENT_REPEAT])
+            print("{:>16}: {:.3f} s (budget {:.1f} s) heavy modules: {}".format(mode, seconds,
+                budget, ",".join(heavy_modules) or "none"))
+
+            if seconds > budget:
+                over_budget.append(mode)
+
+            forbidden += ["--{} imported {}".format(mode, module) for module in heavy_modules
+                if module in FORBIDDEN_MODULES.get(mode, [])]
+
+    if forbidden:
+        print("Forbidden imports: {}".format(", ".join(forbidden)))
+
+    if over_budget:
+        print("Startup over budget: {}".format(", ".join(over_budget)))
+
+    if forbidden or over_budget:
+        sys.exit(1)
+
+    return
+
+if __name__ == "__main__":
+    main()
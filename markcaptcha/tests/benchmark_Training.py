@@ -0,0 +1,161 @@
+import os
+import sys
+import tempfile
+import importlib.util
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import numpy as np
+from lib.Factory import Factory
+from lib.Dataset import CharacterBatches
+
+ARGUMENT_FOLDER = "folder"
+ARGUMENT_EPOCHS = "epochs"
+ARGUMENT_BATCH_SIZE = "batchsize"
+ARGUMENT_SHUFFLE_BUFFER = "shufflebuffer"
+ARGUMENT_WORKERS = "workers"
+ARGUMENT_PREFETCH = "prefetch"
+
+PATH_CONFIG_MODEL = "data/configs/models/model.json"
+
+LEGACY_BATCH_SIZE = 6
+
+def loadLegacy(characters_path, image_size):
+    '''
+    The previous Model.train and build input, every PNG decoded into a float64 array.
+    '''
+    image_object = Factory().create(Factory.CLASS_IMAGEPROCESSING_STRING)
+
+    data = []
+    labels = []
+    for character in sorted(characters_path.glob("*/*.png")):
+        try:
+            data.append(np.expand_dims(image_object.importImage(character) \
+                .resize(image_size[0], image_size[1]).grey().getImage(), axis=2))
+            labels.append(character.parent.name)
+        except Exception:
+            continue
+
+    data = np.array(data, dtype="float") / 255.0
+    indices = np.random.RandomState(0).permutation(len(data))
+
+    return (data[indices], np.array(labels)[indices])
+
+def streamEpoch(batches, workers, prefetch):
+    '''
+    Read every batch of an epoch with loader threads, as Keras fit_generator does.
+    '''
+    with ThreadPoolExecutor(workers) as executor:
+        pending = []
+        for index in range(len(batches)):
+            pending.append(executor.submit(batches.__getitem__, index))
+            if len(pending) > prefetch:
+                pending.pop(0).result()
+
+        for future in pending:
+            future.result()
+
+    batches.on_epoch_end()
+
+def trainEpochs(dataset, model_config, epochs, batch_size, shuffle_buffer, workers, prefetch):
+    '''
+    Seconds per Model.build epoch, only when Keras is installed.
+    '''
+    with tempfile.TemporaryDirectory() as folder:
+        model = Factory().create(Factory.CLASS_MODEL).initialise(model_config["image_size"],
+            model_config["hidden_layers"], epochs, model_config["testing_ratio"],
+            model_config["pool_size"], model_config["stride"], batch_size, shuffle_buffer,
+            workers, prefetch).train(dataset)
+
+        start = timeit.default_timer()
+        model.build(Factory().create(Factory.CLASS_PICKLEPARSER), str(Path(folder) / "labels"),
+            str(Path(folder) / "model.hdf5"), False)
+
+        return (timeit.default_timer() - start) / epochs
+
+def main():
+    print("Sample Usage:\n{}".format(r"python tests/benchmark_Training.py \
+        --folder data/captchas/captcha_03/captchas/characters"))
+
+    parser = argparse.ArgumentParser(
+        description='MarkCAPTCHA - Benchmark Training Input')
+    parser.add_argument('--' + ARGUMENT_FOLDER,
+        help='Provide characters directory', required=True)
+
+    parser.add_argument('--' + ARGUMENT_EPOCHS,
+        help='Amount of epochs to time', type=int, default=1)
+    parser.add_argument('--' + ARGUMENT_BATCH_SIZE,
+        help='Characters per batch', type=int)
+    parser.add_argument('--' + ARGUMENT_SHUFFLE_BUFFER,
+        help='Characters shuffled together each epoch, every character when not set', type=int)
+    parser.add_argument('--' + ARGUMENT_WORKERS,
+        help='Batch loader threads', type=int)
+    parser.add_argument('--' + ARGUMENT_PREFETCH,
+        help='Batches loaded ahead', type=int)
+
+    args = vars(parser.parse_args())
+
+    model_config = Factory().create(Factory.CLASS_JSONPARSER).parse(PATH_CONFIG_MODEL) \
+        .getParsedContent()
+    image_size = model_config["image_size"]
+
+    settings = {name: model_config.get(key, default) if args[argument] is None else args[argument]
+        for name, key, argument, default in (
+            ("batch_size", "batch_size", ARGUMENT_BATCH_SIZE, LEGACY_BATCH_SIZE),
+            ("shuffle_buffer", "shuffle_buffer", ARGUMENT_SHUFFLE_BUFFER, None),
+            ("workers", "workers", ARGUMENT_WORKERS, 1),
+            ("prefetch", "prefetch", ARGUMENT_PREFETCH, 10))}
+    print(", ".join("{}: {}".format(name, value) for name, value in settings.items()))
+
+    characters_path = Path(args[ARGUMENT_FOLDER])
+    if not characters_path.exists():
+        raise Exception("Invalid path provided: {}".format(characters_path))
+
+    with tempfile.TemporaryDirectory() as folder:
+        start = timeit.default_timer()
+        (data, labels) = loadLegacy(characters_path, image_size)
+        print("{:>20}: {:.2f} s, {:.1f} MB".format("legacy load", timeit.default_timer() - start,
+            data.nbytes / 2 ** 20))
+        del data
+
+        dataset = Factory().create(Factory.CLASS_DATASET)
+        for name in ("cache pack", "cache load"):
+            start = timeit.default_timer()
+            dataset.load(Factory().create(Factory.CLASS_IMAGEPROCESSING_STRING), characters_path,
+                image_size, Path(folder) / "characters")
+            print("{:>20}: {:.2f} s, {:.1f} MB".format(name, timeit.default_timer() - start,
+                dataset.getImages().nbytes / 2 ** 20))
+
+        images = dataset.getImages()
+        classes = np.unique(dataset.getLabels())
+        targets = (dataset.getLabels()[:, np.newaxis] == classes).astype(np.uint8)
+        indices = np.random.RandomState(0).permutation(len(images))
+
+        for name, batch_size, workers in (("batches of 6", LEGACY_BATCH_SIZE, 1),
+            ("configured batches", settings["batch_size"], settings["workers"])):
+            batches = CharacterBatches(images, targets, indices, batch_size,
+                settings["shuffle_buffer"], seed=0)
+
+            best = min(timeit.repeat(lambda: streamEpoch(batches, workers, settings["prefetch"]),
+                number=1, repeat=3))
+            print("{:>20}: {:.3f} s / epoch input, {} batches".format(name, best, len(batches)))
+
+        if importlib.util.find_spec("keras") is None:
+            print("Keras is not installed, skipping epoch timings.")
+            return
+
+        legacy = trainEpochs(dataset, model_config, args[ARGUMENT_EPOCHS], LEGACY_BATCH_SIZE, None, 1, 10)
+        print("{:>20}: {:.2f} s / epoch".format("legacy training", legacy))
+
+        streamed = trainEpochs(dataset, model_config, args[ARGUMENT_EPOCHS], settings["batch_size"],
+            settings["shuffle_buffer"], settings["workers"], settings["prefetch"])
+        print("{:>20}: {:.2f} s / epoch".format("streamed training", streamed))
+
+    return
+
+if __name__ == "__main__":
+    main()
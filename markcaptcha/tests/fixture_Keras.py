@@ -0,0 +1,56 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import numpy as np
+from lib.Factory import Factory
+
+ARGUMENT_OUTPUT = "output"
+
+MODELS = ("captcha03", "pastebin", "simplecaptcha")
+CHARACTERS = ("data/captchas/captcha_03/captchas/characters",
+    "data/captchas/pastebin_captcha/captchas/characters")
+IMAGE_SIZE = 28
+SAMPLE = 20
+
+def sections():
+    '''
+    Random sections and a sample of every bundled dataset's characters, as predict passes them.
+    '''
+    image_object = Factory().create(Factory.CLASS_IMAGEPROCESSING_STRING)
+
+    characters = [np.random.RandomState(0).randint(0, 256, (6, IMAGE_SIZE, IMAGE_SIZE))]
+    for folder in CHARACTERS:
+        paths = sorted(Path(folder).glob("*/*.png"))
+        characters.append([image_object.importImage(path).resize(IMAGE_SIZE, IMAGE_SIZE).grey().getImage()
+            for path in paths[::len(paths) // SAMPLE][:SAMPLE]])
+
+    return np.concatenate(characters).astype(np.uint8)[..., np.newaxis]
+
+def main():
+    print("Sample Usage:\n{}".format(r"python tests/fixture_Keras.py"))
+
+    parser = argparse.ArgumentParser(
+        description='MarkCAPTCHA - Keras Predictions Fixture')
+
+    parser.add_argument('--' + ARGUMENT_OUTPUT,
+        help='Fixture to write', default="tests/fixtures/keras_predictions.npz")
+
+    args = vars(parser.parse_args())
+
+    fixture = {"sections": sections()}
+    for model in MODELS:
+        fixture[model] = Factory().create(Factory.CLASS_ENGINE_KERAS) \
+            .load(Path("data/models/" + model + ".hdf5")) \
+            .predict(fixture["sections"].astype(np.float32))
+
+    np.savez_compressed(args[ARGUMENT_OUTPUT], **fixture)
+    print("Keras predictions of {} sections: {}".format(len(fixture["sections"]), args[ARGUMENT_OUTPUT]))
+
+    return
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,29 @@
 import os
 import sys
-import glob, random
+import json, random
 from pathlib import Path
 import argparse
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
+from lib.Factory import Factory
 from lib.MarkCAPTCHA import MarkCAPTCHA
 
 ARGUMENT_CONFIG = "config"
 ARGUMENT_FOLDER = "folder"
 
 ARGUMENT_SAMPLE = "sample"
+ARGUMENT_SEED = "seed"
+ARGUMENT_WORKERS = "workers"
+ARGUMENT_BATCH_SIZE = "batchsize"
+ARGUMENT_OUTPUT = "output"
 ARGUMENT_SHOW = "show"
 ARGUMENT_PRINT = "print"
 
 def main():
     print("Sample Usage:\n{}".format(r"python tests/test_Accuracy.py --config \
-        simplecaptcha.json --folder C:\MarkCaptcha\markcaptcha\data\captchas\really_simple_captcha\modified\tmp\testing \
-        --sample 150"))
+        simplecaptcha.json --folder data/captchas/really_simple_captcha/modified/tmp/testing \
+        --workers 4 --batchsize 32 --output accuracy.json"))
 
     parser = argparse.ArgumentParser(
         description='MarkCAPTCHA - Testing Accuracy')
@@ -26,54 +31,68 @@ def main():
         help='Provide filename for CAPTCHA config', metavar="config.json",
         required=True)
     parser.add_argument('--' + ARGUMENT_FOLDER,
-        help='Provide directory with CAPTCHA images',
+        help='Provide directory with CAPTCHA images named after their text',
         required=True)
 
     parser.add_argument('--' + ARGUMENT_SAMPLE,
-        help='Amount of images to Sample', type=int, default=100)
+        help='Amount of images to sample, every image when not set', type=int)
+    parser.add_argument('--' + ARGUMENT_SEED,
+        help='Random seed for the sample', type=int, default=0)
+    parser.add_argument('--' + ARGUMENT_WORKERS,
+        help='Processes predicting images', type=int, default=1)
+    parser.add_argument('--' + ARGUMENT_BATCH_SIZE,
+        help='Images per predictBatch call, 1 predicts each image on its own', type=int,
+        default=1)
+    parser.add_argument('--' + ARGUMENT_OUTPUT,
+        help='Write the JSON report to a file')
     parser.add_argument('--' + ARGUMENT_SHOW,
-        help='Display CAPTCHA if prediction is incorrect', action='store_true',
+        help='Display the incorrect CAPTCHAs after the evaluation', action='store_true',
         default=False)
     parser.add_argument('--' + ARGUMENT_PRINT,
-        help='Display CAPTCHA prediction output', action='store_true',
+        help='Display the incorrect CAPTCHA predictions', action='store_true',
         default=False)
 
     args = vars(parser.parse_args())
 
-    mark = MarkCAPTCHA().importConfigs()
     path = Path(args[ARGUMENT_FOLDER])
 
     if not path.exists():
         raise Exception("Invalid path provided: {}".format(path))
 
-    images = random.sample(list(path.glob('*.png')), args[ARGUMENT_SAMPLE])
-
-    success_counter = skipped_counter = 0
-
-    for counter, image in enumerate(images):
-        prediction = mark.predict(args[ARGUMENT_CONFIG], str(image))
-        image_filename = mark.getImageFilename()
-
-        is_success = prediction.lower() in image_filename.lower()
-
-        if args[ARGUMENT_PRINT]:
-            print("MARKCAPTCHA {}: {} : {} | Success: {}".format(counter + 1,
-                image_filename, prediction, is_success))
-
-        if is_success:
-            success_counter += 1
-        else:
-            skipped_counter += 1
-            if args[ARGUMENT_SHOW]:
-                mark.predict(args[ARGUMENT_CONFIG], str(image), True)
-
-    total_amount = args[ARGUMENT_SAMPLE] - skipped_counter
-
-    print("\nResult: {} / {} -> {}%, Skipped:{} -> {}%".format(
-        success_counter, total_amount, round((success_counter/total_amount) * 100, 2), skipped_counter,
-        round((skipped_counter/args[ARGUMENT_SAMPLE]) * 100, 2)))
-
-    print("Overall: {} / {} => {}".format(success_counter, args[ARGUMENT_SAMPLE], round((success_counter/args[ARGUMENT_SAMPLE]) * 100, 2)))
+    images = sorted(path.glob('*.png'))
+    if args[ARGUMENT_SAMPLE] is not None:
+        images = sorted(random.Random(args[ARGUMENT_SEED]).sample(images,
+            min(args[ARGUMENT_SAMPLE], len(images))))
+
+    evaluation = Factory().create(Factory.CLASS_EVALUATION)
+    report = evaluation.initialise(args[ARGUMENT_CONFIG], args[ARGUMENT_WORKERS],
+        args[ARGUMENT_BATCH_SIZE]).evaluate(images)
+    report[ARGUMENT_FOLDER] = str(path)
+    report[ARGUMENT_SAMPLE] = args[ARGUMENT_SAMPLE]
+    report[ARGUMENT_SEED] = args[ARGUMENT_SEED] if args[ARGUMENT_SAMPLE] is not None else None
+
+    if args[ARGUMENT_PRINT]:
+        for incorrect in report[evaluation.REPORT_INCORRECT]:
+            print("MARKCAPTCHA: {image} : {prediction} | Expected: {expected}".format(**incorrect))
+
+    print("\nAccuracy: {:.2%} of {} images, {:.2%} of segmented images, {:.2%} of characters".format(
+        report[evaluation.REPORT_ACCURACY], report[evaluation.REPORT_IMAGES],
+        report[evaluation.REPORT_SEGMENTED_ACCURACY], report[evaluation.REPORT_CHARACTER_ACCURACY]))
+    print("Segmentation failures: {} -> {:.2%}".format(report[evaluation.REPORT_SEGMENTATION_FAILURES],
+        report[evaluation.REPORT_SEGMENTATION_FAILURE_RATE]))
+    print("Throughput: {} images/s, latency p50 {p50} ms, p95 {p95} ms, p99 {p99} ms".format(
+        report[evaluation.REPORT_IMAGES_PER_SECOND], **report[evaluation.REPORT_LATENCY]))
+
+    if args[ARGUMENT_OUTPUT]:
+        with open(args[ARGUMENT_OUTPUT], "w") as f:
+            json.dump(report, f, indent=2)
+        print("Report: {}".format(args[ARGUMENT_OUTPUT]))
+
+    if args[ARGUMENT_SHOW]:
+        #Shown after the evaluation so displaying them is not timed.
+        mark = MarkCAPTCHA().importConfigs()
+        for incorrect in report[evaluation.REPORT_INCORRECT]:
+            mark.predict(args[ARGUMENT_CONFIG], path / incorrect["image"], True)
 
     return
 
@@ -0,0 +1,178 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import unittest
+import tempfile
+import contextlib, io
+from pathlib import Path
+from lib.Cache import ResultCache
+from lib.MarkCAPTCHA import MarkCAPTCHA
+from tests.workspace import Workspace
+
+CONFIG = "pastebin.json"
+CAPTCHA = Path("data/captchas/pastebin_captcha/captchas/22CV.png")
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def test_Key(self):
+        key = ResultCache.key(b"image", "pastebin.json", "1")
+        self.assertEqual(key, ResultCache.key(b"image", "pastebin.json", "1"))
+        self.assertNotEqual(key, ResultCache.key(b"image", "pastebin.json", "2"))
+        self.assertNotEqual(key, ResultCache.key(b"image", "captcha03.json", "1"))
+        self.assertNotEqual(key, ResultCache.key(b"other", "pastebin.json", "1"))
+
+    def test_Memory(self):
+        self.assertRaises(Exception, ResultCache().initialise, 0)
+        cache = ResultCache().initialise(2)
+
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", "R4ZD").put("b", "FAILED")
+        self.assertEqual(cache.get("a"), "R4ZD")
+        cache.put("c", "2B3C")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "2B3C")
+
+        stats = cache.getStats()
+        self.assertEqual((stats[ResultCache.STAT_MEMORY_HITS], stats[ResultCache.STAT_MISSES],
+            stats[ResultCache.STAT_SIZE]), (2, 2, 2))
+        self.assertEqual(stats[ResultCache.STAT_HIT_RATE], 0.5)
+
+    def test_Disk(self):
+        path = Path(self.folder.name) / "cache.sqlite"
+
+        ResultCache().initialise(1, path).put("a", "R4ZD").put("b", "2B3C")
+
+        #A second process only shares the disk tier.
+        cache = ResultCache().initialise(1, path)
+        self.assertEqual(cache.get("a"), "R4ZD")
+        self.assertEqual(cache.get("a"), "R4ZD")
+        self.assertIsNone(cache.get("c"))
+
+        stats = cache.getStats()
+        self.assertEqual((stats[ResultCache.STAT_MEMORY_HITS], stats[ResultCache.STAT_DISK_HITS],
+            stats[ResultCache.STAT_MISSES]), (1, 1, 1))
+
+    def test_Disk_Capacity(self):
+        path = Path(self.folder.name) / "cache.sqlite"
+        self.assertRaises(Exception, ResultCache().initialise, 1, path, 0)
+
+        cache = ResultCache().initialise(1, path, 2)
+        cache.put("a", "R4ZD").put("b", "2B3C").put("a", "R4ZD").put("c", "FAILED")
+
+        #The least recently written rows are deleted.
+        cache = ResultCache().initialise(1, path, 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "R4ZD")
+        self.assertEqual(cache.get("c"), "FAILED")
+
+
+class TestMarkCAPTCHACache(unittest.TestCase):
+
+    '''
+        Cached predictions in a workspace with the bundled pastebin model.
+    '''
+
+    def setUp(self):
+        self.workspace = Workspace().open()
+        self.mark = MarkCAPTCHA(metrics=True).importConfigs().useCache(100)
+        self.mtime = 0
+
+    def tearDown(self):
+        self.workspace.close()
+
+    def counts(self):
+        '''
+        Cache hits and misses so far.
+        '''
+        metrics = self.mark.getMetrics()
+        return tuple(sum(series["value"] for series in metrics.get(name, []))
+            for name in (MarkCAPTCHA.METRIC_CACHE_HITS, MarkCAPTCHA.METRIC_CACHE_MISSES))
+
+    def touch(self, path):
+        self.mtime += 1
+        os.utime(str(path), ns=(self.mtime, self.mtime))
+
+    def assertMiss(self, predict):
+        (hits, misses) = self.counts()
+        predict()
+        self.assertEqual(self.counts(), (hits, misses + 1))
+
+        #The new version is cached for both.
+        self.mark.predict(CONFIG, CAPTCHA)
+        self.mark.predictBatch(CONFIG, [CAPTCHA])
+        self.assertEqual(self.counts(), (hits + 2, misses + 1))
+
+    def test_Version(self):
+        result = self.mark.predict(CONFIG, CAPTCHA)
+        self.assertEqual(self.mark.predictBatch(CONFIG, [CAPTCHA]), [result])
+        self.assertEqual(self.counts(), (1, 1))
+
+        #Files changed but not reloaded are not in use, their lookups don't stat them.
+        self.workspace.setConfig(CONFIG, threshold=2.0)
+        self.assertEqual(self.mark.predict(CONFIG, CAPTCHA), result)
+        self.assertEqual(self.counts(), (2, 1))
+
+        self.assertEqual(self.mark.reload(), [CONFIG])
+        self.assertMiss(lambda: self.mark.predict(CONFIG, CAPTCHA))
+
+        self.workspace.setModelConfig(quantization_margin=0.02)
+        self.mark.reload()
+        self.assertMiss(lambda: self.mark.predictBatch(CONFIG, [CAPTCHA]))
+
+        for path in (Path("data/models/pastebin.hdf5"), Path("data/models/pastebin.labels")):
+            self.touch(path)
+            self.assertEqual(self.mark.reload(), [CONFIG])
+            self.assertMiss(lambda: self.mark.predict(CONFIG, CAPTCHA))
+
+    def test_Version_Quantize(self):
+        self.workspace.setModelConfig(backend="int8")
+        self.mark = MarkCAPTCHA(metrics=True).importConfigs().useCache(100)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.mark.quantizeModel(CONFIG)
+        self.mark.predict(CONFIG, CAPTCHA)
+
+        #The quantized model in use is replaced without a reload.
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.mark.quantizeModel(CONFIG)
+        self.assertMiss(lambda: self.mark.predict(CONFIG, CAPTCHA))
+        self.assertEqual(self.mark.reload(), [])
+
+    def test_Version_Evicted(self):
+        self.workspace.close()
+        self.workspace = Workspace(models=("pastebin", "captcha03")).open()
+        self.mark = MarkCAPTCHA(model_budget=1, metrics=True).importConfigs().useCache(100)
+
+        (other, captcha) = sorted(Path("data/captchas/pastebin_captcha/captchas").glob("*.png"))[:2]
+        self.mark.predict(CONFIG, captcha)
+
+        #Loaded again after an eviction, a changed labels file starts a new version.
+        self.touch(Path("data/models/pastebin.labels"))
+        self.mark.predict("captcha03.json", captcha)
+        self.assertEqual(self.mark.getModelStats()["loaded"], ["captcha03.json"])
+
+        self.assertEqual(self.counts(), (0, 2))
+        self.mark.predict(CONFIG, other)
+        self.assertEqual(self.counts(), (0, 3))
+        self.assertMiss(lambda: self.mark.predict(CONFIG, captcha))
+        self.assertEqual(self.mark.reload(), [])
+
+    def test_Version_ProcessImages(self):
+        self.workspace.copyCaptchas("pastebin_captcha/captchas/", 20)
+        self.mark.predict(CONFIG, CAPTCHA)
+
+        #A new threshold is used as soon as it is calibrated, without a reload.
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.mark.processImages(CONFIG)
+        self.assertMiss(lambda: self.mark.predict(CONFIG, CAPTCHA))
+        self.assertEqual(self.mark.reload(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
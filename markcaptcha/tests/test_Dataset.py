@@ -0,0 +1,109 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import unittest
+import shutil
+import tempfile
+import numpy as np
+from pathlib import Path
+from lib.Dataset import CharacterDataset, CharacterBatches
+from lib.ImageProcessing import ImageProcessingString
+
+class TestDataset(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.CHARACTERS_PATH = Path('data/captchas/pastebin_captcha/captchas/characters')
+        cls.IMAGE_SIZE = [28, 28]
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.characters_path = Path(self.folder.name) / "characters"
+        self.cache_path = Path(self.folder.name) / "cache"
+
+        for label in ("A", "B"):
+            (self.characters_path / label).mkdir(parents=True)
+            for character in sorted((self.CHARACTERS_PATH / label).glob("*.png"))[:3]:
+                shutil.copy(str(character), str(self.characters_path / label))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def load(self, image_size = None):
+        return CharacterDataset().load(ImageProcessingString(), self.characters_path,
+            image_size or self.IMAGE_SIZE, self.cache_path)
+
+    def test_Load(self):
+        dataset = self.load()
+        self.assertTrue(dataset.packed())
+        self.assertIsInstance(dataset.getImages(), np.memmap)
+        self.assertEqual(dataset.getImages().shape, (6, 28, 28, 1))
+        self.assertEqual(dataset.getImages().dtype, np.uint8)
+        self.assertEqual(dataset.getLabels().tolist(), ["A"] * 3 + ["B"] * 3)
+
+        first = sorted((self.characters_path / "A").glob("*.png"))[0]
+        expected = ImageProcessingString().importImage(first).resize(28, 28).grey().getImage()
+        self.assertTrue(np.array_equal(dataset.getImages()[0, :, :, 0], expected))
+
+        cached = self.load()
+        self.assertFalse(cached.packed())
+        self.assertTrue(np.array_equal(dataset.getImages(), cached.getImages()))
+
+    def test_Invalidate(self):
+        self.load()
+
+        resized = self.load([20, 24])
+        self.assertTrue(resized.packed())
+        self.assertEqual(resized.getImages().shape, (6, 24, 20, 1))
+
+        shutil.copy(str(sorted((self.CHARACTERS_PATH / "C").glob("*.png"))[0]),
+            str(self.characters_path / "A" / "new.png"))
+        added = self.load([20, 24])
+        self.assertTrue(added.packed())
+        self.assertEqual(len(added.getImages()), 7)
+
+    def test_Unreadable(self):
+        (self.characters_path / "B" / "broken.png").write_bytes(b"not a png")
+
+        dataset = self.load()
+        self.assertEqual(len(dataset.getImages()), 6)
+        self.assertEqual(len(dataset.getLabels()), 6)
+        self.assertRaises(Exception, CharacterDataset().getImages)
+
+    def test_Batches(self):
+        images = np.arange(10, dtype=np.uint8).reshape(10, 1, 1, 1)
+        targets = np.eye(10, dtype=np.uint8)
+        indices = np.array([7, 2, 9, 0, 4, 1, 8])
+
+        ordered = CharacterBatches(images, targets, indices, 3, shuffle_buffer=0)
+        self.assertEqual(len(ordered), 3)
+        (x, y) = ordered[0]
+        self.assertEqual(x.dtype, np.float32)
+        self.assertTrue(np.allclose(x.ravel(), np.array([2, 7, 9]) / 255.0))
+        self.assertTrue(np.array_equal(y.argmax(axis=1), [2, 7, 9]))
+        self.assertEqual(len(ordered[2][0]), 1)
+
+        shuffled = CharacterBatches(images, targets, indices, 3, shuffle_buffer=4, seed=0)
+        epochs = []
+        for epoch in range(3):
+            rows = np.concatenate([shuffled[index][1].argmax(axis=1) for index in range(len(shuffled))])
+            self.assertEqual(sorted(rows), sorted(indices))
+            epochs.append(rows.tolist())
+            shuffled.on_epoch_end()
+        self.assertNotEqual(epochs[0], epochs[1])
+
+        #Without a shuffle buffer every row is shuffled together, as Keras shuffled them.
+        indices = np.random.RandomState(0).permutation(1000)
+        whole = CharacterBatches(np.zeros((1000, 1, 1, 1), np.uint8), np.eye(1000, dtype=np.uint8),
+            indices, 100, seed=0)
+        rows = np.concatenate([whole[index][1].argmax(axis=1) for index in range(len(whole))])
+        self.assertEqual(sorted(rows), sorted(indices))
+        self.assertGreater(len(set(rows[:100]) - set(indices[:100])), 50)
+
+
+        self.assertRaises(Exception, CharacterBatches, images, targets, indices, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import unittest
+from lib.Evaluation import Evaluation
+
+class TestEvaluation(unittest.TestCase):
+
+    def test_Initialise(self):
+        self.assertRaises(Exception, Evaluation().initialise, "a.json", 0)
+        self.assertRaises(Exception, Evaluation().initialise, "a.json", 1, 0)
+        self.assertRaises(Exception, Evaluation().evaluate, ["4KX2.png"])
+        self.assertRaises(Exception, Evaluation().initialise("a.json").evaluate, [])
+
+    def test_Label(self):
+        self.assertEqual(Evaluation.label("data/captchas/4KX2.png"), "4KX2")
+
+    def test_Report(self):
+        report = Evaluation().initialise("a.json", 2, 8).report([("4KX2.png", "4kx2", 0.001),
+            ("AB12.png", "AB17", 0.002), ("ZZ99.png", "FAILED", 0.003), ("QR5.png", "QR55", 0.004)], 2.0)
+
+        self.assertEqual((report[Evaluation.REPORT_CONFIG], report[Evaluation.REPORT_IMAGES],
+            report[Evaluation.REPORT_WORKERS], report[Evaluation.REPORT_BATCH_SIZE]), ("a.json", 4, 2, 8))
+        self.assertEqual(report[Evaluation.REPORT_ACCURACY], 0.25)
+        self.assertAlmostEqual(report[Evaluation.REPORT_SEGMENTED_ACCURACY], 1 / 3)
+        self.assertEqual(report[Evaluation.REPORT_CHARACTER_ACCURACY], 7 / 8)
+        self.assertEqual((report[Evaluation.REPORT_SEGMENTATION_FAILURES],
+            report[Evaluation.REPORT_SEGMENTATION_FAILURE_RATE]), (1, 0.25))
+        self.assertEqual(report[Evaluation.REPORT_IMAGES_PER_SECOND], 2.0)
+        self.assertEqual(report[Evaluation.REPORT_LATENCY]["p50"], 2.5)
+        self.assertEqual(report[Evaluation.REPORT_CONFUSION]["2"], {"2": 1, "7": 1})
+        self.assertNotIn("Q", report[Evaluation.REPORT_CONFUSION])
+        self.assertEqual([incorrect["image"] for incorrect in report[Evaluation.REPORT_INCORRECT]],
+            ["AB12.png", "ZZ99.png", "QR5.png"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,12 +3,43 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
 import unittest
+import subprocess
 from lib.Factory import Factory
+from lib.Segmentation import Segment
+from tests.workspace import Workspace
 
-class TestImageProcessing(unittest.TestCase):
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+
+class TestFactory(unittest.TestCase):
 
     def test_Factory(self):
         self.assertRaises(Exception, Factory().create, "")
+        self.assertIs(Factory.getClass(Factory.CLASS_SEGMENT), Segment)
+        self.assertIsInstance(Factory().create(Factory.CLASS_SEGMENT), Segment)
+
+    def test_Factory_LazyImports(self):
+        output = subprocess.run([sys.executable, "-c", "import sys, markcaptcha; "
+            "from lib.Factory import Factory; Factory.getClass(Factory.CLASS_PIPELINE); "
+            "print([module for module in ('keras', 'sklearn', 'matplotlib') if module in sys.modules])"],
+            cwd=ROOT, stdout=subprocess.PIPE, universal_newlines=True, check=True)
+
+        self.assertEqual(output.stdout.splitlines()[-1], "[]")
+
+    def test_Factory_ImageProcessingImports(self):
+        #Cleaning and segmenting CAPTCHAs never needs a model.
+        with Workspace() as workspace:
+            workspace.copyCaptchas("pastebin_captcha/captchas/", 3)
+
+            output = subprocess.run([sys.executable, "-c", "import sys, markcaptcha; "
+                "from lib.MarkCAPTCHA import MarkCAPTCHA; "
+                "MarkCAPTCHA().importConfigs().processImages('pastebin.json', save_cleaned=False); "
+                "print([module for module in ('keras', 'tensorflow') if module in sys.modules])"],
+                cwd=str(workspace.path), env=dict(os.environ, PYTHONPATH=ROOT),
+                stdout=subprocess.PIPE, universal_newlines=True, check=True)
+
+            self.assertEqual(output.stdout.splitlines()[-1], "[]")
+            self.assertTrue(any((workspace.path / "data/captchas/pastebin_captcha/captchas/characters") \
+                .iterdir()))
 
 
 if __name__ == '__main__':
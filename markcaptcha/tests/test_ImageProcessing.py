@@ -2,10 +2,32 @@ import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 import cv2
+import numpy as np
 
 import unittest
 from pathlib import Path
-from lib.ImageProcessing import ImageProcessing,ImageProcessingSection, ImageProcessingString
+from lib.ImageProcessing import ImageProcessing,ImageProcessingSection, ImageProcessingString, \
+    ImageProcessingBytes, ImageProcessingBase64, ScratchBuffers
+import io, base64, json
+
+def fillHolesContours(image):
+    '''
+    fillHoles filling each contour on its own, as it used to.
+    '''
+    for contour in cv2.findContours(image, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)[0]:
+        cv2.drawContours(image, [contour], 0, (255, 255, 255), -1)
+
+    return image
+
+def removeContoursEach(image, margin_error):
+    '''
+    removeContours erasing each small contour on its own, as it used to.
+    '''
+    for contour in cv2.findContours(image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)[0]:
+        if cv2.contourArea(contour) <= margin_error:
+            cv2.drawContours(image, contour, -1, (0, 0, 0), 5)
+
+    return image
 
 class TestImageProcessing(unittest.TestCase):
 
@@ -37,6 +59,22 @@ class TestImageProcessing(unittest.TestCase):
         self.assertEqual(self.image_obj.getFilename(), self.IMAGE_FILENAME)
         self.assertIsNotNone(self.image_obj.getBeforeImage())
 
+    def test_importImage_ImageProcessingBytes(self):
+        image_path = Path('tests/images/' + self.IMAGE_FILENAME)
+        image_bytes = image_path.read_bytes()
+        expected = self.image_obj.getImage()
+
+        for image in (image_bytes, bytearray(image_bytes), memoryview(image_bytes),
+            io.BytesIO(image_bytes)):
+            self.assertTrue(np.array_equal(ImageProcessingBytes().importImage(image).getImage(), expected))
+
+        with open(str(image_path), "rb") as f:
+            self.assertTrue(np.array_equal(ImageProcessingBytes().importImage(f).getImage(), expected))
+
+        self.assertTrue(np.array_equal(ImageProcessingBase64().importImage(
+            base64.b64encode(image_bytes)).getImage(), expected))
+        self.assertRaises(Exception, ImageProcessingBytes().importImage, b"not an image")
+
     def test_importImage_ImageProcessingSection(self):
         section_image_obj = ImageProcessingSection()
         self.assertRaises(Exception, section_image_obj.importImage, None)
@@ -46,6 +84,126 @@ class TestImageProcessing(unittest.TestCase):
         self.assertIsNotNone(section_image_obj.getBeforeImage())
         pass
 
+    def test_useScratch(self):
+        def chain(image_obj):
+            return image_obj.grey().blur(3).threshold(120, True).dilate(2).erode(2) \
+                .opening(2).closing(2).lineRemoval(2).histogramEqualisation() \
+                .thresholdOtsu().border(4, 4).fillHoles().removeContours(5).resize(40, 30)
+
+        scratch = ScratchBuffers()
+        original = self.image_obj.getImage().copy()
+        expected = chain(ImageProcessingSection().importImage(self.image_obj.getImage())).getImage()
+
+        for _ in range(2):
+            scratched = chain(ImageProcessingSection().importImage(self.image_obj.getImage()) \
+                .useScratch(scratch))
+
+            self.assertTrue(np.array_equal(expected, scratched.getImage()))
+            self.assertTrue(scratch.owns(scratched.getImage()))
+
+        size = scratch.getSize()
+        chain(ImageProcessingSection().importImage(self.image_obj.getImage()).useScratch(scratch))
+        self.assertEqual(size, scratch.getSize())
+        self.assertTrue(np.array_equal(original, self.image_obj.getImage()))
+
+    def test_lineRemovalFast(self):
+        images = [self.image_obj.getImage()] + [cv2.imread(str(image)) for image in
+            sorted(Path('data/captchas/captcha_03/captchas').glob('*.png'))[:100]]
+        scratch = ScratchBuffers()
+
+        for image in images + [np.zeros((60, 160, 3), np.uint8)]:
+            grey = ImageProcessingSection().importImage(image).grey().getImage()
+            expected = ImageProcessingSection().importImage(grey).lineRemoval(2).getImage()
+
+            for image_obj in (ImageProcessingSection().importImage(grey),
+                ImageProcessingSection().importImage(grey).useScratch(scratch)):
+                self.assertTrue(np.array_equal(image_obj.lineRemovalFast(2).getImage(), expected))
+
+            #Images without a line of 20 votes fall back to the strongest line.
+            self.assertTrue(np.array_equal(ImageProcessingSection().importImage(grey) \
+                .lineRemovalFast(2, 1000).getImage(), expected))
+
+    def test_lineRemovalFast_Config(self):
+        '''
+        The lineRemovalFast arguments a config ships clean its CAPTCHAs as lineRemoval does,
+        at most one image in a thousand differing.
+        '''
+        for config in sorted(Path('data/configs/captchas').glob('*.json')):
+            captcha_config = json.loads(config.read_text())
+
+            functions = [(function_name.split("_", 1)[0], function_value)
+                for function in captcha_config["functions"]
+                for function_name, function_value in function.items()]
+            if "lineRemovalFast" not in [function_name for function_name, _ in functions]:
+                continue
+
+            current = [("lineRemoval", function_value[:1]) if function_name == "lineRemovalFast"
+                else (function_name, function_value) for function_name, function_value in functions]
+
+            images = sorted(Path('data/captchas/' + captcha_config["folder"]).glob('*.png'))
+            differing = []
+            for image in images:
+                cleaned = []
+                for config_functions in (functions, current):
+                    image_obj = ImageProcessingSection().importImage(cv2.imread(str(image)))
+                    for function_name, function_value in config_functions:
+                        getattr(image_obj, function_name)(*function_value)
+                    cleaned.append(image_obj.getImage())
+
+                if not np.array_equal(*cleaned):
+                    differing.append(image.name)
+
+            self.assertTrue(images, config.name)
+            self.assertLessEqual(len(differing), len(images) // 1000, (config.name, differing[:10]))
+
+    def test_fillHoles_removeContours(self):
+        '''
+        Pixel identical to the contour by contour versions on every bundled CAPTCHA,
+        after the config's functions and after predict's presegmentation.
+        '''
+        scratch = ScratchBuffers()
+
+        for config in sorted(Path('data/configs/captchas').glob('*.json')):
+            captcha_config = json.loads(config.read_text())
+
+            for image in sorted(Path('data/captchas/' + captcha_config["folder"]).glob('*.png')):
+                image_obj = ImageProcessingSection().importImage(cv2.imread(str(image)))
+
+                for function in captcha_config["functions"]:
+                    for function_name, function_value in function.items():
+                        if function_name.split("_", 1)[0] == "removeContours":
+                            cleaned = image_obj.getImage()
+                            expected = removeContoursEach(cleaned.copy(), *function_value)
+
+                            self.assertTrue(np.array_equal(ImageProcessingSection() \
+                                .importImage(cleaned.copy()).useScratch(scratch) \
+                                .removeContours(*function_value).getImage(), expected), image.name)
+
+                        getattr(image_obj, function_name.split("_", 1)[0])(*function_value)
+
+                presegmented = image_obj.grey().threshold(0).border(4, 4).getImage()
+                expected = fillHolesContours(presegmented.copy())
+
+                self.assertTrue(np.array_equal(ImageProcessingSection() \
+                    .importImage(presegmented.copy()).fillHoles().getImage(), expected), image.name)
+
+    def test_fillHoles_removeContours_Grey(self):
+        random = np.random.RandomState(0)
+        scratch = ScratchBuffers()
+
+        for counter in range(500):
+            #Grey values, touching the image edges, with holes in holes.
+            image = (random.rand(30, 40) < random.uniform(0.1, 0.7)) * random.randint(1, 256, (30, 40))
+            image = cv2.dilate(image.astype(np.uint8), ImageProcessing.kernel(counter % 3 + 1))
+
+            for image_obj in (ImageProcessingSection(), ImageProcessingSection().useScratch(scratch)):
+                self.assertTrue(np.array_equal(image_obj.importImage(image.copy()).fillHoles() \
+                    .getImage(), fillHolesContours(image.copy())))
+
+                for margin_error in (5, 50):
+                    self.assertTrue(np.array_equal(image_obj.importImage(image.copy()) \
+                        .removeContours(margin_error).getImage(),
+                        removeContoursEach(image.copy(), margin_error)))
 
 
 if __name__ == '__main__':
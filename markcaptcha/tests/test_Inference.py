@@ -0,0 +1,129 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import unittest
+import importlib.util
+import tempfile
+import numpy as np
+from pathlib import Path
+from lib.Inference import Engine, NumpyEngine, QuantizedEngine
+from lib.ImageProcessing import ImageProcessingString
+
+def referenceConv2D(inputs, kernel, bias):
+    padded = np.pad(inputs, [(0, 0), (1, 1), (1, 1), (0, 0)], mode="constant")
+    outputs = np.zeros(inputs.shape[:3] + (kernel.shape[3],), dtype=np.float64)
+
+    for y in range(inputs.shape[1]):
+        for x in range(inputs.shape[2]):
+            outputs[:, y, x, :] = np.tensordot(padded[:, y:y + 3, x:x + 3, :], kernel,
+                axes=([1, 2, 3], [0, 1, 2]))
+
+    return np.maximum(outputs + bias, 0)
+
+def referenceMaxPool(inputs):
+    (batch, height, width, channels) = inputs.shape
+    return inputs[:, :height // 2 * 2, :width // 2 * 2] \
+        .reshape(batch, height // 2, 2, width // 2, 2, channels).max(axis=(2, 4))
+
+class TestInference(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.MODEL_PATH = Path('data/models/pastebin.hdf5')
+        cls.sections = np.random.RandomState(0).randint(0, 256, (6, 28, 28, 1)).astype(np.float32)
+        cls.CHARACTERS_PATH = Path('data/captchas/pastebin_captcha/captchas/characters')
+
+    def test_InitialiseEngine(self):
+        self.assertRaises(Exception, Engine)
+        self.assertRaises(Exception, NumpyEngine().load, Path('data/models/missing.hdf5'))
+
+    def test_NumpyEngine_Reference(self):
+        import h5py
+
+        weights = {}
+        biases = {}
+        with h5py.File(str(self.MODEL_PATH), "r") as model_file:
+            for name in ("conv2d_1", "conv2d_2", "dense_1", "dense_2"):
+                weights[name] = np.array(model_file["model_weights"][name][name]["kernel:0"])
+                biases[name] = np.array(model_file["model_weights"][name][name]["bias:0"])
+
+        outputs = referenceMaxPool(referenceConv2D(self.sections, weights["conv2d_1"], biases["conv2d_1"]))
+        outputs = referenceMaxPool(referenceConv2D(outputs, weights["conv2d_2"], biases["conv2d_2"]))
+        outputs = np.maximum(outputs.reshape(len(outputs), -1).dot(weights["dense_1"]) + biases["dense_1"], 0)
+        outputs = outputs.dot(weights["dense_2"]) + biases["dense_2"]
+        expected = np.exp(outputs - outputs.max(axis=1, keepdims=True))
+        expected /= expected.sum(axis=1, keepdims=True)
+
+        predictions = NumpyEngine().load(self.MODEL_PATH).predict(self.sections)
+
+        self.assertEqual(predictions.shape, expected.shape)
+        self.assertTrue(np.allclose(predictions, expected, atol=1e-5))
+
+    def test_NumpyEngine_Export(self):
+        engine = NumpyEngine().load(self.MODEL_PATH)
+
+        with tempfile.TemporaryDirectory() as folder:
+            export_path = Path(folder) / ("pastebin" + NumpyEngine.EXPORT_SUFFIX)
+            engine.export(export_path)
+            exported = NumpyEngine().load(export_path)
+
+            self.assertTrue(np.array_equal(engine.predict(self.sections), exported.predict(self.sections)))
+
+    def test_QuantizedEngine(self):
+        image_object = ImageProcessingString()
+        characters = np.array([image_object.importImage(character).resize(28, 28).grey().getImage()
+            for character in sorted(self.CHARACTERS_PATH.glob("*/*.png"))[::20]],
+            dtype=np.float32)[..., np.newaxis]
+
+        engine = NumpyEngine().load(self.MODEL_PATH)
+        quantized = QuantizedEngine().quantize(engine, characters[::2])
+
+        agreement = np.mean(np.argmax(engine.predict(characters[1::2]), axis=1)
+            == np.argmax(quantized.predict(characters[1::2]), axis=1))
+        self.assertGreaterEqual(agreement, 0.98)
+
+        with tempfile.TemporaryDirectory() as folder:
+            export_path = Path(folder) / ("pastebin" + QuantizedEngine.EXPORT_SUFFIX)
+            quantized.export(export_path)
+            exported = QuantizedEngine().load(export_path)
+
+            self.assertLess(export_path.stat().st_size, self.MODEL_PATH.stat().st_size / 4)
+            self.assertTrue(np.array_equal(quantized.predict(characters), exported.predict(characters)))
+
+            #Kernels dequantized on load are saved again as the same int8 levels.
+            exported_path = Path(folder) / ("exported" + QuantizedEngine.EXPORT_SUFFIX)
+            exported.export(exported_path)
+            with np.load(str(export_path)) as first, np.load(str(exported_path)) as second:
+                self.assertEqual(sorted(first.files), sorted(second.files))
+                for name in first.files:
+                    self.assertTrue(np.array_equal(first[name], second[name]), name)
+
+            float_path = Path(folder) / ("pastebin" + NumpyEngine.EXPORT_SUFFIX)
+            engine.export(float_path)
+            self.assertRaises(Exception, QuantizedEngine().load, float_path)
+
+    def test_NumpyEngine_KerasFixture(self):
+        '''
+        Every bundled model against Keras predictions stored by tests/fixture_Keras.py.
+        '''
+        fixture = np.load('tests/fixtures/keras_predictions.npz')
+        sections = fixture["sections"].astype(np.float32)
+
+        for model in ("captcha03", "pastebin", "simplecaptcha"):
+            predictions = NumpyEngine().load(Path('data/models/' + model + '.hdf5')).predict(sections)
+
+            self.assertTrue(np.allclose(predictions, fixture[model], atol=1e-4), model)
+            self.assertTrue(np.array_equal(np.argmax(predictions, axis=1),
+                np.argmax(fixture[model], axis=1)), model)
+
+    @unittest.skipUnless(importlib.util.find_spec("keras"), "Keras is not installed.")
+    def test_NumpyEngine_Keras(self):
+        from lib.Inference import KerasEngine
+
+        self.assertTrue(np.allclose(KerasEngine().load(self.MODEL_PATH).predict(self.sections),
+            NumpyEngine().load(self.MODEL_PATH).predict(self.sections), atol=1e-4))
+
+
+if __name__ == '__main__':
+    unittest.main()
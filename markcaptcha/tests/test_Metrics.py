@@ -0,0 +1,72 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import unittest
+from lib.Metrics import Metrics
+
+class TestMetrics(unittest.TestCase):
+
+    def test_Increment(self):
+        metrics = Metrics().initialise()
+
+        metrics.increment("failures_total", config="a.json")
+        metrics.increment("failures_total", 2, config="a.json")
+        metrics.increment("failures_total", config="b.json")
+
+        self.assertEqual(sorted((series["labels"]["config"], series["value"])
+            for series in metrics.snapshot()["failures_total"]), [("a.json", 3), ("b.json", 1)])
+
+    def test_Observe(self):
+        metrics = Metrics().initialise()
+
+        for value in (0.001, 0.002, 0.003, 20.0):
+            metrics.observe("stage_seconds", value, stage="clean", config="a.json")
+
+        (series,) = metrics.snapshot()["stage_seconds"]
+        self.assertEqual(series["labels"], {"config": "a.json", "stage": "clean"})
+        self.assertEqual(series["count"], 4)
+        self.assertAlmostEqual(series["sum"], 20.006)
+        self.assertEqual((series["buckets"]["0.001"], series["buckets"]["0.0025"],
+            series["buckets"]["10.0"], series["buckets"]["+Inf"]), (1, 2, 3, 4))
+        self.assertTrue(0.001 <= series["p50"] <= 0.0025)
+        self.assertEqual(series["p99"], Metrics.BUCKETS[-1])
+
+    def test_Disabled(self):
+        metrics = Metrics().initialise(False)
+
+        metrics.increment("failures_total", config="a.json")
+        metrics.observe("stage_seconds", 0.1, stage="clean")
+        metrics.observeSince("stage_seconds", metrics.clock(), stage="clean")
+
+        self.assertEqual(metrics.clock(), 0)
+        self.assertEqual(metrics.snapshot(), {})
+        self.assertEqual(metrics.exportPrometheus(), "")
+
+    def test_ExportPrometheus(self):
+        metrics = Metrics().initialise() \
+            .describe("stage_seconds", Metrics.TYPE_HISTOGRAM, "Seconds per stage.")
+        self.assertRaises(Exception, metrics.describe, "stage_seconds", "gauge", "")
+
+        metrics.observe("stage_seconds", 0.004, stage="clean")
+        metrics.increment("failures_total", config='a"b.json')
+
+        lines = metrics.exportPrometheus().splitlines()
+        self.assertIn("# HELP stage_seconds Seconds per stage.", lines)
+        self.assertIn("# TYPE stage_seconds histogram", lines)
+        self.assertIn('stage_seconds_bucket{stage="clean",le="0.0025"} 0', lines)
+        self.assertIn('stage_seconds_bucket{stage="clean",le="0.005"} 1', lines)
+        self.assertIn('stage_seconds_bucket{stage="clean",le="+Inf"} 1', lines)
+        self.assertIn('stage_seconds_count{stage="clean"} 1', lines)
+        self.assertIn("# TYPE failures_total counter", lines)
+        self.assertIn('failures_total{config="a\\"b.json"} 1', lines)
+
+    def test_Reset(self):
+        metrics = Metrics().initialise()
+        metrics.increment("failures_total")
+
+        self.assertEqual(metrics.reset().snapshot(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
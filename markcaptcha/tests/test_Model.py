@@ -0,0 +1,192 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import unittest
+import importlib.util
+import json
+import tempfile
+import numpy as np
+from pathlib import Path
+from lib.Parser import PickleParser
+
+IMAGE_SIZE = [28, 28]
+
+class CharacterImages():
+
+    '''
+        Characters read as CharacterBatches does, counting the batches read and raising
+        once a limit is reached to interrupt a build.
+    '''
+
+    def __init__(self, images, limit = None):
+        self.images = images
+        self.limit = limit
+        self.reads = 0
+
+    def __len__(self):
+        return len(self.images)
+
+    def __getitem__(self, rows):
+        self.reads += 1
+        if self.limit is not None and self.reads > self.limit:
+            raise Exception("Build interrupted.")
+
+        return self.images[rows]
+
+class Characters():
+
+    def __init__(self, images, labels):
+        self.images = images
+        self.labels = labels
+
+    def getImages(self):
+        return self.images
+
+    def getLabels(self):
+        return self.labels
+
+def characters(labels, amount = 16):
+    '''
+        A bright square in a different corner for every label.
+    '''
+    random = np.random.RandomState(0)
+    images = random.randint(0, 40, (amount * len(labels),) + tuple(IMAGE_SIZE) + (1,)).astype(np.uint8)
+
+    for position, label in enumerate(labels):
+        (y, x) = divmod(position, 2)
+        images[position * amount:(position + 1) * amount, y * 14:y * 14 + 14, x * 14:x * 14 + 14] = 255
+
+    return (images, np.repeat(np.array(labels), amount))
+
+@unittest.skipUnless(importlib.util.find_spec("keras"), "Keras is not installed.")
+class TestModel(unittest.TestCase):
+
+    def setUp(self):
+        from lib.Model import Model
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.model_path = Path(self.folder.name) / "model.hdf5"
+        self.labels_path = str(Path(self.folder.name) / "model.labels")
+        (self.images, self.labels) = characters(["A", "C", "E"])
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def model(self, iterations, patience = 0):
+        from lib.Model import Model
+
+        #testing_ratio 0.25 of 48 characters, 36 train in 5 batches and 12 test in 2.
+        return Model().initialise(IMAGE_SIZE, 8, iterations, 0.25, [2, 2], [2, 2], batch_size=8,
+            patience=patience)
+
+    def build(self, model, images, labels, **options):
+        model.train(Characters(images, labels)).build(PickleParser(), self.labels_path,
+            str(self.model_path), **options)
+
+        return model
+
+    def test_Build_Resume(self):
+        from lib.Model import Model
+
+        #Interrupted during the second epoch, after the first epoch's 7 batches.
+        interrupted = CharacterImages(self.images, 9)
+        self.assertRaises(Exception, self.build, self.model(3, patience=5), interrupted,
+            self.labels)
+
+        (checkpoint_path, state_path) = (self.model_path.with_suffix(Model.CHECKPOINT_SUFFIX),
+            self.model_path.with_suffix(Model.CHECKPOINT_STATE_SUFFIX))
+        self.assertTrue(checkpoint_path.is_file())
+        self.assertFalse(self.model_path.exists())
+
+        with open(str(state_path)) as f:
+            state = json.load(f)
+        self.assertEqual((state["epoch"], state["classes"], state["wait"]), (1, ["A", "C", "E"], 0))
+        self.assertTrue(np.isfinite(state["best"]))
+
+        #The resumed build trains epochs 2 and 3, as many batches as a 2 epoch build.
+        resumed = CharacterImages(self.images)
+        model = self.build(self.model(3, patience=5), resumed, self.labels, resume=True)
+        self.assertEqual(len(model.getHistory()["loss"]), 2)
+
+        for path in (checkpoint_path, state_path, self.model_path.with_suffix(Model.CHECKPOINT_BEST_SUFFIX)):
+            self.assertFalse(path.exists())
+        self.assertTrue(self.model_path.is_file())
+        self.assertEqual(PickleParser().parse(self.labels_path).getParsedContent().classes_.tolist(),
+            ["A", "C", "E"])
+
+        self.model_path.unlink()
+        fresh = CharacterImages(self.images)
+        self.build(self.model(2), fresh, self.labels)
+        self.assertEqual(resumed.reads, fresh.reads)
+
+        self.assertRaises(Exception, self.build, self.model(3), self.images, self.labels, resume=True)
+
+    def test_Build_BestWeights(self):
+        from keras.models import load_model
+        from sklearn.model_selection import train_test_split
+
+        #Test characters labelled as another label, so validation loss rises as training learns.
+        (train_indices, test_indices) = train_test_split(np.arange(len(self.images)),
+            test_size=0.25, random_state=0)
+        labels = self.labels.copy()
+        labels[test_indices] = np.roll(np.array(["A", "C", "E"]), 1)[np.searchsorted(["A", "C", "E"],
+            labels[test_indices])]
+
+        model = self.build(self.model(4, patience=10), self.images, labels)
+        val_loss = model.getHistory()["val_loss"]
+        self.assertEqual(len(val_loss), 4)
+        self.assertLess(min(val_loss), val_loss[-1])
+
+        #Training reached its iterations without stopping, the lowest validation loss is kept.
+        targets = PickleParser().parse(self.labels_path).getParsedContent().transform(labels[test_indices])
+        loss = load_model(str(self.model_path)).evaluate(self.images[test_indices] / 255.0,
+            targets, batch_size=8, verbose=0)[0]
+
+        self.assertAlmostEqual(loss, min(val_loss), places=4)
+
+    def test_Build_TwoLabels(self):
+        from keras.models import load_model
+        from lib.Predict import Predict
+
+        (images, labels) = characters(["A", "C"], 24)
+        self.build(self.model(10), images, labels)
+
+        label_binary = PickleParser().parse(self.labels_path).getParsedContent()
+        predictions = load_model(str(self.model_path)).predict(images / 255.0, verbose=0)
+        self.assertEqual(predictions.shape, (len(images), 2))
+        self.assertGreater(np.mean(Predict.decode(label_binary, predictions) == labels), 0.9)
+
+    def test_EarlyStopping_Resume(self):
+        from lib.Model import ResumableEarlyStopping
+
+        early_stopping = ResumableEarlyStopping(monitor="val_loss", patience=2).resume(0.5, 1)
+        early_stopping.on_train_begin()
+        self.assertEqual((early_stopping.best, early_stopping.wait), (0.5, 1))
+
+        early_stopping = ResumableEarlyStopping(monitor="val_loss", patience=2)
+        early_stopping.on_train_begin()
+        self.assertEqual((early_stopping.best, early_stopping.wait), (np.inf, 0))
+
+    def test_Build_Finetune(self):
+        from keras.models import load_model
+
+        self.assertRaises(Exception, self.build, self.model(1), self.images, self.labels, finetune=True)
+
+        self.build(self.model(1), self.images, self.labels)
+        (kernel, bias) = load_model(str(self.model_path)).layers[-1].get_weights()
+
+        #B and D sort between the known labels, which keep their trained weights.
+        (images, labels) = characters(["A", "B", "C", "D", "E"])
+        self.build(self.model(0), images, labels, finetune=True)
+
+        (new_kernel, new_bias) = load_model(str(self.model_path)).layers[-1].get_weights()
+        self.assertEqual(new_kernel.shape, (kernel.shape[0], 5))
+        self.assertTrue(np.array_equal(new_kernel[:, [0, 2, 4]], kernel))
+        self.assertTrue(np.array_equal(new_bias[[0, 2, 4]], bias))
+        self.assertEqual(PickleParser().parse(self.labels_path).getParsedContent().classes_.tolist(),
+            ["A", "B", "C", "D", "E"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import unittest
+import numpy as np
+from pathlib import Path
+from lib.ImageProcessing import ImageProcessing, ImageProcessingString
+from lib.Pipeline import Pipeline
+from lib.Metrics import Metrics
+
+class TestPipeline(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.IMAGE_PATH = Path('tests/images/R4ZD.png')
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+         pass
+
+    def tearDown(self):
+        pass
+
+    def test_Compile_Invalid(self):
+        self.assertRaises(Exception, Pipeline().compile, [{"unknown": []}])
+        self.assertRaises(Exception, Pipeline().compile, [{"save": []}])
+        self.assertRaises(Exception, Pipeline().compile, [{"threshold": []}])
+        self.assertRaises(Exception, Pipeline().compile, [{"erode": ["a"]}])
+        self.assertRaises(Exception, Pipeline().compile, [{"grey": [], "blur": [2]}])
+        self.assertRaises(Exception, Pipeline().compile, {"grey": []})
+
+    def test_Apply(self):
+        pipeline = Pipeline().compile([{"grey": [], "threshold": [230, True], "dilate": [2],
+            "dilate_2": [3], "removeContours": [5]}])
+        self.assertEqual(pipeline.getFunctionNames(),
+            ["grey", "threshold", "dilate", "dilate", "removeContours"])
+
+        expected = ImageProcessingString().importImage(self.IMAGE_PATH) \
+            .grey().threshold(230, True).dilate(2).dilate(3).removeContours(5).getImage()
+        compiled = pipeline.apply(ImageProcessingString().importImage(self.IMAGE_PATH)).getImage()
+
+        self.assertTrue(np.array_equal(expected, compiled))
+
+    def test_Apply_Metrics(self):
+        pipeline = Pipeline().compile([{"grey": [], "dilate": [2], "dilate_2": [3]}])
+        metrics = Metrics().initialise()
+
+        expected = pipeline.apply(ImageProcessingString().importImage(self.IMAGE_PATH)).getImage()
+        measured = pipeline.apply(ImageProcessingString().importImage(self.IMAGE_PATH),
+            metrics, "test.json").getImage()
+
+        self.assertTrue(np.array_equal(expected, measured))
+        self.assertEqual(sorted((series["labels"]["function"], series["count"]) for series
+            in metrics.snapshot()[Pipeline.METRIC_FUNCTION_SECONDS]), [("dilate", 2), ("grey", 1)])
+
+    def test_Kernel(self):
+        self.assertIs(ImageProcessing.kernel(3), ImageProcessing.kernel(3))
+        self.assertEqual(ImageProcessing.kernel(3).shape, (3, 3))
+        self.assertFalse(ImageProcessing.kernel(3).flags.writeable)
+
+
+if __name__ == '__main__':
+    unittest.main()
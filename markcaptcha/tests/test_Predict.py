@@ -3,34 +3,82 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
 import unittest
+import numpy as np
 from pathlib import Path
 from lib.Predict import Predict
+from lib.ImageProcessing import ImageProcessingSection, ImageProcessingString
+from lib.Segmentation import Segment
+
+class CountingModel():
+
+    def __init__(self, classes):
+        self.calls = 0
+        self.classes = classes
+
+    def predict(self, sections, batch_size = None):
+        self.calls += 1
+        predictions = np.zeros((len(sections), self.classes))
+        predictions[np.arange(len(sections)), np.arange(len(sections)) % self.classes] = 1
+        return predictions
+
+class LabelBinary():
+    classes_ = np.array(list("ABCD"))
 
 class TestPredict(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        #cls.image_obj = ImageProcessingString().importImage(Path('../markcaptcha/data/captchas/captcha_03/captchas/2a9s.png'))
+        image_obj = ImageProcessingString().importImage(Path('tests/images/R4ZD.png')) \
+            .grey().threshold(230, True).grey().threshold(0).border(4, 4).fillHoles()
+        cls.segmented_image = Segment().segment(image_obj, [4, 4], 1.5)
 
     @classmethod
     def tearDownClass(cls):
         pass
 
     def setUp(self):
-         pass
+        self.model = CountingModel(len(LabelBinary.classes_))
+        self.predictor = Predict()
+        self.predictor._Predict__model = self.model
+        self.predictor._Predict__labelBinary = LabelBinary()
 
     def tearDown(self):
         pass
 
+    def test_Sections(self):
+        self.assertTrue(self.segmented_image.successful())
+
+        sections = self.predictor.sections(self.segmented_image, ImageProcessingSection(), [28, 30])
+        self.assertEqual(sections.shape, (4, 30, 28, 1))
+
     def test_Predict(self):
-        # section_image_obj = ImageProcessingSection()
-        # self.assertRaises(Exception, section_image_obj.importImage, "")
-        #
-        # section_image_obj.importImage(self.image_obj.getImage())
-        # self.assertIsNotNone(section_image_obj.getImage())
-        # self.assertIsNotNone(section_image_obj.getBeforeImage())
-        # self.assertRaises(Exception, section_image_obj.getFilename)
-        pass
+        result = self.predictor.predict(self.segmented_image, ImageProcessingSection(),
+            [28, 28]).getResult()
+
+        self.assertEqual(result, "ABCD")
+        self.assertEqual(self.model.calls, 1)
+
+    def test_Predict_TwoLabels(self):
+        from sklearn.preprocessing import LabelBinarizer
+
+        label_binary = LabelBinarizer().fit(["A", "B"])
+        self.predictor._Predict__labelBinary = label_binary
+
+        #A softmax output per label, as Model builds.
+        self.predictor._Predict__model = CountingModel(2)
+        self.assertEqual(self.predictor.predict(self.segmented_image, ImageProcessingSection(),
+            [28, 28]).getResult(), "ABAB")
+
+        #A single column, as the label binarizer encodes two labels.
+        single = np.array([[0.9], [0.2], [0.6], [0.4]])
+        self.assertEqual(Predict.decode(label_binary, single).tolist(), ["B", "A", "B", "A"])
+        self.assertEqual(Predict.decode(label_binary, label_binary.transform(list("ABBA"))).tolist(),
+            list("ABBA"))
+
+    def test_Predict_Failed(self):
+        self.assertEqual(self.predictor.predict(Segment(), ImageProcessingSection(),
+            [28, 28]).getResult(), "FAILED")
+        self.assertEqual(self.model.calls, 0)
 
 
 if __name__ == '__main__':
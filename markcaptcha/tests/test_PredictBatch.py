@@ -0,0 +1,70 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import cv2
+import numpy as np
+
+import unittest
+from pathlib import Path
+from lib.MarkCAPTCHA import MarkCAPTCHA
+from lib.Predict import Predict
+from tests.workspace import Workspace
+
+CONFIG = "pastebin.json"
+CAPTCHAS = "data/captchas/pastebin_captcha/captchas/"
+IMAGES = 12
+
+class TestPredictBatch(unittest.TestCase):
+
+    '''
+        predictBatch on the bundled pastebin model with the numpy backend, between images
+        which can't be segmented.
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.workspace = Workspace().open()
+
+        blank = cv2.imencode(".png", np.full((60, 160, 3), 255, np.uint8))[1].tobytes()
+        captchas = [path.read_bytes() for path in sorted(Path(CAPTCHAS).glob("*.png"))[:IMAGES]]
+
+        #Failed images first, last and between the CAPTCHAs.
+        cls.images = [blank] + captchas[:5] + [blank, blank] + captchas[5:] + [blank]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.workspace.close()
+
+    def setUp(self):
+        self.mark = MarkCAPTCHA(metrics=True).importConfigs()
+        self.expected = [self.mark.predict(CONFIG, image) for image in self.images]
+
+    def inferences(self):
+        return sum(series["count"] for series in self.mark.getMetrics()[MarkCAPTCHA.METRIC_STAGE_SECONDS]
+            if series["labels"]["stage"] == MarkCAPTCHA.STAGE_INFERENCE)
+
+    def test_PredictBatch(self):
+        self.assertEqual([result == Predict.FAILED for result in self.expected],
+            [True] + [False] * 5 + [True, True] + [False] * (IMAGES - 5) + [True])
+
+        self.assertEqual(self.mark.predictBatch(CONFIG, self.images), self.expected)
+        self.assertEqual(self.mark.predictBatch(CONFIG, iter(self.images)), self.expected)
+        self.assertEqual(self.mark.predictBatch(CONFIG, []), [])
+
+        self.assertRaises(Exception, self.mark.predictBatch, CONFIG, self.images, 0)
+
+    def test_BatchSize(self):
+        #Each CAPTCHA has 4 characters, the calls never exceed the batch size.
+        for (batch_size, inferences) in ((1, IMAGES * 4), (3, IMAGES * 2), (4, IMAGES),
+            (6, IMAGES), (7, IMAGES), (8, IMAGES // 2), (9, IMAGES // 2), (12, IMAGES // 3),
+            (IMAGES * 4, 1), (IMAGES * 8, 1)):
+            start = self.inferences()
+
+            self.assertEqual(self.mark.predictBatch(CONFIG, self.images, batch_size), self.expected,
+                batch_size)
+            self.assertEqual(self.inferences() - start, inferences, batch_size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import numpy as np
+
+import unittest
+import importlib.util
+import contextlib, io
+import json, shutil, tempfile
+from pathlib import Path
+from lib.MarkCAPTCHA import MarkCAPTCHA
+from lib.Shards import CharacterShards
+from tests.workspace import Workspace
+
+ROOT = Path(os.path.dirname(__file__)).parent
+CONFIG = "pastebin.json"
+CAPTCHAS = "data/captchas/pastebin_captcha/captchas/"
+IMAGES = 40
+
+class TestProcessImages(unittest.TestCase):
+
+    '''
+        processImages on a copy of the first pastebin CAPTCHAs, in a temporary folder.
+    '''
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.folder = tempfile.TemporaryDirectory()
+        shutil.copytree(str(ROOT / "data/configs"), os.path.join(self.folder.name, "data/configs"))
+
+        captchas = Path(self.folder.name) / CAPTCHAS
+        captchas.mkdir(parents=True)
+        for captcha in sorted((ROOT / CAPTCHAS).glob("*.png"))[:IMAGES]:
+            shutil.copy(str(captcha), str(captchas))
+
+        os.chdir(self.folder.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    def process(self, **options):
+        '''
+        The calibrated threshold and every saved character's bytes by its path.
+        '''
+        characters = Path(CAPTCHAS + "characters")
+        if characters.exists():
+            shutil.rmtree(str(characters))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            MarkCAPTCHA(metrics=False).importConfigs().processImages(CONFIG, **options)
+
+        with open("data/configs/captchas/" + CONFIG) as f:
+            threshold = json.load(f)["threshold"]
+
+        return (threshold, {str(path.relative_to(characters)): path.read_bytes()
+            for path in sorted(characters.glob("*/*.png"))})
+
+    def test_Stream(self):
+        (threshold, characters) = self.process()
+        self.assertGreater(len(characters), IMAGES)
+
+        self.assertEqual(self.process(stream=True), (threshold, characters))
+
+        #Sampling every CAPTCHA calibrates on all of them.
+        self.assertEqual(self.process(sample=IMAGES, seed=0), (threshold, characters))
+        self.assertEqual(self.process(sample=IMAGES * 2, seed=0), (threshold, characters))
+
+        self.assertRaises(Exception, self.process, sample=0)
+        self.assertRaises(Exception, self.process, workers=0)
+
+    def test_Workers(self):
+        (threshold, characters) = self.process()
+
+        #Saved as <label>/<stem>_<position>.png, with the same bytes whichever process saved them.
+        for path in characters:
+            (stem, position) = Path(path).stem.rsplit("_", 1)
+            self.assertEqual(stem[int(position)], Path(path).parent.name)
+
+        self.assertEqual(self.process(workers=2), (threshold, characters))
+        self.assertEqual(self.process(workers=2, stream=True), (threshold, characters))
+
+
+class TestProcessImagesShards(unittest.TestCase):
+
+    '''
+        processImages writing shards, read back by buildModel and quantizeModel, in a workspace
+        with the bundled pastebin model.
+    '''
+
+    def setUp(self):
+        self.workspace = Workspace().open().copyCaptchas(CAPTCHAS[len("data/captchas/"):], IMAGES)
+        self.mark = MarkCAPTCHA(metrics=False).importConfigs()
+        self.captcha_config = json.loads(Path("data/configs/captchas/" + CONFIG).read_text())
+
+    def tearDown(self):
+        self.workspace.close()
+
+    def process(self, **options):
+        '''
+        The characters and labels buildModel and quantizeModel read after a run.
+        '''
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.mark.processImages(CONFIG, **options)
+
+        dataset = self.mark._MarkCAPTCHA__characterDataset(self.captcha_config)
+
+        return (np.asarray(dataset.getImages()), dataset.getLabels())
+
+    def test_Shards(self):
+        (characters, labels) = self.process()
+        self.assertGreater(len(labels), IMAGES)
+        self.assertFalse(Path(CAPTCHAS + "shards").exists())
+
+        #The same characters in the same order as the PNGs, however many processes wrote them.
+        for options in ({}, {"workers" : 2}, {"workers" : 2, "stream" : True}):
+            (shard_characters, shard_labels) = self.process(shards=True, **options)
+
+            self.assertEqual(shard_labels.tolist(), labels.tolist(), options)
+            self.assertTrue(np.array_equal(shard_characters, characters), options)
+
+        #Only the last run is kept.
+        shards_path = Path(CAPTCHAS + "shards")
+        self.assertEqual(sorted(path.name for path in shards_path.iterdir()),
+            [CharacterShards.CURRENT_FILENAME, CharacterShards.currentRun(shards_path).name])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(Path(self.mark.quantizeModel(CONFIG)).is_file())
+
+    @unittest.skipUnless(importlib.util.find_spec("keras"), "Keras is not installed.")
+    def test_Shards_Build(self):
+        self.workspace.setModelConfig(iterations=1, preview=False)
+        self.mark = MarkCAPTCHA(metrics=False).importConfigs()
+        self.process(shards=True)
+
+        model_path = Path("data/models/pastebin.hdf5")
+        model_path.unlink()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.mark.buildModel(CONFIG)
+
+        self.assertTrue(model_path.is_file())
+
+
+if __name__ == '__main__':
+    unittest.main()
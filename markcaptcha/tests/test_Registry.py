@@ -0,0 +1,172 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import unittest
+import threading, time
+from concurrent.futures import ThreadPoolExecutor
+from lib.Registry import Registry
+
+class SizedPredictor():
+
+    def __init__(self, size):
+        self.size = size
+
+    def getSize(self):
+        return self.size
+
+class TestRegistry(unittest.TestCase):
+
+    def loader(self, size):
+        def load():
+            self.loads += 1
+            return SizedPredictor(size)
+        return load
+
+    def blockingLoader(self, size, started, release):
+        def load():
+            self.loads += 1
+            started.set()
+            release.wait(10)
+            return SizedPredictor(size)
+        return load
+
+    def setUp(self):
+        self.loads = 0
+
+    def test_Initialise(self):
+        self.assertRaises(Exception, Registry().initialise, 0)
+        self.assertIsNone(Registry().initialise().getStats()[Registry.STAT_BUDGET])
+
+    def test_Get(self):
+        registry = Registry().initialise()
+
+        predictor = registry.get("a.json", self.loader(10))
+        self.assertIs(registry.get("a.json", self.loader(10)), predictor)
+        self.assertEqual(self.loads, 1)
+
+        stats = registry.getStats()
+        self.assertEqual((stats[Registry.STAT_HITS], stats[Registry.STAT_MISSES],
+            stats[Registry.STAT_SIZE]), (1, 1, 10))
+
+    def test_Evict(self):
+        registry = Registry().initialise(25)
+
+        registry.get("a.json", self.loader(10))
+        registry.get("b.json", self.loader(10))
+        registry.get("a.json", self.loader(10))
+        registry.get("c.json", self.loader(10))
+
+        self.assertEqual(registry.getKeys(), ["a.json", "c.json"])
+        self.assertEqual(registry.getStats()[Registry.STAT_EVICTIONS], 1)
+        self.assertEqual(registry.getStats()[Registry.STAT_SIZE], 20)
+
+        #A model larger than the budget is kept alone.
+        registry.get("d.json", self.loader(40))
+        self.assertEqual(registry.getKeys(), ["d.json"])
+        self.assertEqual(registry.getStats()[Registry.STAT_EVICTIONS], 3)
+
+        registry.get("b.json", self.loader(10))
+        self.assertEqual(self.loads, 5)
+
+    def test_Preload(self):
+        registry = Registry().initialise(20)
+        registry.preload("a.json", self.loader(10))
+        registry.preload("b.json", self.loader(10))
+        registry.get("a.json", self.loader(10))
+
+        stats = registry.getStats()
+        self.assertEqual((stats[Registry.STAT_HITS], stats[Registry.STAT_MISSES],
+            stats[Registry.STAT_MODELS]), (1, 0, 2))
+        self.assertEqual(registry.getKeys(), ["b.json", "a.json"])
+
+    def test_Replace(self):
+        registry = Registry().initialise(25)
+        registry.get("a.json", self.loader(10))
+        registry.get("b.json", self.loader(10))
+
+        self.assertFalse(registry.replace("c.json", SizedPredictor(10)))
+
+        #The replaced model keeps its place, so a larger one evicts the least recently used.
+        predictor = SizedPredictor(15)
+        self.assertTrue(registry.replace("a.json", predictor))
+        self.assertEqual(registry.getKeys(), ["a.json", "b.json"])
+        self.assertEqual(registry.getStats()[Registry.STAT_SIZE], 25)
+        self.assertIs(registry.get("a.json", self.loader(10)), predictor)
+
+        registry.replace("a.json", SizedPredictor(20))
+        self.assertEqual(registry.getKeys(), ["a.json"])
+
+        registry.remove("a.json").remove("c.json")
+        self.assertEqual(registry.getKeys(), [])
+        self.assertEqual(registry.getStats()[Registry.STAT_SIZE], 0)
+
+        self.assertEqual(self.loads, 2)
+
+    def test_ConcurrentLoad(self):
+        registry = Registry().initialise()
+        (started, release) = (threading.Event(), threading.Event())
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            first = executor.submit(registry.get, "a.json", self.blockingLoader(10, started, release))
+            started.wait(10)
+            waiting = executor.submit(registry.get, "a.json", self.loader(10))
+
+            #Other models and stats are served while a model loads.
+            self.assertEqual(registry.get("b.json", self.loader(10)).getSize(), 10)
+            self.assertEqual(registry.getKeys(), ["b.json"])
+            self.assertFalse(waiting.done())
+
+            release.set()
+            self.assertIs(waiting.result(10), first.result(10))
+
+        #A single load is shared by the requests waiting for it.
+        self.assertEqual(self.loads, 2)
+        stats = registry.getStats()
+        self.assertEqual((stats[Registry.STAT_HITS], stats[Registry.STAT_MISSES],
+            stats[Registry.STAT_SIZE]), (1, 2, 20))
+        self.assertEqual(registry.getKeys(), ["b.json", "a.json"])
+
+    def test_ConcurrentLoad_Removed(self):
+        registry = Registry().initialise()
+        (started, release) = (threading.Event(), threading.Event())
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            loading = executor.submit(registry.get, "a.json", self.blockingLoader(10, started, release))
+            started.wait(10)
+
+            #A model replaced or removed while loading is returned, not registered.
+            registry.remove("a.json")
+            release.set()
+            self.assertEqual(loading.result(10).getSize(), 10)
+
+        self.assertEqual(registry.getKeys(), [])
+        self.assertEqual(registry.getStats()[Registry.STAT_SIZE], 0)
+
+    def test_ConcurrentLoad_Error(self):
+        registry = Registry().initialise()
+        (started, release) = (threading.Event(), threading.Event())
+
+        def failing():
+            started.set()
+            release.wait(10)
+            raise Exception("Unable to load model.")
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(registry.get, "a.json", failing)
+            started.wait(10)
+            waiting = executor.submit(registry.get, "a.json", self.loader(10))
+            while registry.getStats()[Registry.STAT_HITS] == 0:
+                time.sleep(0.01)
+
+            release.set()
+            self.assertRaises(Exception, first.result, 10)
+            self.assertRaises(Exception, waiting.result, 10)
+
+        #The next request loads the model again.
+        self.assertEqual(registry.get("a.json", self.loader(10)).getSize(), 10)
+        self.assertEqual(self.loads, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import numpy as np
+
+import unittest
+import json, pickle, shutil, threading, time
+from pathlib import Path
+from lib.MarkCAPTCHA import MarkCAPTCHA
+from tests.workspace import Workspace
+
+ROOT = Path(os.path.dirname(__file__)).parent
+CONFIGS = ROOT / "data/configs"
+CAPTCHA = Path("data/captchas/pastebin_captcha/captchas/22CV.png")
+LABELS = Path("data/models/pastebin.labels")
+MODEL = Path("data/models/pastebin.hdf5")
+
+class TestReload(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = Workspace().open()
+        self.mark = MarkCAPTCHA(metrics=True).importConfigs()
+        self.mtime = 0
+
+    def tearDown(self):
+        self.mark.stopWatching()
+        self.workspace.close()
+
+    def touch(self, path):
+        #Same size and modification time as the loaded file is not a change.
+        self.mtime += 1
+        os.utime(str(path), ns=(self.mtime, self.mtime))
+
+    def writeConfig(self, config_filename, content):
+        path = Path("data/configs/captchas") / config_filename
+        path.write_text(content)
+        self.touch(path)
+
+    def counter(self, name):
+        return sum(series["value"] for series in self.mark.getMetrics().get(name, []))
+
+    def test_Reload(self):
+        self.assertEqual(self.mark.reload(), [])
+
+        config = json.loads(Path("data/configs/captchas/pastebin.json").read_text())
+        config["threshold"] = 2.0
+        self.writeConfig("pastebin.json", json.dumps(config))
+        self.writeConfig("new.json", json.dumps(config))
+        self.assertEqual(self.mark.reload(), ["new.json", "pastebin.json"])
+        self.assertEqual(self.mark.reload(), [])
+
+        os.remove("data/configs/captchas/new.json")
+        self.assertEqual(self.mark.reload(), ["new.json"])
+
+        self.assertIn('markcaptcha_reloads_total{config="pastebin.json"} 1', self.mark.exportMetrics())
+
+    def test_Reload_Invalid(self):
+        self.writeConfig("pastebin.json", "{")
+        self.assertEqual(self.mark.reload(), [])
+
+        #A failed change is only retried once it changes again.
+        self.assertEqual(self.mark.reload(), [])
+        self.assertIn('markcaptcha_reload_failures_total{config="pastebin.json"} 1',
+            self.mark.exportMetrics())
+
+        self.writeConfig("pastebin.json", (CONFIGS / "captchas/pastebin.json").read_text() + " ")
+        self.assertEqual(self.mark.reload(), ["pastebin.json"])
+
+    def test_Reload_ModelConfig(self):
+        path = Path("data/configs/models/model.json")
+        path.write_text(path.read_text() + " ")
+        self.touch(path)
+
+        self.assertEqual(self.mark.reload(), ["captcha03.json", "pastebin.json", "simplecaptcha.json"])
+
+    def test_Reload_Labels(self):
+        result = self.mark.predict("pastebin.json", CAPTCHA)
+
+        #Each character's output now names the next label.
+        with open(str(LABELS), "rb") as f:
+            labels = pickle.load(f)
+        classes = list(labels.classes_)
+        labels.classes_ = np.roll(labels.classes_, -1)
+        with open(str(LABELS), "wb") as f:
+            pickle.dump(labels, f)
+        self.touch(LABELS)
+
+        self.assertEqual(self.mark.reload(), ["pastebin.json"])
+        self.assertEqual(self.mark.predict("pastebin.json", CAPTCHA), "".join(
+            classes[(classes.index(character) + 1) % len(classes)] for character in result))
+        self.assertEqual(self.counter(MarkCAPTCHA.METRIC_MODEL_LOADS), 2)
+
+    def test_Reload_Model(self):
+        result = self.mark.predict("pastebin.json", CAPTCHA)
+
+        MODEL.write_bytes(b"not a model")
+        self.touch(MODEL)
+        self.assertEqual(self.mark.reload(), [])
+        self.assertEqual(self.counter(MarkCAPTCHA.METRIC_RELOAD_FAILURES), 1)
+        self.assertEqual(self.mark.predict("pastebin.json", CAPTCHA), result)
+
+        shutil.copy(str(ROOT / MODEL), str(MODEL))
+        self.touch(MODEL)
+        self.assertEqual(self.mark.reload(), ["pastebin.json"])
+        self.assertEqual(self.mark.predict("pastebin.json", CAPTCHA), result)
+        self.assertEqual(self.counter(MarkCAPTCHA.METRIC_MODEL_LOADS), 2)
+
+    def test_Reload_ModelConfig_Rollback(self):
+        result = self.mark.predict("pastebin.json", CAPTCHA)
+
+        #No int8 model was exported, so nothing is swapped to the new model.json.
+        self.workspace.setModelConfig(backend="int8")
+        self.touch("data/configs/models/model.json")
+        self.assertEqual(self.mark.reload(), [])
+        self.assertIn('markcaptcha_reload_failures_total{config="model.json"} 1', self.mark.exportMetrics())
+        self.assertEqual(self.mark.predict("pastebin.json", CAPTCHA), result)
+
+        #Configs changed later still load with the model.json in use.
+        self.writeConfig("pastebin.json", (CONFIGS / "captchas/pastebin.json").read_text() + " ")
+        self.assertEqual(self.mark.reload(), ["pastebin.json"])
+        self.assertEqual(self.mark.predict("pastebin.json", CAPTCHA), result)
+
+    def test_Watch(self):
+        self.assertRaises(Exception, self.mark.watch, 0)
+        self.mark.watch(60).stopWatching()
+
+    def test_Watch_Stable(self):
+        self.mark.predict("pastebin.json", CAPTCHA)
+
+        #A labels file still being written is changed between every check.
+        stop = threading.Event()
+        def write():
+            while not stop.wait(0.005):
+                self.touch(LABELS)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            self.mark.watch(0.1)
+            time.sleep(0.6)
+            self.assertEqual(self.counter(MarkCAPTCHA.METRIC_RELOADS), 0)
+        finally:
+            stop.set()
+            writer.join()
+
+        deadline = time.time() + 5
+        while self.counter(MarkCAPTCHA.METRIC_RELOADS) == 0 and time.time() < deadline:
+            time.sleep(0.05)
+
+        self.assertEqual(self.counter(MarkCAPTCHA.METRIC_RELOADS), 1)
+        self.assertEqual(self.counter(MarkCAPTCHA.METRIC_MODEL_LOADS), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
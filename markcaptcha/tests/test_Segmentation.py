@@ -3,14 +3,18 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
 import unittest
+import numpy as np
 from pathlib import Path
+from lib.ImageProcessing import ImageProcessingString
 from lib.Segmentation import Outliers, Segment
 
 class TestSegmentation(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        #cls.image_obj = ImageProcessingString().importImage(Path('../markcaptcha/data/captchas/captcha_03/captchas/1a5d.png'))
+        cls.image_objects = [ImageProcessingString().importImage(image).grey().threshold(100, True) \
+            .threshold(0).border(4, 4).fillHoles() for image in
+            sorted(Path('data/captchas/pastebin_captcha/captchas').glob('*.png'))[:40]]
 
     @classmethod
     def tearDownClass(cls):
@@ -22,8 +26,59 @@ class TestSegmentation(unittest.TestCase):
     def tearDown(self):
         pass
 
-    def test_(self):
-        pass
+    def test_Outliers_AspectRatios(self):
+        from_images = Outliers()
+        for image_object in self.image_objects:
+            from_images.addImageObject(image_object)
+
+        from_aspect_ratios = Outliers()
+        for image_object in self.image_objects:
+            from_aspect_ratios.addAspectRatios(Outliers().getAspectRatios(image_object, 4))
+
+        self.assertEqual(from_images.doOutliers(4).getMinOutlier(),
+            from_aspect_ratios.doOutliers(4).getMinOutlier())
+
+    def test_Outliers_ZScore(self):
+        data = [1.0, 1.1, 0.9, 1.05, 0.95] * 10 + [4.0]
+        expected = [value for value in np.array(data)
+            if np.abs((value - np.mean(data)) / np.std(data)) > Outliers.THRESHOLD]
+
+        self.assertEqual(Outliers().calculateZScore(data, Outliers.THRESHOLD), expected)
+        self.assertEqual(Outliers().calculateZScore([1.0] * 5, Outliers.THRESHOLD), [])
+
+    def test_Outliers_Interval(self):
+        outliers = Outliers()
+        for image_object in self.image_objects:
+            outliers.addImageObject(image_object)
+
+        self.assertRaises(Exception, outliers.getMinOutlierInterval)
+        outliers.doOutliers(4)
+
+        (lower, upper) = outliers.getMinOutlierInterval(seed=0)
+        self.assertLessEqual(lower, upper)
+        self.assertEqual((lower, upper), outliers.getMinOutlierInterval(seed=0))
+
+    def test_Outliers_Empty(self):
+        self.assertRaises(Exception, Outliers().doOutliers, 4)
+
+    def test_Segment(self):
+        segment = Segment().segment(self.image_objects[0], [4, 4], 1.26)
+
+        self.assertTrue(segment.successful())
+        self.assertEqual(len(segment.getCharacterCords()), 4)
+        self.assertFalse(Segment().successful())
+
+    def test_Segment_Components(self):
+        self.assertRaises(Exception, Segment().setBackend, "unknown")
+
+        for image_object in self.image_objects:
+            self.assertEqual(Segment().segment(image_object, [4, 4], 1.26).getCharacterCords(),
+                Segment().setBackend(Segment.BACKEND_COMPONENTS) \
+                    .segment(image_object, [4, 4], 1.26).getCharacterCords())
+
+        segment = Segment().setBackend(Segment.BACKEND_COMPONENTS) \
+            .segment(self.image_objects[0], [4, 4], 1.26)
+        self.assertEqual(segment.getLargestContours(0), [])
 
 
 if __name__ == '__main__':
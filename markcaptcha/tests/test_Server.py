@@ -0,0 +1,224 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import unittest
+import threading, json, base64, time
+import http.client
+import cv2
+import numpy as np
+import urllib.request, urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from lib.Server import Server
+
+IMAGE = Path('tests/images/R4ZD.png').read_bytes()
+BLANK = cv2.imencode(".png", np.full((24, 72, 3), 255, np.uint8))[1].tobytes()
+
+class StubMarkCAPTCHA():
+
+    '''
+        Predicts text bodies as their upper case and the test image as its name. A blank
+        image decodes but fails to predict.
+    '''
+
+    def __init__(self):
+        self.batches = []
+        self.calls = 0
+        self.failing = False
+        self.predicting = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def getConfigs(self):
+        return ["stub.json"]
+
+    def getModelStats(self):
+        return {"loaded": ["stub.json"]}
+
+    def getCacheStats(self):
+        return None
+
+    def exportMetrics(self):
+        return "# TYPE markcaptcha_predictions_total counter\n"
+
+    def predictBatch(self, config_filename, images):
+        self.calls += 1
+        self.predicting.set()
+        self.release.wait()
+        if b"broken" in images:
+            raise Exception("Unable to decode image.")
+        if BLANK in images:
+            raise Exception("Unable to segment image.")
+        if self.failing:
+            raise Exception("Unable to load model: /secret/stub.hdf5")
+
+        self.batches.append(len(images))
+        return ["R4ZD" if image == IMAGE else image.decode("utf-8").upper() for image in images]
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        self.mark = StubMarkCAPTCHA()
+
+    def tearDown(self):
+        pass
+
+    def startServer(self, max_batch_size = 8, max_wait = 0.2, max_queue = 16, max_body_bytes = 2 ** 20):
+        server = Server().initialise(self.mark, "127.0.0.1", 0, max_batch_size, max_wait,
+            max_queue, max_body_bytes=max_body_bytes).start()
+        self.addCleanup(server.stop)
+
+        return "http://{}:{}".format(*server.getAddress())
+
+    def queued(self, url, size):
+        '''
+        Wait until the prediction queue holds size requests.
+        '''
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            with urllib.request.urlopen(url + "/health", timeout=10) as response:
+                if json.loads(response.read().decode("utf-8"))["queued"] == size:
+                    return
+            time.sleep(0.01)
+
+        self.fail("Requests were not queued.")
+
+    def postBehind(self, url, bodies):
+        '''
+        Responses of bodies predicted as one batch, queued behind a request holding the model.
+        '''
+        self.mark.release.clear()
+        self.mark.predicting.clear()
+
+        with ThreadPoolExecutor(max_workers=len(bodies) + 1) as executor:
+            first = executor.submit(self.post, url + "/predict/stub.json", b"first",
+                "application/octet-stream")
+            self.mark.predicting.wait(10)
+
+            futures = [executor.submit(self.post, url + "/predict/stub.json", body,
+                "application/octet-stream") for body in bodies]
+            self.queued(url, len(bodies))
+
+            self.mark.release.set()
+            first.result()
+
+            return [future.result() for future in futures]
+
+    def post(self, url, body, content_type = "text/plain"):
+        request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status, json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as ex:
+            return ex.code, json.loads(ex.read().decode("utf-8"))
+
+    def test_Predict_Base64AndBinary(self):
+        url = self.startServer(max_wait=0)
+
+        self.assertEqual(self.post(url + "/predict/stub.json", base64.b64encode(b"ab4d")),
+            (200, {"config": "stub.json", "prediction": "AB4D"}))
+        self.assertEqual(self.post(url + "/predict/stub.json", b"xy7z", "application/octet-stream"),
+            (200, {"config": "stub.json", "prediction": "XY7Z"}))
+
+    def test_Metrics(self):
+        url = self.startServer()
+
+        with urllib.request.urlopen(url + "/metrics", timeout=10) as response:
+            self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+            self.assertEqual(response.read().decode("utf-8"),
+                "# TYPE markcaptcha_predictions_total counter\n")
+
+    def test_Predict_Errors(self):
+        url = self.startServer(max_wait=0)
+
+        self.assertEqual(self.post(url + "/predict/missing.json", b"ab4d")[0], 404)
+        self.assertEqual(self.post(url + "/predict/stub.json", b"not base64!")[0], 400)
+        self.assertEqual(self.post(url + "/predict/stub.json", b"broken",
+            "application/octet-stream"), (400, {"error": "CAPTCHA image could not be decoded."}))
+
+    def test_Predict_InternalError(self):
+        url = self.startServer(max_wait=0)
+        self.mark.failing = True
+
+        #Exception details are not sent to clients.
+        self.assertEqual(self.post(url + "/predict/stub.json", IMAGE, "image/png"),
+            (500, {"error": "Prediction failed."}))
+
+        #A failing batch is predicted again for each request.
+        self.mark.calls = 0
+        self.assertEqual(self.postBehind(url, [IMAGE] * 3), [(500, {"error": "Prediction failed."})] * 3)
+        self.assertEqual(self.mark.calls, 5)
+
+    def test_Predict_MixedErrors(self):
+        url = self.startServer(max_wait=0)
+
+        self.mark.calls = 0
+        self.assertEqual([response[0] for response in self.postBehind(url, [b"broken", IMAGE, b"ab4d"])],
+            [400, 200, 200])
+        self.assertEqual(self.mark.calls, 5)
+
+    def test_Predict_FailedImage(self):
+        url = self.startServer(max_wait=0)
+
+        #Only the request whose image fails to predict gets an error.
+        self.assertEqual(self.postBehind(url, [IMAGE, BLANK, b"ab4d"]), [
+            (200, {"config": "stub.json", "prediction": "R4ZD"}),
+            (500, {"error": "Prediction failed."}),
+            (200, {"config": "stub.json", "prediction": "AB4D"})])
+
+    def test_Predict_BodySize(self):
+        url = self.startServer(max_wait=0, max_body_bytes=len(IMAGE))
+
+        self.assertEqual(self.post(url + "/predict/stub.json", IMAGE, "image/png"),
+            (200, {"config": "stub.json", "prediction": "R4ZD"}))
+
+        #Rejected from its Content-Length, before the body is read.
+        connection = http.client.HTTPConnection(*url[len("http://"):].split(":"), timeout=10)
+        connection.putrequest("POST", "/predict/stub.json")
+        connection.putheader("Content-Type", "image/png")
+        connection.putheader("Content-Length", str(len(IMAGE) + 1))
+        connection.endheaders()
+        response = connection.getresponse()
+        self.assertEqual(response.status, 413)
+        connection.close()
+
+        self.assertRaises(Exception, Server().initialise, self.mark, "127.0.0.1", 0, 8, 0, 16,
+            max_body_bytes=0)
+
+    def test_MicroBatching(self):
+        url = self.startServer()
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            responses = list(executor.map(lambda counter: self.post(url + "/predict/stub.json",
+                "c{}".format(counter).encode("utf-8"), "application/octet-stream"), range(6)))
+
+        self.assertEqual([response[1]["prediction"] for response in responses],
+            ["C{}".format(counter) for counter in range(6)])
+        self.assertLess(len(self.mark.batches), 6)
+
+    def test_Backpressure(self):
+        url = self.startServer(max_batch_size=1, max_wait=0, max_queue=1)
+        self.mark.release.clear()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(self.post, url + "/predict/stub.json", b"ab4d",
+                "application/octet-stream") for counter in range(4)]
+
+            statuses = []
+            for future in futures[:]:
+                try:
+                    statuses.append(future.result(timeout=1)[0])
+                    futures.remove(future)
+                except Exception:
+                    pass
+
+            self.mark.release.set()
+            statuses += [future.result()[0] for future in futures]
+
+        self.assertIn(503, statuses)
+        self.assertIn(200, statuses)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import unittest
+import multiprocessing
+import tempfile
+import numpy as np
+from pathlib import Path
+from lib.Shards import ShardWriter, CharacterShards
+from lib.ImageProcessing import ImageProcessingSection, ImageProcessingString
+
+IMAGE_SIZE = [28, 28]
+
+def appendCharacters(task):
+    (run_path, label, amount) = task
+
+    writer = ShardWriter().open(run_path, IMAGE_SIZE)
+    for counter in range(amount):
+        writer.append(np.full((10, 8), counter, dtype=np.uint8), label, "{}_{}".format(label, counter))
+    writer.close()
+
+class TestShards(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.CHARACTER = ImageProcessingString().importImage(
+            sorted(Path('data/captchas/pastebin_captcha/captchas/characters/A').glob("*.png"))[0]) \
+            .grey().getImage()
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.shards_path = Path(self.folder.name) / "shards"
+        self.run_path = CharacterShards.createRun(self.shards_path)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def publish(self):
+        CharacterShards.publish(self.shards_path, self.run_path)
+
+    def test_Append(self):
+        writer = ShardWriter()
+        self.assertRaises(Exception, writer.append, self.CHARACTER, "A")
+
+        writer.open(self.run_path, IMAGE_SIZE)
+        self.assertRaises(Exception, writer.append, self.CHARACTER, "A\nB")
+        self.assertRaises(Exception, writer.append, self.CHARACTER, "A\tB")
+        self.assertRaises(Exception, writer.append, self.CHARACTER, "A", "name\n")
+
+        writer.append(self.CHARACTER, "A").append(self.CHARACTER[::-1], "B").close()
+
+        #Nothing is read before the run is published.
+        self.assertEqual(CharacterShards.paths(self.shards_path, IMAGE_SIZE), [])
+        self.publish()
+
+        shards = CharacterShards().load(self.shards_path, IMAGE_SIZE)
+        self.assertEqual(shards.getLabels().tolist(), ["A", "B"])
+        self.assertEqual(shards.getImages().shape, (2, 28, 28, 1))
+
+        expected = ImageProcessingSection().importImage(self.CHARACTER).resize(28, 28).getImage()
+        self.assertTrue(np.array_equal(shards.getImages()[0][:, :, 0], expected))
+
+    def test_Load_Invalid(self):
+        self.assertRaises(Exception, CharacterShards().getImages)
+        self.assertRaises(Exception, CharacterShards().load, self.shards_path, IMAGE_SIZE)
+
+        ShardWriter().open(self.run_path, IMAGE_SIZE).append(self.CHARACTER, "A").close()
+        self.publish()
+        self.assertRaises(Exception, CharacterShards().load, self.shards_path, [20, 20])
+
+    def test_Load_Partial(self):
+        ShardWriter().open(self.run_path, IMAGE_SIZE).append(self.CHARACTER, "A") \
+            .append(self.CHARACTER, "B").close()
+        self.publish()
+
+        #A writer interrupted part way through a character.
+        (data_path,) = CharacterShards.paths(self.shards_path, IMAGE_SIZE)
+        with open(str(data_path), "ab") as f:
+            f.write(b"\0" * 100)
+        with open(str(data_path.with_suffix(CharacterShards.INDEX_SUFFIX)), "a") as f:
+            f.write("C")
+
+        self.assertEqual(CharacterShards().load(self.shards_path, IMAGE_SIZE).getLabels().tolist(),
+            ["A", "B"])
+
+    def test_ConcurrentWriters(self):
+        tasks = [(self.run_path, label, amount) for label, amount in (("C", 3), ("A", 5), ("B", 7))]
+        with multiprocessing.Pool(3) as pool:
+            pool.map(appendCharacters, tasks)
+        self.publish()
+
+        self.assertEqual(len(CharacterShards.paths(self.shards_path, IMAGE_SIZE)), 3)
+
+        shards = CharacterShards().load(self.shards_path, IMAGE_SIZE)
+        images = shards.getImages()
+        labels = shards.getLabels()
+        self.assertEqual(sorted(labels.tolist()), ["A"] * 5 + ["B"] * 7 + ["C"] * 3)
+
+        #Each character keeps its label across shards, and is read by any index type.
+        for label, amount in (("A", 5), ("B", 7), ("C", 3)):
+            rows = np.flatnonzero(labels == label)
+            self.assertEqual(sorted(images[rows][:, 14, 14, 0].tolist()), list(range(amount)))
+
+        #Ordered by label and name whichever process wrote them.
+        self.assertEqual(labels.tolist(), ["A"] * 5 + ["B"] * 7 + ["C"] * 3)
+        self.assertEqual(np.asarray(images)[:, 14, 14, 0].tolist(), sorted(range(5), key=str)
+            + sorted(range(7), key=str) + sorted(range(3), key=str))
+
+        self.assertTrue(np.array_equal(images[::-1], np.asarray(images)[::-1]))
+        self.assertTrue(np.array_equal(images[-1], np.asarray(images)[len(images) - 1]))
+        self.assertRaises(IndexError, images.__getitem__, np.array([len(images)]))
+
+    def test_Publish(self):
+        ShardWriter().open(self.run_path, IMAGE_SIZE).append(self.CHARACTER, "A").close()
+        self.publish()
+
+        #A run still being written and a new published run.
+        writing_path = CharacterShards.createRun(self.shards_path)
+        ShardWriter().open(writing_path, IMAGE_SIZE).append(self.CHARACTER, "C").close()
+
+        published_path = CharacterShards.createRun(self.shards_path)
+        ShardWriter().open(published_path, IMAGE_SIZE).append(self.CHARACTER, "B").close()
+        CharacterShards.publish(self.shards_path, published_path)
+
+        self.assertEqual(CharacterShards.currentRun(self.shards_path), published_path)
+        self.assertEqual(CharacterShards().load(self.shards_path, IMAGE_SIZE).getLabels().tolist(), ["B"])
+        self.assertFalse(self.run_path.exists())
+        self.assertTrue(writing_path.exists())
+        self.assertEqual(sorted(path.name for path in self.shards_path.iterdir()),
+            sorted([CharacterShards.CURRENT_FILENAME, published_path.name, writing_path.name]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import json, pickle, shutil, tempfile, warnings
+from pathlib import Path
+
+ROOT = Path(os.path.dirname(__file__)).parent
+
+class LabelsUnpickler(pickle.Unpickler):
+
+    '''
+        Reads labels pickled before scikit-learn moved LabelBinarizer to a private module.
+    '''
+
+    def find_class(self, module, name):
+        if module == "sklearn.preprocessing.label":
+            module = "sklearn.preprocessing._label"
+
+        return super().find_class(module, name)
+
+class Workspace():
+
+    '''
+        A temporary copy of the configs and models MarkCAPTCHA runs in, with the bundled
+        CAPTCHAs linked read only. Labels are saved again by the installed scikit-learn.
+    '''
+
+    def __init__(self, backend = "numpy", models = ("pastebin",)):
+        '''
+        @params:
+            backend   - Optional  : model.json inference backend (Str)
+            models    - Optional  : model and labels filenames without a suffix to copy (Tuple)
+        '''
+        self.__backend = backend
+        self.__models = models
+        self.__cwd = None
+        self.__folder = None
+
+    def open(self):
+        self.__folder = tempfile.TemporaryDirectory()
+        self.path = Path(self.__folder.name)
+
+        shutil.copytree(str(ROOT / "data/configs"), str(self.path / "data/configs"))
+        (self.path / "data/captchas").symlink_to(ROOT / "data/captchas")
+        (self.path / "data/models").mkdir()
+
+        for model in self.__models:
+            shutil.copy(str(ROOT / "data/models" / (model + ".hdf5")), str(self.path / "data/models"))
+            with open(str(ROOT / "data/models" / (model + ".labels")), "rb") as f, \
+                warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                labels = LabelsUnpickler(f).load()
+            with open(str(self.path / "data/models" / (model + ".labels")), "wb") as f:
+                pickle.dump(labels, f)
+
+        self.setModelConfig(backend=self.__backend)
+
+        self.__cwd = os.getcwd()
+        os.chdir(str(self.path))
+
+        return self
+
+    def close(self):
+        if self.__cwd is not None:
+            os.chdir(self.__cwd)
+            self.__cwd = None
+        if self.__folder is not None:
+            self.__folder.cleanup()
+            self.__folder = None
+
+    def copyCaptchas(self, folder, amount):
+        '''
+        Replace the linked CAPTCHAs with a copy of the first of a folder, which can be written to.
+        @params:
+            folder    - Required  : CAPTCHA folder below data/captchas (Str)
+            amount    - Required  : CAPTCHAs copied (Int)
+        '''
+        captchas = self.path / "data/captchas"
+        if captchas.is_symlink():
+            captchas.unlink()
+
+        (captchas / folder).mkdir(parents=True)
+        for captcha in sorted((ROOT / "data/captchas" / folder).glob("*.png"))[:amount]:
+            shutil.copy(str(captcha), str(captchas / folder))
+
+        return self
+
+    def setModelConfig(self, **values):
+        self.__update(self.path / "data/configs/models/model.json", values)
+
+    def setConfig(self, config_filename, **values):
+        self.__update(self.path / "data/configs/captchas" / config_filename, values)
+
+    def __update(self, path, values):
+        with open(str(path)) as f:
+            content = json.load(f)
+        content.update(values)
+        with open(str(path), "w") as f:
+            json.dump(content, f)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exception):
+        self.close()